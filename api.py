@@ -0,0 +1,414 @@
+"""
+Async HTTP API over the summarizer functions, for services that need the
+app's features without the Streamlit UI.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Upload a PDF to POST /documents, then use the returned doc_hash with the
+summary / title / keywords / questions endpoints. Exports (PPTX, Research
+Notes PDF) run as background jobs: POST /documents/{doc_hash}/exports returns
+a job ID to poll at GET /jobs/{job_id} and download from /jobs/{job_id}/result.
+"""
+
+import asyncio
+import functools
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse, Response
+from pydantic import BaseModel
+
+import metrics
+import summarizer
+from artifacts import artifact_store
+from context_packing import pack_context
+from keywords import record_paper
+from originality import index_paper
+from pdf_utils import (
+    TITLE_MIN_CONFIDENCE,
+    build_document,
+    cache_document,
+    cached_document,
+    detect_header,
+    document_hash,
+    extract_text_from_bytes,
+    extraction_cache,
+)
+
+
+# ============================================================
+#  CONFIGURATION
+# ============================================================
+
+# Artifacts are stored per document and per job, so the store's TTL and
+# size limits evict them independently
+UPLOAD_NAME = "upload.pdf"
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# PyMuPDF holds the GIL, so extraction gets its own process pool
+CPU_WORKERS = int(os.getenv("API_CPU_WORKERS", os.cpu_count() or 1))
+# Gemini calls are I/O bound; the shared scheduler enforces the real limits
+LLM_WORKERS = int(os.getenv("API_LLM_WORKERS", 16))
+EXPORT_WORKERS = int(os.getenv("API_EXPORT_WORKERS", 4))
+JOB_TTL = float(os.getenv("API_JOB_TTL", 3600))
+MAX_UPLOAD_BYTES = int(os.getenv("API_MAX_UPLOAD_BYTES", 50 * 1024 * 1024))
+
+EXPORT_KINDS = {
+    "pptx": ("Research_Presentation.pptx", "application/vnd.openxmlformats-officedocument.presentationml.presentation"),
+    "notes_pdf": ("Research_Notes.pdf", "application/pdf"),
+}
+
+_pools = {}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    _pools["cpu"] = ProcessPoolExecutor(max_workers=CPU_WORKERS)
+    _pools["llm"] = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="api-llm")
+    _pools["export"] = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="api-export")
+    try:
+        yield
+    finally:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+app = FastAPI(title="AI Research Paper Summarizer API", lifespan=lifespan)
+
+
+# ============================================================
+#  HELPERS
+# ============================================================
+
+# Identical requests already running share one task instead of re-running
+_inflight = {}
+# Export jobs run as tasks nobody awaits; keep references so they aren't
+# garbage-collected mid-run
+_background = set()
+
+
+async def _deduplicated(key, make_coro):
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(make_coro())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: one client disconnecting must not cancel the others' work
+    return await asyncio.shield(task)
+
+
+async def _run(pool, fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pools[pool], functools.partial(fn, *args, **kwargs))
+
+
+def _doc_session(doc_hash):
+    return f"doc-{doc_hash}"
+
+
+def _job_session(job_id):
+    return f"job-{job_id}"
+
+
+def _check(result):
+    """
+    Turns the summarizer's "❌ ..." error strings into HTTP errors.
+    """
+    if isinstance(result, str) and result.startswith("❌"):
+        raise HTTPException(status_code=502, detail=result)
+    return result
+
+
+async def _extract(doc_hash, data):
+    async def work():
+        text = extraction_cache.get(doc_hash)
+        if text is None:
+            text = await _run("cpu", extract_text_from_bytes, data, workers=1)
+            extraction_cache.put(doc_hash, text)
+        return text
+
+    return await _deduplicated(("extract", doc_hash), work)
+
+
+async def _document_text(doc_hash):
+    text = extraction_cache.get(doc_hash)
+    if text is not None:
+        return text
+
+    # Text was evicted; re-extract from the stored upload
+    data = artifact_store.get(_doc_session(doc_hash), UPLOAD_NAME)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Unknown document; upload it to POST /documents first.")
+    return await _extract(doc_hash, data)
+
+
+async def _document(doc_hash):
+    """
+    The layout Document of the stored upload, or None if it was evicted.
+    """
+    data = artifact_store.get(_doc_session(doc_hash), UPLOAD_NAME)
+    if data is None:
+        return None
+
+    async def work():
+        document = cached_document(doc_hash)
+        if document is None:
+            # Layout parsing is CPU-bound PyMuPDF work, like extraction
+            document = await _run("cpu", build_document, data, doc_hash, workers=1)
+            cache_document(document)
+        return document
+
+    return await _deduplicated(("document", doc_hash), work)
+
+
+def _header(document):
+    """
+    (title, authors) read from the Document's first-page layout, each None
+    unless detected with enough confidence.
+    """
+    if document is None:
+        return None, None
+    header = detect_header(document)
+    title = header.title if header.title_confidence >= TITLE_MIN_CONFIDENCE else None
+    authors = ", ".join(header.authors) if header.authors_confidence >= TITLE_MIN_CONFIDENCE else None
+    return title, authors
+
+
+async def _llm(key, fn, *args, **kwargs):
+    return _check(await _deduplicated(key, lambda: _run("llm", fn, *args, **kwargs)))
+
+
+# ============================================================
+#  DOCUMENTS & ANALYSIS
+# ============================================================
+
+class SummaryRequest(BaseModel):
+    length: Literal["Short", "Medium", "Long"] = "Medium"
+    style: str = "Academic"
+
+
+class QuestionRequest(BaseModel):
+    query: str
+    top_k: int = 6
+
+
+@app.post("/documents")
+async def upload_document(file: UploadFile = File(...)):
+    # Read in chunks so an oversized body is rejected without buffering it all
+    buffer = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        buffer += chunk
+        if len(buffer) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"PDF larger than {MAX_UPLOAD_BYTES} bytes.")
+    data = bytes(buffer)
+    if not data.startswith(b"%PDF"):
+        raise HTTPException(status_code=415, detail="Expected a PDF file.")
+
+    doc_hash = document_hash(data)
+    if artifact_store.get(_doc_session(doc_hash), UPLOAD_NAME) is None:
+        artifact_store.put(_doc_session(doc_hash), UPLOAD_NAME, data)
+
+    try:
+        text = await _extract(doc_hash, data)
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"❌ Could not read PDF: {e}")
+    # Every uploaded paper joins the local originality and keyword corpora
+    await _run("llm", index_paper, text, doc_hash, file.filename)
+    await _run("llm", record_paper, text, doc_hash)
+    return {"doc_hash": doc_hash, "characters": len(text)}
+
+
+@app.post("/documents/{doc_hash}/summary")
+async def summary(doc_hash: str, request: SummaryRequest):
+    text = await _document_text(doc_hash)
+    result = await _llm(
+        ("summary", doc_hash, request.length, request.style),
+        summarizer.summarize_long_text, text, request.length, request.style,
+    )
+    return {"doc_hash": doc_hash, "summary": result}
+
+
+@app.get("/documents/{doc_hash}/title")
+async def title(doc_hash: str):
+    text = await _document_text(doc_hash)
+    local_title, authors = _header(await _document(doc_hash))
+    if local_title:
+        return {"doc_hash": doc_hash, "title": local_title, "authors": authors, "source": "layout"}
+    result = await _llm(("title", doc_hash), summarizer.extract_title, pack_context(text, "title"))
+    return {"doc_hash": doc_hash, "title": result, "authors": authors, "source": "llm"}
+
+
+@app.get("/documents/{doc_hash}/keywords")
+async def keywords(doc_hash: str):
+    text = await _document_text(doc_hash)
+    result = await _llm(("keywords", doc_hash), summarizer.extract_keywords, text)
+    return {"doc_hash": doc_hash, "keywords": [k.strip() for k in result.split(",") if k.strip()]}
+
+
+@app.get("/documents/{doc_hash}/originality")
+async def originality(doc_hash: str):
+    text = await _document_text(doc_hash)
+    result = await _llm(("originality", doc_hash), summarizer.check_plagiarism, text, doc_hash)
+    return {"doc_hash": doc_hash, "report": result}
+
+
+@app.post("/documents/{doc_hash}/questions")
+async def question(doc_hash: str, request: QuestionRequest):
+    text = await _document_text(doc_hash)
+    result = await _llm(
+        ("question", doc_hash, request.query, request.top_k),
+        summarizer.semantic_search, request.query, text, doc_hash, request.top_k,
+    )
+    return {"doc_hash": doc_hash, "query": request.query, "answer": result}
+
+
+# ============================================================
+#  EXPORT JOBS
+# ============================================================
+
+class ExportRequest(BaseModel):
+    kind: Literal["pptx", "notes_pdf"]
+    length: Literal["Short", "Medium", "Long"] = "Medium"
+    style: str = "Academic"
+
+
+class Job:
+    __slots__ = ("id", "kind", "doc_hash", "key", "status", "error", "created", "finished")
+
+    def __init__(self, kind, doc_hash, key):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.doc_hash = doc_hash
+        self.key = key
+        self.status = "queued"
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "doc_hash": self.doc_hash,
+            "status": self.status,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+
+_jobs = {}
+
+
+def _prune_jobs():
+    cutoff = time.time() - JOB_TTL
+    for job_id, job in list(_jobs.items()):
+        if job.finished and job.finished < cutoff:
+            _jobs.pop(job_id, None)
+
+
+def _render_export(kind, text, doc_hash, length, style, document=None):
+    title, authors = _header(document)
+    if kind == "pptx":
+        return summarizer.generate_ppt(pack_context(text, "ppt"), doc_hash=doc_hash, title=title, authors=authors)
+
+    # Prompts get the packed excerpt; keywords, originality and the equation
+    # scan read the whole paper (the Document keeps page references)
+    notes, _ = summarizer.build_research_notes_pdf(
+        pack_context(text, "notes"), length, style, doc_hash=doc_hash, title=title,
+        full_text=text, paper=document,
+    )
+    return notes
+
+
+async def _run_job(job, text, length, style):
+    job.status = "running"
+    try:
+        document = await _document(job.doc_hash)
+        data = _check(await _run("export", _render_export, job.kind, text, job.doc_hash, length, style, document))
+        filename, _ = EXPORT_KINDS[job.kind]
+        artifact_store.put(_job_session(job.id), filename, data)
+        job.status = "done"
+    except HTTPException as e:
+        job.status, job.error = "failed", e.detail
+    except Exception as e:
+        job.status, job.error = "failed", f"❌ Export failed: {e}"
+    finally:
+        job.finished = time.time()
+
+
+@app.post("/documents/{doc_hash}/exports", status_code=202)
+async def create_export(doc_hash: str, request: ExportRequest):
+    text = await _document_text(doc_hash)
+    _prune_jobs()
+
+    # Reuse an identical export that is still queued or running
+    key = (request.kind, doc_hash, request.length, request.style)
+    for job in _jobs.values():
+        if job.key == key and job.status in ("queued", "running"):
+            return job.to_dict()
+
+    job = Job(request.kind, doc_hash, key)
+    _jobs[job.id] = job
+    task = asyncio.ensure_future(_run_job(job, text, request.length, request.style))
+    _background.add(task)
+    task.add_done_callback(_background_done)
+    return job.to_dict()
+
+
+def _background_done(task):
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        # _run_job records failures on the job; anything escaping it is a bug
+        task.get_loop().call_exception_handler(
+            {"message": "Export job task failed", "exception": task.exception(), "task": task}
+        )
+
+
+def _get_job(job_id):
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return _get_job(job_id).to_dict()
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = _get_job(job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=job.error or f"Job is {job.status}.")
+
+    filename, media_type = EXPORT_KINDS[job.kind]
+    data = artifact_store.get(_job_session(job.id), filename)
+    if data is None:
+        raise HTTPException(status_code=410, detail="Export was evicted; submit it again.")
+    return Response(
+        content=data,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# ============================================================
+#  OPERATIONS
+# ============================================================
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "jobs": len(_jobs), "inflight": len(_inflight)}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return metrics.registry.render_prometheus()
@@ -1,14 +1,38 @@
+import os
+import time
+import uuid
+
 import streamlit as st
-from pdf_utils import extract_text_from_pdf
+import metrics
+import model_routing
+from artifacts import artifact_store
+from context_packing import pack_context
+from job_queue import CANCELLED, DONE, FAILED, FINISHED, get_default_queue, start_workers
+from keywords import record_paper
+from originality import index_paper
+from pdf_utils import TITLE_MIN_CONFIDENCE, detect_header, document_hash, load_document
+from streaming import (
+    LARGE_UPLOAD_BYTES,
+    STREAM_CACHE_MAX_BYTES,
+    WINDOW_PAGES as STREAM_WINDOW_PAGES,
+    default_stream_dir,
+    extract_text_streaming,
+    prune,
+    spilled_text,
+    spool_upload,
+)
 from summarizer import (
-    summarize_text,
+    summarize_long_text_stream,
     extract_title,
     extract_keywords,
     check_plagiarism,
-    semantic_search,
-    generate_ppt,
+    semantic_search_stream,
     extract_algorithms_equations,
-    generate_research_notes_pdf,
+    analyze_paper,
+    format_keywords,
+    format_algorithms_equations,
+    get_api_key,
+    _is_error,
 )
 
 # ---------- Custom CSS ----------
@@ -89,6 +113,99 @@ def load_custom_css():
     )
 
 
+# ---------- Very large texts ----------
+
+@st.cache_resource(max_entries=4)
+def open_spilled_text(pdf_path, doc_hash):
+    """
+    One open SpilledText (a file and its mmap) per very large document,
+    shared by sessions and reruns instead of reopened by each; the
+    extraction is already complete, so this only opens the spill files.
+    """
+    return extract_text_streaming(pdf_path, doc_hash)
+
+
+# ---------- Combined paper analysis ----------
+
+def get_paper_analysis(doc_hash, text, length, style):
+    """
+    Runs the single-call analyze_paper once per document and settings and
+    keeps it in the session. Returns None if the call failed.
+    """
+    analyses = st.session_state.setdefault("paper_analyses", {})
+    key = (doc_hash, length, style)
+    if key not in analyses:
+        analysis = analyze_paper(text, length, style)
+        if isinstance(analysis, str):
+            st.warning(f"{analysis} — falling back to separate prompts.")
+            return None
+        analyses[key] = analysis
+    return analyses[key]
+
+
+def show_export_job(state_key, file_name, label, mime, success_message):
+    """
+    Shows the export job stored under `state_key`: waits briefly while it
+    runs, then offers the download, its error, or Refresh / Cancel buttons.
+    The job keeps running in a worker if the user navigates away. A finished
+    export is copied into the session's artifact store once and served from
+    there on later reruns.
+    """
+    job_id = st.session_state.get(state_key)
+    if not job_id:
+        return
+
+    job = job_queue.status(job_id)
+    if job and job["status"] not in FINISHED:
+        waited = 0.0
+        with st.spinner("Working in the background..."):
+            while job and job["status"] not in FINISHED and waited < JOB_WAIT_SECONDS:
+                time.sleep(0.5)
+                waited += 0.5
+                job = job_queue.status(job_id)
+
+    if job is None:
+        st.session_state.pop(state_key, None)
+        st.warning("This export has expired. Please generate it again.")
+    elif job["status"] == DONE:
+        failures = job["meta"].get("failures")
+        if failures:
+            st.warning(
+                "Some sections could not be generated: "
+                + ", ".join(name.replace("_", " ") for name in failures)
+            )
+        artifact_name = f"exports/{job_id}/{file_name}"
+        data = artifact_store.get(session_id, artifact_name)
+        if data is None:
+            data = job_queue.result(job_id)
+            if data is not None:
+                artifact_store.put(session_id, artifact_name, data)
+        if data is None:
+            st.session_state.pop(state_key, None)
+            st.warning("This export has expired. Please generate it again.")
+            return
+        st.download_button(
+            label=label,
+            data=data,
+            file_name=file_name,
+            mime=mime,
+            key=f"download-{job_id}",
+        )
+        st.success(success_message)
+    elif job["status"] == FAILED:
+        st.error(job["error"])
+    elif job["status"] == CANCELLED:
+        st.info("Export cancelled.")
+    else:
+        st.info(f"⏳ Still {job['status']}. You can keep using the app meanwhile.")
+        col_refresh, col_cancel = st.columns(2)
+        if col_refresh.button("🔄 Refresh", key=f"refresh-{job_id}"):
+            st.rerun()
+        if col_cancel.button("✖ Cancel", key=f"cancel-{job_id}"):
+            job_queue.cancel(job_id)
+            st.rerun()
+
+
 # ---------- Page config & header ----------
 
 st.set_page_config(
@@ -98,6 +215,18 @@ st.set_page_config(
 
 load_custom_css()
 
+# Prometheus /metrics endpoint (METRICS_PORT), started once per process
+metrics.start_metrics_server()
+
+# Exports run in background worker processes (JOB_WORKERS), started once per
+# process; they cannot read st.secrets, so hand them the API key
+job_queue = get_default_queue()
+_api_key = get_api_key()
+start_workers(int(os.getenv("JOB_WORKERS", 2)), env={"GEMINI_API_KEY": _api_key} if _api_key else None)
+
+# How long a rerun waits on a running export before offering Refresh/Cancel
+JOB_WAIT_SECONDS = float(os.getenv("JOB_WAIT_SECONDS", 60))
+
 st.markdown(
     """
 <div class="title-wrapper">
@@ -114,23 +243,83 @@ st.markdown(
 
 uploaded_file = st.file_uploader("📎 Upload a research paper (PDF)", type="pdf")
 
-if uploaded_file:
-    # Save file temporarily
-    with open("temp_uploaded.pdf", "wb") as f:
-        f.write(uploaded_file.read())
-
-    # Extract text
-    extracted_text = extract_text_from_pdf("temp_uploaded.pdf")
+# Each browser session has its own artifact namespace (uploads, exports) and
+# is its own user for the job queue's per-user limits
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+session_id = st.session_state["session_id"]
 
-    if not extracted_text or not extracted_text.strip():
+if uploaded_file:
+    spilled = None
+    large = uploaded_file.size > LARGE_UPLOAD_BYTES
+    if large:
+        # Large PDF: spool to disk in chunks (once per upload) and extract page
+        # windows into a spill file, resuming if a rerun interrupted it
+        spool_key = f"spooled:{uploaded_file.file_id}"
+        spooled = st.session_state.get(spool_key)
+        if not spooled or not os.path.exists(spooled[0]):
+            stream_dir = default_stream_dir()
+            prune(stream_dir)
+            spooled = st.session_state[spool_key] = spool_upload(uploaded_file, stream_dir)
+        pdf_source, doc_hash = spooled
+
+        progress = st.progress(0.0, text="Extracting pages...")
+        with extract_text_streaming(
+            pdf_source,
+            doc_hash,
+            progress=lambda done, total: progress.progress(done / total, text=f"Extracted {done}/{total} pages"),
+        ) as extracted:
+            extracted_text = spilled_text(extracted, doc_hash) if extracted.size <= STREAM_CACHE_MAX_BYTES else None
+        progress.empty()
+        if extracted_text is None:
+            # Very large text: keep it on disk and decode it only inside the
+            # actions that need all of it
+            spilled = open_spilled_text(pdf_source, doc_hash)
+    else:
+        # Keep the upload on disk in this session's artifact store (once per
+        # upload); the app and the export workers read it from there
+        upload = uploaded_file.getvalue()
+        doc_hash = document_hash(upload)
+        upload_name = f"uploads/{doc_hash}.pdf"
+        pdf_source = artifact_store.path(session_id, upload_name)
+        if pdf_source is None:
+            pdf_source = artifact_store.file_path(session_id, upload_name)
+            with open(pdf_source, "wb") as f:
+                f.write(upload)
+        extracted_text = None
+
+    # Layout-aware sections, built once per document (memoized by content
+    # hash, so reruns skip PyMuPDF); prompts pack from these. Its text is the
+    # paper's text, so regular uploads are parsed only once. For streamed
+    # uploads only the first window of pages (front matter) is parsed.
+    document = load_document(pdf_source, doc_hash, max_pages=STREAM_WINDOW_PAGES if large else None)
+    if not large:
+        extracted_text = document.text
+
+    def paper_text():
+        return extracted_text if spilled is None else spilled_text(spilled, doc_hash)
+
+    # Title / authors from the first-page layout; used instead of the LLM when confident
+    header = detect_header(document)
+    local_title = header.title if header.title_confidence >= TITLE_MIN_CONFIDENCE else None
+    local_authors = ", ".join(header.authors) if header.authors_confidence >= TITLE_MIN_CONFIDENCE else None
+
+    # Every processed paper joins the local originality and keyword corpora (once per upload)
+    if st.session_state.get("indexed_doc") != doc_hash:
+        index_paper(spilled.iter_windows() if spilled else extracted_text, doc_hash, uploaded_file.name)
+        record_paper(spilled.iter_windows() if spilled else extracted_text, doc_hash)
+        st.session_state["indexed_doc"] = doc_hash
+
+    if not (spilled.has_text() if spilled else extracted_text and extracted_text.strip()):
         st.error("⚠️ No extractable text found in the PDF. Try another file.")
     else:
         # ---------- Preview ----------
         with st.container():
             st.markdown('<div class="section-title">📃 Extracted Preview (first 1000 characters):</div>', unsafe_allow_html=True)
             # Use markdown instead of st.text to avoid big grey box
+            preview = spilled.head(1000) if spilled else extracted_text[:1000]
             st.markdown(
-                f"<p style='color:#bfbfbf; white-space:pre-wrap;'>{extracted_text[:1000]}</p>",
+                f"<p style='color:#bfbfbf; white-space:pre-wrap;'>{preview}</p>",
                 unsafe_allow_html=True,
             )
 
@@ -150,18 +339,44 @@ if uploaded_file:
                 index=0,
             )
 
+            single_call = st.checkbox(
+                "⚡ Single-call analysis (one Gemini request for title, keywords, summary, equations & PPT)",
+                value=False,
+            )
+
+            def paper_analysis():
+                if not single_call:
+                    return None
+                return get_paper_analysis(doc_hash, pack_context(document, "analysis"), summary_length, summary_style)
+
             if st.button("🧠 Generate Summary"):
+                st.subheader("📝 AI-Generated Summary")
                 with st.spinner("Generating summary using Gemini..."):
-                    summary = summarize_text(
-                        extracted_text[:8000],
-                        summary_length,
-                        summary_style,
-                    )
-
-                if summary:
-                    st.subheader("📝 AI-Generated Summary")
-                    st.write(summary)
+                    analysis = paper_analysis()
+                    if analysis:
+                        summary = analysis["summary"]
+                        st.write(summary)
+                    else:
+                        # Render tokens as they arrive; write_stream returns the full text.
+                        # A stream that fails partway ends with a "❌ ..." chunk.
+                        chunks = []
+
+                        def tracked(stream):
+                            for chunk in stream:
+                                chunks.append(chunk)
+                                yield chunk
+
+                        summary = st.write_stream(
+                            tracked(summarize_long_text_stream(
+                                paper_text(),
+                                summary_length,
+                                summary_style,
+                            ))
+                        )
+                        if any(_is_error(chunk) for chunk in chunks):
+                            summary = None
 
+                if summary and not _is_error(summary):
                     st.download_button(
                         label="📥 Download Summary as TXT",
                         data=summary,
@@ -180,21 +395,29 @@ if uploaded_file:
             with col1:
                 if st.button("🔎 Extract Title from Paper"):
                     with st.spinner("Extracting title..."):
-                        title = extract_title(extracted_text[:8000])
+                        if local_title:
+                            title = local_title
+                        else:
+                            analysis = paper_analysis()
+                            title = analysis["title"] if analysis else extract_title(document)
                     st.success("Title Extracted:")
                     st.write(f"📘 {title}")
 
             with col2:
                 if st.button("🧩 Extract Keywords"):
                     with st.spinner("Extracting keywords..."):
-                        keywords = extract_keywords(extracted_text[:8000])
+                        analysis = paper_analysis()
+                        if analysis:
+                            keywords = format_keywords(analysis)
+                        else:
+                            keywords = extract_keywords(paper_text())
                     st.success("Keywords Identified:")
                     st.write(keywords)
 
             with col3:
                 if st.button("🕵️ Check Plagiarism"):
                     with st.spinner("Checking plagiarism and originality..."):
-                        report = check_plagiarism(extracted_text[:8000])
+                        report = check_plagiarism(paper_text(), doc_hash)
                     st.success("Plagiarism Analysis Complete:")
                     st.write(report)
 
@@ -211,10 +434,9 @@ if uploaded_file:
                 if not user_query.strip():
                     st.warning("Please enter a question.")
                 else:
-                    with st.spinner("Searching the paper..."):
-                        answer = semantic_search(user_query, extracted_text[:8000])
                     st.success("Answer:")
-                    st.write(answer)
+                    # The text is decoded only if the passage index must be built
+                    st.write_stream(semantic_search_stream(user_query, paper_text, doc_hash))
 
         # ---------- Downloads & advanced tools ----------
         with st.container():
@@ -222,63 +444,66 @@ if uploaded_file:
 
             col_a, col_b, col_c = st.columns(3)
 
-            # PPT
+            # PPT (background job)
             with col_a:
+                ppt_key = f"ppt_job:{doc_hash}"
                 if st.button("📊 Generate Presentation (PPT)"):
-                    with st.spinner("Creating your PPT..."):
-                        ppt_path = generate_ppt(extracted_text[:8000])
-
-                    if isinstance(ppt_path, str) and ppt_path.endswith(".pptx"):
-                        with open(ppt_path, "rb") as file:
-                            st.download_button(
-                                label="📥 Download PPT",
-                                data=file,
-                                file_name="Research_Presentation.pptx",
-                                mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                            )
-                        st.success("PPT generated successfully!")
-                    else:
-                        st.error(ppt_path)
-
-            # Research Notes PDF
+                    st.session_state[ppt_key] = job_queue.submit(
+                        "ppt",
+                        {
+                            "text": pack_context(document, "ppt"),
+                            "analysis": paper_analysis(),
+                            "doc_hash": doc_hash,
+                            "title": local_title,
+                            "authors": local_authors,
+                        },
+                        user_id=session_id,
+                    )
+                show_export_job(
+                    ppt_key,
+                    "Research_Presentation.pptx",
+                    "📥 Download PPT",
+                    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+                    "PPT generated successfully!",
+                )
+
+            # Research Notes PDF (background job)
             with col_b:
+                notes_key = f"notes_job:{doc_hash}:{summary_length}:{summary_style}"
                 if st.button("📄 Generate Research Notes PDF"):
-                    with st.spinner("Creating Research Notes PDF..."):
-                        title = extract_title(extracted_text[:8000])
-                        keywords = extract_keywords(extracted_text[:8000])
-                        summary_for_pdf = summarize_text(
-                            extracted_text[:8000],
-                            summary_length,
-                            summary_style,
-                        )
-                        plagiarism_report = check_plagiarism(extracted_text[:8000])
-                        algo_eq = extract_algorithms_equations(extracted_text[:8000])
-
-                        pdf_path = generate_research_notes_pdf(
-                            title,
-                            keywords,
-                            summary_for_pdf,
-                            plagiarism_report,
-                            algo_eq,
-                        )
-
-                    if isinstance(pdf_path, str) and pdf_path.endswith(".pdf"):
-                        with open(pdf_path, "rb") as pdf:
-                            st.download_button(
-                                label="📥 Download Research Notes PDF",
-                                data=pdf,
-                                file_name="Research_Notes.pdf",
-                                mime="application/pdf",
-                            )
-                        st.success("PDF generated successfully!")
-                    else:
-                        st.error(pdf_path)
+                    st.session_state[notes_key] = job_queue.submit(
+                        "research_notes",
+                        {
+                            "text": pack_context(document, "notes"),
+                            # Keywords, originality and the equation scan read the whole
+                            # paper; the worker reads it from its PDF on disk
+                            "source": pdf_source,
+                            "streamed": large,
+                            "length": summary_length,
+                            "style": summary_style,
+                            "analysis": paper_analysis(),
+                            "doc_hash": doc_hash,
+                            "title": local_title,
+                        },
+                        user_id=session_id,
+                    )
+                show_export_job(
+                    notes_key,
+                    "Research_Notes.pdf",
+                    "📥 Download Research Notes PDF",
+                    "application/pdf",
+                    "PDF generated successfully!",
+                )
 
             # Algorithms & equations
             with col_c:
                 if st.button("🧮 Extract Algorithms & Equations"):
                     with st.spinner("Extracting algorithms and equations..."):
-                        output = extract_algorithms_equations(extracted_text[:8000])
+                        analysis = paper_analysis()
+                        if analysis:
+                            output = format_algorithms_equations(analysis)
+                        else:
+                            output = extract_algorithms_equations(document)
                     st.success("Extraction Complete:")
                     st.write(output)
 
@@ -288,3 +513,18 @@ else:
 # ---------- Footer ----------
 st.markdown("---")
 st.caption("Built using Streamlit & Gemini API !")
+
+# ---------- Debug panel (?debug=1 or APP_DEBUG_PANEL=1) ----------
+if st.query_params.get("debug") == "1" or os.getenv("APP_DEBUG_PANEL") == "1":
+    with st.sidebar.expander("🛠️ Pipeline metrics", expanded=True):
+        rows = metrics.registry.stage_summary()
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        else:
+            st.caption("No stages recorded yet.")
+        routes = model_routing.route_stats()
+        if routes:
+            st.markdown("**Model routes**")
+            st.dataframe(routes, hide_index=True)
+        st.code(metrics.registry.render_prometheus(), language="text")
+
@@ -0,0 +1,224 @@
+import atexit
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+
+# ============================================================
+#  PER-SESSION ARTIFACT STORE
+# ============================================================
+
+class _Artifact:
+    __slots__ = ("data", "path")
+
+    def __init__(self, data=None, path=None):
+        self.data = data
+        self.path = path
+
+    @property
+    def size(self):
+        if self.data is not None:
+            return len(self.data)
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+
+class ArtifactStore:
+    """
+    Keeps uploads and generated files per session, so concurrent users never
+    share (or race on) a path in the working directory.
+
+    Artifacts up to `memory_limit` bytes are held in memory; larger ones and
+    anything a library must write to disk live in a per-session temp dir.
+    Sessions idle for more than `session_ttl` seconds are dropped, and when
+    the store exceeds `max_bytes` the least recently used sessions are
+    evicted first, then the oldest artifacts of the session being written.
+    """
+
+    def __init__(self, root=None, max_bytes=512 * 1024 * 1024, session_ttl=3600, memory_limit=32 * 1024 * 1024):
+        self.root = root or tempfile.mkdtemp(prefix="summarizer-artifacts-")
+        self.max_bytes = max_bytes
+        self.session_ttl = session_ttl
+        self.memory_limit = memory_limit
+        self._sessions = OrderedDict()  # session_id -> (last_used, {name: _Artifact})
+        self._lock = threading.RLock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _session_dir(self, session_id):
+        return os.path.join(self.root, session_id)
+
+    def _touch(self, session_id):
+        _, items = self._sessions.pop(session_id, (None, {}))
+        self._sessions[session_id] = (time.monotonic(), items)
+        return items
+
+    def put(self, session_id, name, data):
+        """
+        Stores bytes under (session_id, name), in memory when small enough.
+        """
+        with self._lock:
+            items = self._touch(session_id)
+            self._discard(session_id, items.pop(name, None))
+
+            if len(data) <= self.memory_limit:
+                items[name] = _Artifact(data=bytes(data))
+            else:
+                path = self._prepare_path(session_id, name)
+                with open(path, "wb") as f:
+                    f.write(data)
+                items[name] = _Artifact(path=path)
+            self._enforce_limits(session_id, name)
+
+    def file_path(self, session_id, name):
+        """
+        Returns a private path for (session_id, name) for exporters that
+        write to disk; the file counts toward the quota once written.
+        """
+        with self._lock:
+            items = self._touch(session_id)
+            self._discard(session_id, items.pop(name, None))
+            path = self._prepare_path(session_id, name)
+            items[name] = _Artifact(path=path)
+            self._enforce_limits(session_id, name)
+            return path
+
+    def _prepare_path(self, session_id, name):
+        path = os.path.join(self._session_dir(session_id), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def get(self, session_id, name):
+        """
+        Returns the artifact's bytes, or None if it is missing or evicted.
+        """
+        with self._lock:
+            if session_id not in self._sessions:
+                return None
+            artifact = self._touch(session_id).get(name)
+
+        if artifact is None:
+            return None
+        if artifact.data is not None:
+            return artifact.data
+        try:
+            with open(artifact.path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def path(self, session_id, name):
+        """
+        Returns the file of an artifact kept on disk (see file_path()), or
+        None if it is missing, evicted or held in memory.
+        """
+        with self._lock:
+            if session_id not in self._sessions:
+                return None
+            artifact = self._touch(session_id).get(name)
+        if artifact is None or artifact.path is None or not os.path.exists(artifact.path):
+            return None
+        return artifact.path
+
+    def open(self, session_id, name):
+        data = self.get(session_id, name)
+        return io.BytesIO(data) if data is not None else None
+
+    def _discard(self, session_id, artifact):
+        if artifact is not None and artifact.path and os.path.exists(artifact.path):
+            os.remove(artifact.path)
+
+    def drop_session(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(a.size for _, items in self._sessions.values() for a in items.values())
+
+    def _enforce_limits(self, session_id, name):
+        now = time.monotonic()
+        expired = [sid for sid, (used, _) in self._sessions.items() if now - used > self.session_ttl]
+        for sid in expired:
+            self.drop_session(sid)
+
+        # Oldest other sessions first, then the writing session's oldest
+        # artifacts; the artifact just written is kept
+        while self.total_bytes() > self.max_bytes:
+            victim = next((sid for sid in self._sessions if sid != session_id), None)
+            if victim is not None:
+                self.drop_session(victim)
+                continue
+            items = self._sessions[session_id][1]
+            oldest = next((n for n in items if n != name), None)
+            if oldest is None:
+                break
+            self._discard(session_id, items.pop(oldest))
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+# ============================================================
+#  RENDERED EXPORT CACHE
+# ============================================================
+
+class RenderCache:
+    """
+    In-memory LRU of rendered exports (PPTX/PDF bytes) keyed by
+    (kind, document hash, content hash), bounded by `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def content_hash(content):
+        payload = json.dumps(content, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+        metrics.record_cache("render", data is not None)
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+render_cache = RenderCache(int(os.getenv("RENDER_CACHE_MAX_BYTES", 64 * 1024 * 1024)))
+
+artifact_store = ArtifactStore(
+    root=os.getenv("ARTIFACT_DIR") or None,
+    max_bytes=int(os.getenv("ARTIFACT_MAX_BYTES", 512 * 1024 * 1024)),
+    session_ttl=float(os.getenv("ARTIFACT_SESSION_TTL", 3600)),
+)
+
+if not os.getenv("ARTIFACT_DIR"):
+    # Only clean up the temp dir we created ourselves
+    atexit.register(artifact_store.close)
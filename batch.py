@@ -0,0 +1,212 @@
+"""
+Batch summarization of many research papers.
+
+Examples:
+    python batch.py papers/ --output results.jsonl --workers 8 --rpm 120
+    python batch.py --manifest papers.txt --output results.jsonl --mode analysis
+
+Results are appended to the JSONL file as each paper finishes. Re-running
+with the same output file skips papers (by document hash) that already have
+an "ok" result, so an interrupted run can simply be restarted.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from context_packing import pack_context
+from gemini_scheduler import BATCH, configure_scheduler
+from pdf_utils import document_hash, extract_pages
+
+
+# ============================================================
+#  INPUT DISCOVERY
+# ============================================================
+
+def find_pdfs(directory, recursive=True):
+    """
+    Returns the PDF paths under a directory, sorted for a stable order.
+    """
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        paths.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(".pdf"))
+        if not recursive:
+            break
+    return paths
+
+
+def read_manifest(manifest_path):
+    """
+    Reads PDF paths from a manifest: one path per line, or JSON lines with a
+    "path" field. Relative paths are resolved against the manifest's folder.
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    paths = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            paths.append(path if os.path.isabs(path) else os.path.join(base, path))
+    return paths
+
+
+def load_completed(output_path):
+    """
+    Returns the document hashes that already have an "ok" result.
+    A truncated last line (from a crash mid-write) is ignored.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["doc_hash"])
+    return completed
+
+
+# ============================================================
+#  PER-DOCUMENT PIPELINE
+# ============================================================
+
+def process_pdf(path, mode, length, style, completed, completed_lock):
+    """
+    Extracts and summarizes one PDF. Returns a result record, or None if the
+    document was already processed.
+    """
+    import summarizer
+    from keywords import record_paper
+    from originality import index_paper
+
+    started = time.monotonic()
+    record = {"path": path}
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        record["doc_hash"] = document_hash(data)
+
+        with completed_lock:
+            if record["doc_hash"] in completed:
+                return None
+            # Claim it so duplicates later in this run are skipped too
+            completed.add(record["doc_hash"])
+
+        pages = extract_pages(data, workers=1)
+        text = "".join(pages)
+        record["pages"] = len(pages)
+        record["chars"] = len(text)
+
+        if not text.strip():
+            raise ValueError("no extractable text (scanned PDF?)")
+        index_paper(text, record["doc_hash"], os.path.basename(path))
+        record_paper(text, record["doc_hash"])
+
+        if mode == "analysis":
+            result = summarizer.analyze_paper(pack_context(text, "analysis"), length, style)
+            if isinstance(result, str):
+                raise RuntimeError(result)
+            record["analysis"] = result
+        else:
+            result = summarizer.summarize_long_text(text, length, style)
+            if summarizer._is_error(result):
+                raise RuntimeError(result)
+            record["summary"] = result
+
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+        # Allow a retry of failed documents on the next run
+        if "doc_hash" in record:
+            with completed_lock:
+                completed.discard(record["doc_hash"])
+
+    record["seconds"] = round(time.monotonic() - started, 3)
+    return record
+
+
+def run_batch(paths, output_path, workers=4, rpm=60, tpm=0, mode="summary", length="Medium", style="Academic"):
+    """
+    Processes `paths` on a worker pool, appending one JSON line per document
+    to `output_path` as soon as it finishes. Returns (ok, failed, skipped).
+    """
+    # Every Gemini call in this process runs in the batch lane under these limits
+    configure_scheduler(
+        requests_per_minute=rpm,
+        tokens_per_minute=tpm,
+        max_concurrency=max(workers, 1) * 2,
+        default_priority=BATCH,
+    )
+
+    completed = load_completed(output_path)
+    completed_lock = threading.Lock()
+    ok = failed = skipped = 0
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_pdf, path, mode, length, style, completed, completed_lock): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            record = future.result()
+            if record is None:
+                skipped += 1
+                continue
+
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+            if record["status"] == "ok":
+                ok += 1
+            else:
+                failed += 1
+            print(f"[{record['status']}] {record['path']} ({record['seconds']}s)", file=sys.stderr)
+
+    return ok, failed, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a directory or manifest of research papers.")
+    parser.add_argument("directory", nargs="?", help="folder to scan for PDFs")
+    parser.add_argument("--manifest", help="file listing PDF paths (one per line or JSON lines with 'path')")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL results file (appended; enables resume)")
+    parser.add_argument("--workers", type=int, default=4, help="documents processed concurrently")
+    parser.add_argument("--rpm", type=float, default=60, help="max Gemini requests per minute (0 = unlimited)")
+    parser.add_argument("--tpm", type=float, default=0, help="max Gemini input tokens per minute (0 = unlimited)")
+    parser.add_argument("--mode", choices=["summary", "analysis"], default="summary")
+    parser.add_argument("--length", choices=["Short", "Medium", "Long"], default="Medium")
+    parser.add_argument("--style", default="Academic")
+    parser.add_argument("--no-recursive", action="store_true", help="only scan the top-level folder")
+    args = parser.parse_args(argv)
+
+    if not args.directory and not args.manifest:
+        parser.error("give a directory or --manifest")
+
+    paths = []
+    if args.directory:
+        paths.extend(find_pdfs(args.directory, recursive=not args.no_recursive))
+    if args.manifest:
+        paths.extend(read_manifest(args.manifest))
+
+    ok, failed, skipped = run_batch(
+        paths, args.output, args.workers, args.rpm, args.tpm, args.mode, args.length, args.style
+    )
+    print(f"✅ {ok} summarized, ❌ {failed} failed, ⏭️ {skipped} already done", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,428 @@
+"""
+Benchmarks for the extraction, prompt-building/parsing and export paths, plus
+the app's button flows end to end against a fake Gemini backend.
+
+    python benchmark.py --save-baseline          # record a baseline on this machine
+    python benchmark.py                          # run and compare to the baseline
+    python benchmark.py --only extraction --pages 10,100,1000 --no-compare
+    python benchmark.py --latency 0.5 --quick --no-compare
+
+Reports throughput, p50/p95 latency, peak Python memory (tracemalloc) and the
+peak RSS of a fresh process running the case once, which also counts native
+allocations such as PyMuPDF's. Cases whose p50 regressed by more than
+--tolerance exit non-zero; a missing baseline is an error unless --no-compare.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(REPO_DIR, "benchmark_baseline.json")
+
+LOREM = (
+    "Deep neural networks have achieved remarkable results across vision and language tasks. "
+    "We propose a method that reduces training cost while preserving accuracy on standard benchmarks. "
+    "Our experiments show consistent improvements over strong baselines with lower latency. "
+)
+
+
+# ============================================================
+#  SYNTHETIC INPUTS
+# ============================================================
+
+def make_synthetic_pdf(pages, path):
+    """
+    Writes a text PDF with `pages` pages of paper-like content.
+    """
+    import fitz
+
+    doc = fitz.open()
+    sections = ["Abstract", "1 Introduction", "2 Related Work", "3 Method", "4 Results", "5 Conclusion"]
+    for n in range(pages):
+        page = doc.new_page()
+        y = 72
+        if n % max(1, pages // len(sections)) == 0:
+            page.insert_text((72, y), sections[(n * len(sections)) // pages], fontsize=14)
+            y += 28
+        box = fitz.Rect(72, y, page.rect.width - 72, page.rect.height - 72)
+        page.insert_textbox(box, LOREM * 12, fontsize=10)
+    doc.save(path)
+    doc.close()
+
+
+SAMPLE_OUTLINE = """
+Title: Efficient Training of Deep Networks
+Authors: A. Author, B. Author
+
+Problem:
+Training large models is expensive.
+Existing methods trade accuracy for speed.
+
+Objectives:
+Reduce training cost.
+Preserve accuracy.
+
+Methodology:
+We prune redundant layers.
+We distill from a teacher.
+We quantize activations.
+
+Results:
+2x faster training.
+Accuracy within 0.3%.
+Lower memory use.
+
+Conclusion:
+Efficient training is practical.
+
+Keywords: pruning, distillation, quantization, efficiency
+"""
+
+
+# ============================================================
+#  MEASUREMENT
+# ============================================================
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def measure_rss(name, group, argv, workdir):
+    """
+    Runs case `name` once in a fresh interpreter and returns its peak RSS in
+    MB (None where unavailable). A separate process keeps the high-water mark
+    of earlier cases out of the number.
+    """
+    if resource is None:
+        return None
+    command = [sys.executable, os.path.abspath(__file__), *argv,
+               "--only", group, "--workdir", workdir, "--rss-case", name]
+    proc = subprocess.run(command, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        print(f"(RSS measurement of {name} failed: {proc.stderr.strip()[-200:]})", file=sys.stderr)
+        return None
+    return json.loads(lines[-1])["rss_mb"]
+
+
+def run_case(name, make, iterations, units=1, unit_name="ops", rss_mb=None):
+    """
+    Times the function returned by `make()` over `iterations` runs (after one
+    warm-up), then measures peak Python memory in one extra traced run.
+    Returns a result dict.
+    """
+    fn = make()
+    fn()  # warm-up (imports, caches of the libraries themselves)
+
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(samples)
+    result = {
+        "name": name,
+        "iterations": iterations,
+        "p50_ms": statistics.median(samples) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "throughput": (units * iterations) / total if total else float("inf"),
+        "unit": f"{unit_name}/s",
+        "peak_mb": peak / (1024 * 1024),
+        "rss_mb": rss_mb,
+    }
+    rss = f"{rss_mb:8.1f} MB" if rss_mb is not None else "       n/a"
+    print(
+        f"{name:34} p50 {result['p50_ms']:9.2f} ms   p95 {result['p95_ms']:9.2f} ms   "
+        f"{result['throughput']:10.1f} {result['unit']:9}  peak {result['peak_mb']:7.2f} MB   rss {rss}"
+    )
+    return result
+
+
+# ============================================================
+#  BENCHMARK GROUPS
+# ============================================================
+
+# Each group returns (name, make, iterations[, units, unit_name]) cases. make()
+# loads the case's inputs and returns the function to time, so a case's
+# inputs exist only while it runs (and only its own in an RSS child).
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def bench_extraction(page_sizes, iterations, workdir):
+    import pdf_utils
+
+    cases = []
+    for pages in page_sizes:
+        path = os.path.join(workdir, f"synthetic_{pages}.pdf")
+        if not os.path.exists(path):
+            make_synthetic_pdf(pages, path)
+
+        def on_bytes(fn, path=path):
+            def make():
+                data = _read(path)
+                return lambda: fn(data)
+            return make
+
+        runs = max(1, iterations if pages <= 100 else iterations // 5)
+        cases.append((
+            f"extract_text_from_pdf[{pages}p]",
+            lambda path=path: lambda: pdf_utils.extract_text_from_pdf(path),
+            runs, pages, "pages",
+        ))
+        cases.append((
+            f"extract_pages[{pages}p,serial]",
+            on_bytes(lambda data: pdf_utils.extract_pages(data, workers=1)),
+            runs, pages, "pages",
+        ))
+        cases.append((
+            f"build_document[{pages}p]",
+            on_bytes(pdf_utils.build_document),
+            runs, pages, "pages",
+        ))
+        if pages >= 2 * pdf_utils.MIN_PAGES_PER_WORKER:
+            cases.append((
+                f"extract_pages[{pages}p,parallel]",
+                on_bytes(pdf_utils.extract_pages),
+                runs, pages, "pages",
+            ))
+    return cases
+
+
+def bench_exports(iterations):
+    import summarizer
+
+    counter = iter(range(10 ** 9))
+    sections = summarizer._parse_ppt_outline(SAMPLE_OUTLINE)
+    summary = LOREM * 20
+
+    # Unique doc_hash per call so the render cache never short-circuits
+    return [
+        (
+            "ppt_outline_parser",
+            lambda: lambda: summarizer._parse_ppt_outline(SAMPLE_OUTLINE * 20),
+            iterations * 10,
+        ),
+        (
+            "ppt_render",
+            lambda: lambda: summarizer._render_ppt(sections, doc_hash=f"bench-{next(counter)}"),
+            iterations,
+        ),
+        (
+            "research_notes_pdf_render",
+            lambda: lambda: summarizer.generate_research_notes_pdf(
+                "Efficient Training of Deep Networks",
+                "pruning, distillation, quantization",
+                summary,
+                "Estimated originality: 92%",
+                "Equations:\n- E = mc^2\n\nAlgorithms:\n- Step 1",
+                doc_hash=f"bench-{next(counter)}",
+            ),
+            iterations,
+        ),
+    ]
+
+
+def bench_flows(iterations, latency, pages, workdir):
+    """
+    Replays the app's button handlers against FakeGeminiModel (no network,
+    no response cache) so prompt building, scheduling, fan-out and rendering
+    costs are measured with a fixed, configurable model latency.
+    """
+    import fake_gemini
+    import pdf_utils
+    import summarizer
+    from context_packing import pack_context
+    from gemini_scheduler import configure_scheduler
+
+    summarizer.model = fake_gemini.FakeGeminiModel(latency=latency, jitter=latency * 0.2, seed=7)
+    configure_scheduler(requests_per_minute=0, max_concurrency=32)
+
+    path = os.path.join(workdir, f"synthetic_{pages}.pdf")
+    if not os.path.exists(path):
+        make_synthetic_pdf(pages, path)
+    counter = iter(range(10 ** 9))
+
+    def flow(fn):
+        # The flows share one upload: the PDF bytes, its hash and its text
+        def make():
+            data = _read(path)
+            text = pdf_utils.extract_text_from_bytes(data)
+            return lambda: fn(data, pdf_utils.document_hash(data), text)
+        return make
+
+    def upload(data, doc_hash, text):
+        pdf_utils.extract_text_cached(data, cache=pdf_utils.ExtractionCache())
+
+    def summary(data, doc_hash, text):
+        "".join(summarizer.summarize_long_text_stream(text, "Medium", "Academic"))
+
+    def question(data, doc_hash, text):
+        summarizer.semantic_search("What is the main contribution?", text, doc_hash)
+
+    def notes(data, doc_hash, text):
+        summarizer.build_research_notes_pdf(pack_context(text, "notes"), doc_hash=f"bench-{next(counter)}")
+
+    def ppt(data, doc_hash, text):
+        summarizer.generate_ppt(pack_context(text, "ppt"), doc_hash=f"bench-{next(counter)}")
+
+    def single_call(data, doc_hash, text):
+        analysis = summarizer.analyze_paper(pack_context(text, "analysis"))
+        key = f"bench-{next(counter)}"
+        summarizer.generate_ppt(pack_context(text, "ppt"), analysis=analysis, doc_hash=key)
+        summarizer.build_research_notes_pdf(pack_context(text, "notes"), analysis=analysis, doc_hash=key)
+
+    suffix = f"[{pages}p,{latency * 1000:.0f}ms]"
+    return [
+        (f"flow_upload{suffix}", flow(upload), iterations),
+        (f"flow_summary{suffix}", flow(summary), iterations),
+        (f"flow_question{suffix}", flow(question), iterations),
+        (f"flow_research_notes{suffix}", flow(notes), iterations),
+        (f"flow_ppt{suffix}", flow(ppt), iterations),
+        (f"flow_single_call_exports{suffix}", flow(single_call), iterations),
+    ]
+
+
+# ============================================================
+#  BASELINES
+# ============================================================
+
+def compare_to_baseline(results, baseline_path, tolerance):
+    """
+    Returns the names of cases whose p50 is more than `tolerance` slower
+    than the stored baseline.
+    """
+
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {case["name"]: case for case in json.load(f)["results"]}
+
+    regressions = []
+    for result in results:
+        before = baseline.get(result["name"])
+        if not before:
+            continue
+        change = result["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+        if change > tolerance:
+            regressions.append(result["name"])
+            print(f"REGRESSION {result['name']}: p50 {before['p50_ms']:.2f} → {result['p50_ms']:.2f} ms ({change:+.0%})")
+    return regressions
+
+
+def save_baseline(results, baseline_path):
+    with open(baseline_path, "w", encoding="utf-8") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version, "results": results}, f, indent=2)
+    print(f"Baseline saved to {baseline_path}")
+
+
+def build_cases(group, args, page_sizes, iterations, workdir):
+    if group == "extraction":
+        return bench_extraction(page_sizes, iterations, workdir)
+    if group == "exports":
+        return bench_exports(iterations)
+    if group == "flows":
+        return bench_flows(iterations, args.latency, args.flow_pages, workdir)
+    raise SystemExit(f"Unknown benchmark group: {group}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extraction, exports and app flows.")
+    parser.add_argument("--only", default="extraction,exports,flows", help="comma-separated groups to run")
+    parser.add_argument("--pages", default="10,100,1000", help="synthetic PDF sizes for extraction")
+    parser.add_argument("--flow-pages", type=int, default=30, help="synthetic PDF size for the app flows")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake Gemini latency in seconds")
+    parser.add_argument("--quick", action="store_true", help="small sizes and few iterations")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--no-compare", action="store_true", help="only report, even without a baseline")
+    parser.add_argument("--no-rss", action="store_true", help="skip the per-case RSS subprocesses")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown vs baseline")
+    # Internal: run one case once in this process and print its peak RSS
+    parser.add_argument("--rss-case", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args = parser.parse_args(argv)
+
+    compare = not (args.save_baseline or args.no_compare or args.rss_case)
+    if compare and not os.path.exists(args.baseline):
+        print(
+            f"No baseline at {args.baseline}. Record one on this machine with --save-baseline, "
+            "or pass --no-compare to only report.",
+            file=sys.stderr,
+        )
+        return 2
+
+    groups = args.only.split(",")
+    page_sizes = [int(p) for p in args.pages.split(",")]
+    iterations = args.iterations
+    if args.quick:
+        page_sizes = [p for p in page_sizes if p <= 100] or page_sizes[:1]
+        iterations = min(iterations, 3)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="summarizer-bench-") as tmp:
+        workdir = args.workdir or tmp
+
+        # Measure real work, not cache hits or network, and keep the
+        # benchmark's papers out of the real indexes
+        os.environ["LLM_CACHE_PATH"] = ""
+        os.environ["RETRIEVAL_INDEX_DIR"] = ""
+        os.environ["ORIGINALITY_INDEX_PATH"] = os.path.join(tmp, "originality.sqlite3")
+        os.environ["KEYWORD_STATS_PATH"] = os.path.join(tmp, "keyword_stats.sqlite3")
+        sys.path.insert(0, REPO_DIR)
+
+        if args.rss_case:
+            for case in build_cases(groups[0], args, page_sizes, iterations, workdir):
+                if case[0] == args.rss_case:
+                    case[1]()()
+                    print(json.dumps({"rss_mb": peak_rss_mb()}))
+                    return 0
+            raise SystemExit(f"Unknown benchmark case: {args.rss_case}")
+
+        # The RSS children share the synthetic PDFs but nothing else
+        for group in groups:
+            for case in build_cases(group, args, page_sizes, iterations, workdir):
+                rss = None if args.no_rss else measure_rss(case[0], group, argv, workdir)
+                results.append(run_case(*case, rss_mb=rss))
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        return 0
+    if not compare:
+        return 0
+    return 1 if compare_to_baseline(results, args.baseline, args.tolerance) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
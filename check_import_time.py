@@ -0,0 +1,92 @@
+"""
+Checks the cold import time of the app's modules against a budget and that
+importing them does not pull in heavy dependencies (those must load lazily).
+
+    python check_import_time.py
+    python check_import_time.py --runs 9 --scale 2.0
+
+Exits non-zero if any module is over budget or imports a heavy dependency.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+# module -> cumulative import-time budget in milliseconds
+IMPORT_BUDGETS_MS = {
+    "summarizer": 100,
+    "llm_cache": 60,
+    "gemini_scheduler": 40,
+    "chunking": 20,
+    "artifacts": 40,
+    "metrics": 20,
+    "model_routing": 60,
+}
+
+HEAVY_MODULES = ["google.generativeai", "streamlit", "pptx", "reportlab", "numpy", "dotenv"]
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_import(module):
+    """
+    Imports `module` in a fresh interpreter. Returns (milliseconds, heavy
+    modules that ended up loaded).
+    """
+    code = (
+        "import json, sys\n"
+        f"import {module}\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    micros = None
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            micros = int(parts[1])
+    return micros / 1000.0, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def check(runs=5, scale=1.0):
+    failures = []
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        samples = []
+        heavy = []
+        for _ in range(runs):
+            ms, heavy = measure_import(module)
+            samples.append(ms)
+
+        median = statistics.median(samples)
+        limit = budget * scale
+        ok = median <= limit and not heavy
+        status = "ok" if ok else "FAIL"
+        print(f"{status:4}  {module:18} {median:8.1f} ms  (budget {limit:.0f} ms)" + (f"  heavy: {', '.join(heavy)}" if heavy else ""))
+        if not ok:
+            failures.append(module)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check module import times against a budget.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module (median is used)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget (slow CI machines)")
+    args = parser.parse_args(argv)
+
+    failures = check(args.runs, args.scale)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import re
+
+
+# Rough average for English prose with Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+# Numbered headings ("3.1 Results") or common unnumbered section names
+SECTION_HEADING_RE = re.compile(
+    r"^\s*(?:"
+    r"\d+(?:\.\d+)*\.?\s+[A-Z][^\n]{0,80}"
+    r"|(?:abstract|introduction|related work|background|methods?|methodology|"
+    r"experiments?|results?|discussion|conclusions?|references|acknowledg(?:e)?ments?)\b[^\n]{0,40}"
+    r")\s*$",
+    re.IGNORECASE,
+)
+
+# Numbered headings must name the section ("2.1 Notations"), which rules out
+# running headers ("3612 V. K. Mishra") and equation fragments ("2 log(").
+# Group 1 is the section number. Shared by the layout model and the packer.
+NUMBERED_HEADING_RE = re.compile(r"^(\d+(?:\.\d+)*)\.?\s+[A-Z][A-Za-z]{2,}(?:[\s:&,-]+[A-Za-z][A-Za-z-]*){0,10}$")
+
+
+def mask_digits(line):
+    """
+    The stripped line with digit runs replaced by "#", so running headers
+    like "Page 3 - Journal" and "Page 4 - Journal" compare equal.
+    """
+    return re.sub(r"\d+", "#", line.strip())
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate used for budgeting prompts (no tokenizer call).
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def is_section_heading(line):
+    return bool(SECTION_HEADING_RE.match(line)) and len(line.strip()) < 100
+
+
+def _blocks(text):
+    """
+    Splits text into blocks at page breaks, blank lines and section headings.
+    Yields (block_text, starts_section).
+    """
+    block = []
+    starts_section = False
+
+    for line in text.replace("\f", "\n\n").splitlines():
+        heading = is_section_heading(line)
+        if (not line.strip() or heading) and block:
+            yield "\n".join(block), starts_section
+            block = []
+            starts_section = False
+        if heading:
+            starts_section = True
+        if line.strip():
+            block.append(line.rstrip())
+
+    if block:
+        yield "\n".join(block), starts_section
+
+
+def _split_oversized(block, max_chars):
+    # Break on line boundaries first, then hard-cut anything still too long
+    piece = ""
+    for line in block.splitlines():
+        while len(line) > max_chars:
+            if piece:
+                yield piece
+                piece = ""
+            yield line[:max_chars]
+            line = line[max_chars:]
+        if piece and len(piece) + len(line) + 1 > max_chars:
+            yield piece
+            piece = ""
+        piece = f"{piece}\n{line}" if piece else line
+    if piece:
+        yield piece
+
+
+def split_into_chunks(text, max_tokens=3000):
+    """
+    Splits text into chunks of at most `max_tokens` (estimated), preferring to
+    break at section headings, page breaks and paragraph boundaries.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    current_len = 0
+
+    def flush():
+        nonlocal current, current_len
+        if current:
+            chunks.append("\n\n".join(current))
+        current = []
+        current_len = 0
+
+    for block, starts_section in _blocks(text):
+        # Start a new chunk at a section heading once the current one is half full
+        if starts_section and current_len >= max_chars // 2:
+            flush()
+
+        for piece in _split_oversized(block, max_chars):
+            if current and current_len + len(piece) + 2 > max_chars:
+                flush()
+            current.append(piece)
+            current_len += len(piece) + 2
+
+    flush()
+    return chunks
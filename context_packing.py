@@ -0,0 +1,301 @@
+import hashlib
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from chunking import CHARS_PER_TOKEN, NUMBERED_HEADING_RE, estimate_tokens, is_section_heading, mask_digits
+
+
+# ============================================================
+#  CLEANING (PAGE MARKERS, HEADERS/FOOTERS, REFERENCES)
+# ============================================================
+
+PAGE_MARKER_RE = re.compile(r"^\s*-{2,}\s*Page\s+\d+\s*-{2,}\s*$", re.IGNORECASE)
+PAGE_NUMBER_RE = re.compile(r"^\s*(?:page\s+)?\d{1,4}(?:\s*(?:/|of)\s*\d{1,4})?\s*$", re.IGNORECASE)
+REFERENCES_RE = re.compile(r"^\s*(?:\d+\.?\s+)?(?:references|bibliography|works cited)\s*$", re.IGNORECASE)
+
+# A short line on at least this share of pages is a running header/footer
+REPEATED_LINE_SHARE = 0.5
+CHARS_PER_PAGE = 3000
+
+
+def is_heading(line):
+    stripped = line.strip()
+    if not is_section_heading(stripped):
+        return False
+    return not stripped[0].isdigit() or bool(NUMBERED_HEADING_RE.match(stripped))
+
+
+def clean_text(text, boilerplate=True):
+    """
+    Removes page markers, page numbers, running headers/footers and the
+    reference list; re-joins hyphenated line breaks and collapses whitespace.
+    With `boilerplate=False` (text already cleaned by layout analysis) only
+    page numbers and whitespace are handled.
+    """
+    lines = text.replace("\f", "\n").splitlines()
+    if not boilerplate:
+        return _normalize("\n".join(line.strip() for line in lines if not PAGE_NUMBER_RE.match(line)))
+
+    pages = sum(1 for line in lines if PAGE_MARKER_RE.match(line)) or len(text) // CHARS_PER_PAGE + 1
+    min_repeats = max(3, int(pages * REPEATED_LINE_SHARE))
+    # Compare lines with digits masked so "Page 3 - Journal" matches "Page 4 - Journal"
+    counts = Counter(mask_digits(line) for line in lines if 0 < len(line.strip()) <= 80)
+    repeated = {line for line, n in counts.items() if n >= min_repeats}
+
+    kept = []
+    for line in lines:
+        stripped = line.strip()
+        if PAGE_MARKER_RE.match(stripped) or PAGE_NUMBER_RE.match(stripped):
+            continue
+        if len(stripped) <= 80 and mask_digits(stripped) in repeated:
+            continue
+        kept.append(stripped)
+
+    # Drop the reference list when it starts in the second half of the paper
+    for i in range(len(kept) - 1, len(kept) // 2 - 1, -1):
+        if REFERENCES_RE.match(kept[i]):
+            kept = kept[:i]
+            break
+
+    return _normalize("\n".join(kept))
+
+
+def _normalize(text):
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+# ============================================================
+#  SECTIONS & TASK PRIORITIES
+# ============================================================
+
+SECTION_KINDS = [
+    ("abstract", ("abstract", "summary")),
+    ("introduction", ("introduction", "motivation", "overview")),
+    ("related", ("related work", "background", "literature", "prior work")),
+    ("methods", ("method", "approach", "model", "algorithm", "architecture", "design", "framework", "proposed")),
+    ("results", ("result", "experiment", "evaluation", "analysis", "performance", "ablation")),
+    ("discussion", ("discussion", "limitation", "future work")),
+    ("conclusion", ("conclusion", "concluding")),
+    ("appendix", ("appendix", "supplementary")),
+    ("acknowledgments", ("acknowledg",)),
+    ("references", ("references", "bibliography", "works cited")),
+]
+
+# Never worth sending to the model
+EXCLUDED_KINDS = {"references", "acknowledgments"}
+
+# Relative value of each section per task; 0 leaves it out entirely.
+# "front" is everything before the first heading (title, authors, abstract).
+TASK_WEIGHTS = {
+    "title": {"front": 1.0},
+    "keywords": {"front": 1.0, "abstract": 1.0, "introduction": 0.6, "methods": 0.5, "results": 0.3,
+                 "conclusion": 0.5, "other": 0.2},
+    "summary": {"front": 0.8, "abstract": 1.0, "introduction": 0.5, "methods": 0.8, "results": 1.0,
+                "discussion": 0.5, "conclusion": 1.0, "related": 0.1, "other": 0.3},
+    "plagiarism": {"front": 0.5, "abstract": 0.6, "introduction": 0.8, "related": 0.8, "methods": 0.8,
+                   "results": 0.6, "discussion": 0.6, "conclusion": 0.5, "other": 0.5},
+    "algorithms": {"front": 0.2, "abstract": 0.3, "methods": 1.0, "results": 0.4, "appendix": 0.6, "other": 0.4},
+    "ppt": {"front": 1.0, "abstract": 1.0, "introduction": 0.6, "methods": 0.9, "results": 1.0,
+            "conclusion": 0.9, "discussion": 0.3, "other": 0.2},
+    "analysis": {"front": 1.0, "abstract": 1.0, "introduction": 0.5, "methods": 1.0, "results": 1.0,
+                 "discussion": 0.4, "conclusion": 0.9, "appendix": 0.3, "related": 0.1, "other": 0.3},
+}
+TASK_WEIGHTS["notes"] = TASK_WEIGHTS["analysis"]
+
+# Default token budget per task (override with CONTEXT_BUDGET_<TASK>)
+TASK_BUDGETS = {
+    "title": 600,
+    "keywords": 1500,
+    "summary": 2500,
+    "plagiarism": 2000,
+    "algorithms": 3000,
+    "ppt": 2500,
+    "analysis": 3000,
+    "notes": 3000,
+}
+
+
+def section_kind(heading):
+    # Strip numbering ("3.2 Experimental Results") before matching
+    name = re.sub(r"^[\d.\s]+", "", heading or "").lower()
+    for kind, words in SECTION_KINDS:
+        if any(name.startswith(w) or f" {w}" in name for w in words):
+            return kind
+    return "other"
+
+
+class Section:
+    __slots__ = ("index", "heading", "kind", "text")
+
+    def __init__(self, index, heading, kind, text):
+        self.index = index
+        self.heading = heading
+        self.kind = kind
+        self.text = text
+
+
+# Sections of the last few plain texts, keyed by a digest of the text so the
+# cache never keeps a paper's text alive
+SECTION_CACHE_SIZE = 4
+_text_sections = OrderedDict()
+_text_sections_lock = threading.Lock()
+
+
+def split_sections(text):
+    """
+    Cleans `text` and splits it at section headings. Returns a tuple of
+    Sections in document order; memoized for repeated calls on one paper.
+    """
+    key = hashlib.sha1(text.encode("utf-8", "surrogatepass")).digest()
+    with _text_sections_lock:
+        sections = _text_sections.get(key)
+        if sections is not None:
+            _text_sections.move_to_end(key)
+            return sections
+
+    sections = _split_sections(text)
+    with _text_sections_lock:
+        _text_sections[key] = sections
+        while len(_text_sections) > SECTION_CACHE_SIZE:
+            _text_sections.popitem(last=False)
+    return sections
+
+
+def _split_sections(text):
+    sections = []
+    heading, kind, body = None, "front", []
+
+    def flush():
+        if body or heading:
+            sections.append(Section(len(sections), heading, kind, "\n".join(body).strip()))
+
+    for line in clean_text(text).splitlines():
+        if is_heading(line):
+            flush()
+            heading, kind, body = line.strip(), section_kind(line), []
+        else:
+            body.append(line)
+    flush()
+    return tuple(sections)
+
+
+def document_sections(document):
+    """
+    Sections of a pdf_utils.Document (layout-detected headings) in the same
+    form as split_sections(); memoized on the document itself.
+    """
+    sections = document.derived.get("packing_sections")
+    if sections is None:
+        sections = document.derived["packing_sections"] = _document_sections(document)
+    return sections
+
+
+def _document_sections(document):
+    sections = []
+    front = document.front_matter
+    if front:
+        sections.append(Section(0, None, "front", clean_text(front, boilerplate=False)))
+    for detected in document.sections:
+        body = clean_text(document.section_text(detected), boilerplate=False)
+        sections.append(Section(len(sections), detected.heading, section_kind(detected.heading), body))
+    return tuple(sections)
+
+
+# ============================================================
+#  PACKING
+# ============================================================
+
+def budget_for(task):
+    override = os.getenv(f"CONTEXT_BUDGET_{task.upper()}")
+    return int(override) if override else TASK_BUDGETS.get(task, 2500)
+
+
+def _truncate(text, max_chars):
+    """
+    Keeps the leading paragraphs of `text` that fit in `max_chars`, cutting the
+    last one at a sentence boundary when possible.
+    """
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    for boundary in ("\n\n", ". ", "\n"):
+        pos = cut.rfind(boundary)
+        if pos >= max_chars // 2:
+            return cut[:pos + 1].rstrip()
+    return cut.rstrip()
+
+
+def _allocate(needs, weights, budget):
+    """
+    Splits `budget` across sections in proportion to their weights; sections
+    that need less than their share give the remainder to the others.
+    """
+    alloc = {}
+    active = {i for i, w in weights.items() if w > 0}
+    remaining = budget
+
+    while active and remaining > 0:
+        total = sum(weights[i] for i in active)
+        satisfied = {i for i in active if needs[i] <= remaining * weights[i] / total}
+        if not satisfied:
+            for i in active:
+                alloc[i] = int(remaining * weights[i] / total)
+            break
+        for i in satisfied:
+            alloc[i] = needs[i]
+            remaining -= needs[i]
+        active -= satisfied
+    return alloc
+
+
+def pack_context(text, task="summary", max_tokens=None):
+    """
+    Returns the most useful parts of a paper (text or a pdf_utils.Document)
+    for `task` within `max_tokens` (default: the task's budget). Boilerplate
+    and references are removed, sections are ranked by their value for the
+    task and the budget is shared among them; the result keeps document
+    order and headings.
+    """
+    max_tokens = max_tokens or budget_for(task)
+    # A pdf_utils.Document brings layout-detected sections; plain text is split by regex
+    sections = document_sections(text) if hasattr(text, "sections") else split_sections(text)
+    if not sections:
+        return ""
+
+    weights_by_kind = TASK_WEIGHTS.get(task, TASK_WEIGHTS["summary"])
+    weights = {
+        s.index: 0.0 if s.kind in EXCLUDED_KINDS else weights_by_kind.get(s.kind, weights_by_kind.get("other", 0.0))
+        for s in sections
+    }
+
+    rendered = {
+        s.index: f"{s.heading}\n{s.text}".strip() if s.heading else s.text
+        for s in sections if s.kind not in EXCLUDED_KINDS
+    }
+    if weights_by_kind.get("other") and sum(estimate_tokens(r) for r in rendered.values()) <= max_tokens:
+        # Everything fits: send the cleaned paper as is
+        return "\n\n".join(rendered.values())
+
+    needs = {i: estimate_tokens(r) for i, r in rendered.items()}
+    weights = {i: w for i, w in weights.items() if i in rendered}
+    alloc = _allocate(needs, weights, max_tokens)
+
+    parts = []
+    for section in sections:
+        if section.index not in rendered:
+            continue
+        tokens = alloc.get(section.index, 0)
+        # Not worth including a heading with a sliver of text
+        if tokens < min(needs[section.index], 40):
+            continue
+        parts.append(_truncate(rendered[section.index], tokens * CHARS_PER_TOKEN))
+
+    if not parts:
+        # No section is relevant to the task: fall back to the start of the paper
+        return _truncate("\n\n".join(rendered.values()), max_tokens * CHARS_PER_TOKEN)
+    return "\n\n".join(parts)
@@ -0,0 +1,222 @@
+import re
+
+from chunking import CHARS_PER_TOKEN
+from context_packing import PAGE_MARKER_RE, budget_for
+
+
+# ============================================================
+#  LOCAL EQUATION & ALGORITHM DETECTION
+# ============================================================
+
+# Operators, relations, Greek letters and the Unicode math blocks
+MATH_SYMBOL_RE = re.compile(
+    "[=<>+±×÷·∑∏∫√∞∂∇≤≥≈≠≡∈∉⊂⊆∪∩∀∃→⇒⇔^_|{}"
+    "Ͱ-Ͽ∀-⋿℀-⅏⟀-⟯\U0001d400-\U0001d7ff]"
+)
+# "… (3)" / "(2.1)" at the end of a display line
+EQUATION_NUMBER_RE = re.compile(r"(?:\s{2,}|…|\.{2,}|^)\s*\(\s*(\d{1,3}(?:\.\d{1,3})?[a-z]?)\s*\)\s*$")
+PROSE_WORD_RE = re.compile(r"[A-Za-z]{4,}")
+
+ALGORITHM_START_RE = re.compile(
+    r"^\s*(?:algorithm|procedure|pseudo-?code)\s+\d+\b|^\s*(?:input|require)\s*:|^\s*step\s*1\s*[:.)]",
+    re.IGNORECASE,
+)
+PSEUDOCODE_RE = re.compile(
+    r"^\s*(?:\d+[:.)]\s*)?(?:step\s*\d+|for|while|if|else|elif|end|return|repeat|until|do|then|output|ensure)\b",
+    re.IGNORECASE,
+)
+
+# Symbol-font glyphs that PyMuPDF reports in the private use area (U+F0xx)
+_SYMBOL_GREEK = dict(zip(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz",
+    "ΑΒΧΔΕΦΓΗΙϑΚΛΜΝΟΠΘΡΣΤΥςΩΞΨΖαβχδεφγηιϕκλμνοπθρστυϖωξψζ",
+))
+_SYMBOL_HIGH = {
+    0xA3: "≤", 0xA5: "∞", 0xAE: "→", 0xB0: "°", 0xB1: "±", 0xB3: "≥", 0xB4: "×", 0xB6: "∂", 0xB7: "•",
+    0xB8: "÷", 0xB9: "≠", 0xBA: "≡", 0xBB: "≈", 0xC5: "⊕", 0xCE: "∈", 0xD1: "∇", 0xD5: "∏", 0xD6: "√",
+    0xDE: "⇒", 0xE5: "∑", 0xF2: "∫", 0xE6: "(", 0xE9: "[", 0xEC: "{", 0xF6: ")", 0xF9: "]", 0xFC: "}",
+}
+SYMBOL_FONT_MAP = {}
+for _code in range(0x20, 0x100):
+    _char = chr(_code)
+    if _code < 0x7F:
+        SYMBOL_FONT_MAP[0xF000 + _code] = _SYMBOL_GREEK.get(_char, _char.replace("-", "−"))
+    else:
+        # Unlisted codes are mostly pieces of tall brackets; drop them
+        SYMBOL_FONT_MAP[0xF000 + _code] = _SYMBOL_HIGH.get(_code, "")
+
+MIN_EQUATION_CHARS = 8
+MAX_EQUATION_CHARS = 800
+MAX_ALGORITHM_CHARS = 1500
+CONTEXT_CHARS = 160
+
+
+class Candidate:
+    """
+    A math-dense span ("equation") or an algorithm / step-by-step procedure
+    found in the paper. `page` is 0-based (None when the text carries no
+    page information); `labels` are equation numbers seen in the span.
+    """
+
+    __slots__ = ("kind", "page", "text", "context", "labels", "score", "order")
+
+    def __init__(self, kind, page, text, context, labels, score, order):
+        self.kind = kind
+        self.page = page
+        self.text = text
+        self.context = context
+        self.labels = labels
+        self.score = score
+        self.order = order
+
+
+def _units(source):
+    """
+    Yields (page, line, math_font_share) for a pdf_utils.Document (using its
+    font information) or for plain text (pages from "--- Page N ---" markers).
+    """
+    if hasattr(source, "paragraphs"):
+        for paragraph in source.paragraphs:
+            text = source.text[paragraph.start:paragraph.end]
+            lines = text.split("\n")
+            # Font share is per paragraph; only trust it for short display blocks
+            chars = len("".join(text.split())) or 1
+            share = paragraph.math_chars / chars if len(lines) <= 3 else 0.0
+            for line in lines:
+                yield paragraph.page, line.translate(SYMBOL_FONT_MAP), share
+        return
+
+    page = None
+    for line in source.splitlines():
+        if PAGE_MARKER_RE.match(line):
+            page = int(re.search(r"\d+", line).group()) - 1
+            continue
+        yield page, line.translate(SYMBOL_FONT_MAP), 0.0
+
+
+def _classify(line, math_share):
+    """
+    Returns ("math" | "fragment" | "prose" | None, equation number or None).
+    """
+    compact = "".join(line.split())
+    if not compact:
+        return None, None
+    symbols = len(MATH_SYMBOL_RE.findall(compact))
+    prose = sum(len(w) for w in PROSE_WORD_RE.findall(line)) / len(compact)
+    number = EQUATION_NUMBER_RE.search(line)
+    label = number.group(1) if number and prose < 0.5 else None
+
+    if label or (prose < 0.6 and (symbols / len(compact) >= 0.12 or math_share >= 0.3)):
+        return "math", label
+    # Display equations come out of PDFs as many tiny pieces ("dI", "( )", "1")
+    if len(compact) <= 6 and prose == 0:
+        return "fragment", None
+    return "prose", None
+
+
+def find_candidates(source):
+    """
+    Scans the whole paper (Document or text) and returns its equation and
+    algorithm Candidates in document order.
+    """
+    candidates = []
+    current = None
+    pending = []  # fragments that may open the next equation
+    last_prose = ""
+
+    def close():
+        nonlocal current
+        if current is not None:
+            joiner = "\n" if current["kind"] == "algorithm" else " "
+            text = joiner.join(" ".join(line.split()) for line in current["lines"]).strip()
+            # Stray symbols from definition lists ("• L", "t ≥ 0") are not worth sending
+            if current["kind"] == "equation" and len("".join(text.split())) < MIN_EQUATION_CHARS:
+                current = None
+                return
+            score = current["strong"] + 2 * len(current["labels"]) + (5 if current["kind"] == "algorithm" else 0)
+            candidates.append(Candidate(
+                current["kind"], current["page"], text, current["context"],
+                current["labels"], score, len(candidates),
+            ))
+        current = None
+
+    def start(kind, page, lines):
+        nonlocal current
+        close()
+        current = {"kind": kind, "page": page, "lines": list(lines), "strong": 0, "labels": [],
+                   "context": last_prose[-CONTEXT_CHARS:].strip(), "chars": sum(len(l) for l in lines)}
+
+    for page, line, math_share in _units(source):
+        if current is not None and current["page"] != page:
+            close()
+            pending = []
+
+        if ALGORITHM_START_RE.match(line):
+            start("algorithm", page, [line])
+            current["strong"] += 1
+            continue
+
+        kind, label = _classify(line, math_share)
+        if kind is None:
+            continue
+
+        if current is not None and current["kind"] == "algorithm":
+            long_prose = kind == "prose" and len(line.strip()) > 120 and not PSEUDOCODE_RE.match(line)
+            if not long_prose and current["chars"] + len(line) <= MAX_ALGORITHM_CHARS:
+                current["lines"].append(line)
+                current["chars"] += len(line)
+                if label:
+                    current["labels"].append(label)
+                continue
+            close()
+
+        if kind == "math":
+            if current is None or current["chars"] + len(line) > MAX_EQUATION_CHARS:
+                start("equation", page, [text for p, text in pending if p == page][-8:])
+            current["lines"].append(line)
+            current["chars"] += len(line)
+            current["strong"] += 1
+            if label:
+                current["labels"].append(label)
+            pending = []
+        elif kind == "fragment":
+            if current is not None:
+                current["lines"].append(line)
+                current["chars"] += len(line)
+            else:
+                pending.append((page, line))
+        else:
+            close()
+            pending = []
+            last_prose = f"{last_prose} {line.strip()}"[-CONTEXT_CHARS * 2:]
+    close()
+    return candidates
+
+
+def select_candidates(candidates, max_tokens=None):
+    """
+    Keeps the highest-scoring candidates that fit the "algorithms" context
+    budget, returned in document order.
+    """
+    budget = (max_tokens or budget_for("algorithms")) * CHARS_PER_TOKEN
+    chosen, used = [], 0
+    for candidate in sorted(candidates, key=lambda c: -c.score):
+        size = len(candidate.text) + len(candidate.context) + 40
+        if used + size > budget:
+            continue
+        chosen.append(candidate)
+        used += size
+    return sorted(chosen, key=lambda c: c.order)
+
+
+def format_snippets(candidates):
+    """
+    Numbered snippets with page references for the extraction prompt.
+    """
+    blocks = []
+    for i, c in enumerate(candidates, 1):
+        where = f"p. {c.page + 1}" if c.page is not None else "page unknown"
+        labels = f", equation ({'), ('.join(c.labels)})" if c.labels else ""
+        context = f"\nContext: ...{c.context}" if c.context else ""
+        blocks.append(f"[{i}] {c.kind}, {where}{labels}{context}\n{c.text}")
+    return "\n\n".join(blocks)
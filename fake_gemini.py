@@ -0,0 +1,101 @@
+import json
+import random
+import threading
+import time
+
+
+# ============================================================
+#  LOCAL FAKE GEMINI MODEL (TESTING / BENCHMARKS)
+# ============================================================
+
+class FakeRateLimitError(Exception):
+    """
+    Stands in for google.api_core's ResourceExhausted (HTTP 429).
+    """
+
+    code = 429
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    def __init__(self, text, prompt):
+        self.text = text
+        self.usage_metadata = FakeUsage(len(prompt) // 4, len(text) // 4)
+
+
+FAKE_ANALYSIS = {
+    "title": "A Fake Paper Title",
+    "authors": "A. Author, B. Author",
+    "keywords": ["fake", "benchmark", "summarization"],
+    "summary": "This fake paper studies fake things and reports fake results.",
+    "problem": "Fake problem statement.",
+    "objectives": "Fake objectives.",
+    "methodology": "Fake methodology.",
+    "results": "Fake results.",
+    "conclusion": "Fake conclusion.",
+    "equations": ["E = mc^2"],
+    "algorithms": ["Step 1: fake", "Step 2: also fake"],
+}
+
+
+def default_responder(prompt, generation_config=None):
+    if (generation_config or {}).get("response_mime_type") == "application/json":
+        return json.dumps(FAKE_ANALYSIS)
+    words = " ".join(prompt.split()[:12])
+    return f"Fake response to: {words} ..."
+
+
+class FakeGeminiModel:
+    """
+    Drop-in replacement for genai.GenerativeModel with configurable latency
+    (`latency` ± `jitter` seconds) and injected 429 errors (probability
+    `rate_limit_prob`). `responder(prompt, generation_config)` builds replies.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        rate_limit_prob=0.0,
+        responder=None,
+        model_name="models/fake-gemini",
+        seed=None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_prob = rate_limit_prob
+        self.responder = responder or default_responder
+        self.model_name = model_name
+        self.calls = 0
+        self.rate_limited = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay_and_maybe_fail(self):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.rate_limit_prob
+            if fail:
+                self.rate_limited += 1
+        time.sleep(delay)
+        if fail:
+            raise FakeRateLimitError("429 Resource has been exhausted (fake)")
+
+    def generate_content(self, prompt, stream=False, generation_config=None, **kwargs):
+        self._delay_and_maybe_fail()
+        text = self.responder(prompt, generation_config)
+
+        if not stream:
+            return FakeResponse(text, prompt)
+
+        # Stream word by word
+        words = text.split(" ")
+        pieces = [word + " " for word in words[:-1]] + words[-1:]
+        return iter(FakeResponse(piece, "") for piece in pieces)
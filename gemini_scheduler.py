@@ -0,0 +1,269 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+from chunking import estimate_tokens
+
+
+# ============================================================
+#  CLIENT-SIDE SCHEDULER FOR GEMINI REQUESTS
+# ============================================================
+
+# Priority lanes: lower runs first
+INTERACTIVE = 0  # Q&A and other calls a user is actively waiting on
+NORMAL = 1       # regular button actions
+BATCH = 2        # batch.py and background work
+
+RETRYABLE_CODES = {429, 500, 503, 504}
+RETRYABLE_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+}
+
+
+def is_retryable(error):
+    """
+    True for rate limits (429) and transient server errors. Checked by status
+    code / class name so google.api_core need not be imported.
+    """
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code)  # grpc/http status enums
+    if code in RETRYABLE_CODES:
+        return True
+    if type(error).__name__ in RETRYABLE_NAMES:
+        return True
+    return "429" in str(error)
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units per minute up to `capacity`. `reserve` takes
+    units immediately (possibly going negative) and returns how long the
+    caller must wait, so concurrent callers queue fairly.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+
+class RequestScheduler:
+    """
+    Runs Gemini calls under shared limits: a requests/min and a tokens/min
+    bucket, a concurrency cap granted in priority order, and retries of
+    rate-limit/transient errors with exponential backoff and full jitter.
+
+    A limit of 0 disables it.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=60,
+        tokens_per_minute=0,
+        max_concurrency=8,
+        max_retries=5,
+        base_delay=1.0,
+        max_delay=32.0,
+        default_priority=NORMAL,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.default_priority = default_priority
+
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._active = 0
+        self._random = random.Random()
+        self._stats = {"calls": 0, "retries": 0, "failures": 0, "throttled_seconds": 0.0}
+
+    # --- concurrency slots, granted by (priority, arrival order)
+
+    def _acquire_slot(self, priority):
+        ticket = (priority, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while self._waiting[0] != ticket or (
+                self.max_concurrency and self._active >= self.max_concurrency
+            ):
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._active += 1
+            self._cond.notify_all()
+
+    def _release_slot(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _throttle(self, tokens):
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket and tokens:
+            wait = max(wait, self.token_bucket.reserve(tokens))
+        if wait > 0:
+            with self._cond:
+                self._stats["throttled_seconds"] += wait
+            time.sleep(wait)
+
+    def backoff_delay(self, attempt):
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn, priority=None, tokens=0):
+        """
+        Runs `fn()` under the scheduler's limits and returns its result,
+        retrying retryable errors. The last error is re-raised.
+        """
+        priority = self.default_priority if priority is None else priority
+
+        for attempt in range(self.max_retries + 1):
+            self._acquire_slot(priority)
+            try:
+                self._throttle(tokens)
+                with self._cond:
+                    self._stats["calls"] += 1
+                return fn()
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    with self._cond:
+                        self._stats["failures"] += 1
+                    raise
+            finally:
+                self._release_slot()
+
+            # Back off outside the slot so other requests can proceed
+            with self._cond:
+                self._stats["retries"] += 1
+            time.sleep(self.backoff_delay(attempt))
+
+    def stream(self, fn, priority=None, tokens=0):
+        """
+        Generator counterpart of call() for streamed responses: `fn()` returns
+        an iterator of chunks, and the concurrency slot is held until it is
+        exhausted or closed. Retryable errors raised before the first chunk
+        are retried; later ones propagate, since chunks already yielded
+        can't be taken back.
+        """
+        priority = self.default_priority if priority is None else priority
+
+        for attempt in range(self.max_retries + 1):
+            self._acquire_slot(priority)
+            started = False
+            try:
+                self._throttle(tokens)
+                with self._cond:
+                    self._stats["calls"] += 1
+                for chunk in fn():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or not is_retryable(e) or attempt == self.max_retries:
+                    with self._cond:
+                        self._stats["failures"] += 1
+                    raise
+            finally:
+                self._release_slot()
+
+            with self._cond:
+                self._stats["retries"] += 1
+            time.sleep(self.backoff_delay(attempt))
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, active=self._active, waiting=len(self._waiting))
+
+
+class ScheduledModel:
+    """
+    Wraps a Gemini model so generate_content goes through a scheduler in a
+    given priority lane. Exposes the wrapped model's name for cache keys.
+    """
+
+    def __init__(self, model, scheduler, priority=None):
+        self._model = model
+        self._scheduler = scheduler
+        self._priority = priority
+        self.model_name = getattr(model, "model_name", type(model).__name__)
+
+    def generate_content(self, prompt, **kwargs):
+        run = self._scheduler.stream if kwargs.get("stream") else self._scheduler.call
+        return run(
+            lambda: self._model.generate_content(prompt, **kwargs),
+            priority=self._priority,
+            tokens=estimate_tokens(prompt) if isinstance(prompt, str) else 0,
+        )
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _settings_from_env():
+    return {
+        "requests_per_minute": float(os.getenv("GEMINI_RPM", 60)),
+        "tokens_per_minute": float(os.getenv("GEMINI_TPM", 0)),
+        "max_concurrency": int(os.getenv("GEMINI_MAX_CONCURRENCY", 8)),
+        "max_retries": int(os.getenv("GEMINI_MAX_RETRIES", 5)),
+    }
+
+
+def get_scheduler():
+    """
+    Returns the process-wide scheduler, configured from GEMINI_RPM,
+    GEMINI_TPM, GEMINI_MAX_CONCURRENCY and GEMINI_MAX_RETRIES.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(**_settings_from_env())
+        return _scheduler
+
+
+def share_limits(processes):
+    """
+    Splits GEMINI_RPM / GEMINI_TPM evenly across `processes` processes that
+    share one API key (e.g. the app and its job workers): this process's
+    scheduler gets its share, and the returned environment gives another
+    process the same share.
+    """
+    settings = _settings_from_env()
+    settings["requests_per_minute"] /= processes
+    settings["tokens_per_minute"] /= processes
+    configure_scheduler(**settings)
+    return {
+        "GEMINI_RPM": repr(settings["requests_per_minute"]),
+        "GEMINI_TPM": repr(settings["tokens_per_minute"]),
+    }
+
+
+def configure_scheduler(**kwargs):
+    """
+    Replaces the process-wide scheduler (e.g. batch.py's --rpm option).
+    """
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = RequestScheduler(**kwargs)
+        return _scheduler
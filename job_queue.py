@@ -0,0 +1,492 @@
+"""
+Local background job queue: jobs are rows in a SQLite file and a pool of
+worker processes claims and runs them, so slow Gemini work survives a
+Streamlit rerun or a user navigating away. No external broker is needed.
+
+    python job_queue.py --workers 4     # run a standalone worker pool
+
+The app starts its own workers (JOB_WORKERS) and submits exports with
+get_default_queue().submit(kind, payload, user_id).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+
+from gemini_scheduler import share_limits
+
+
+# ============================================================
+#  SQLITE JOB QUEUE
+# ============================================================
+
+DEFAULT_QUEUE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".job_queue.sqlite3"
+)
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+def _encode_result(result):
+    if isinstance(result, bytes):
+        return "bytes", result
+    if isinstance(result, str):
+        return "text", result.encode("utf-8")
+    return "json", json.dumps(result).encode("utf-8")
+
+
+def _decode_result(result_type, blob):
+    if blob is None:
+        return None
+    if result_type == "bytes":
+        return bytes(blob)
+    if result_type == "text":
+        return bytes(blob).decode("utf-8")
+    return json.loads(bytes(blob).decode("utf-8"))
+
+
+class JobQueue:
+    """
+    Persistent job queue in SQLite, safe to share between processes.
+
+    Jobs are claimed in (priority, age) order, but a user never has more than
+    `max_running_per_user` jobs running at once. Failed jobs are retried with
+    exponential backoff up to their `max_attempts`. A running job whose worker
+    stops heart-beating for `lease_seconds` is handed to another worker.
+    Finished jobs are deleted after `result_ttl` seconds.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, max_running_per_user=2, lease_seconds=120, result_ttl=24 * 3600):
+        self.path = path
+        self.max_running_per_user = max_running_per_user
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    available_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    heartbeat_at REAL,
+                    worker TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    result BLOB,
+                    result_type TEXT,
+                    meta TEXT,
+                    error TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, priority, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, status)")
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.path, timeout=30, isolation_level=None)) as conn:
+            yield conn
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent claims serialize
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    # ---------- producer side ----------
+
+    def submit(self, kind, payload, user_id="default", priority=1, max_attempts=3):
+        """
+        Queues a job and returns its ID. `payload` must be JSON-serializable.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                (*FINISHED, now - self.result_ttl),
+            )
+            conn.execute(
+                """
+                INSERT INTO jobs (id, user_id, kind, payload, status, priority, max_attempts, available_at, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, user_id, kind, json.dumps(payload), QUEUED, priority, max_attempts, now, now),
+            )
+        return job_id
+
+    def status(self, job_id):
+        """
+        Returns the job's state as a dict (without its result), or None.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                """
+                SELECT id, user_id, kind, status, attempts, max_attempts, created_at,
+                       started_at, finished_at, cancel_requested, meta, error
+                FROM jobs WHERE id = ?
+                """,
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "user_id", "kind", "status", "attempts", "max_attempts", "created_at",
+                "started_at", "finished_at", "cancel_requested", "meta", "error")
+        job = dict(zip(keys, row))
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        job["meta"] = json.loads(job["meta"]) if job["meta"] else {}
+        return job
+
+    def result(self, job_id):
+        """
+        Returns the result of a finished job (bytes, str or JSON value), or None.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT result_type, result FROM jobs WHERE id = ? AND status = ?", (job_id, DONE)
+            ).fetchone()
+        return _decode_result(*row) if row else None
+
+    def list_jobs(self, user_id, limit=20):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit)
+            ).fetchall()
+        return [self.status(job_id) for (job_id,) in rows]
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued job immediately; a running job is flagged and its
+        result discarded when the worker finishes. Returns False if the job
+        had already finished.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, now, job_id, QUEUED),
+            )
+            if cur.rowcount:
+                return True
+            cur = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING)
+            )
+            return bool(cur.rowcount)
+
+    # ---------- worker side ----------
+
+    def claim(self, worker):
+        """
+        Marks the next runnable job as running and returns (id, kind, payload),
+        or None when nothing is runnable.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._recover_stale(conn, now)
+            row = conn.execute(
+                """
+                SELECT id, kind, payload FROM jobs AS j
+                WHERE status = ? AND available_at <= ? AND (
+                    SELECT COUNT(*) FROM jobs AS r WHERE r.user_id = j.user_id AND r.status = ?
+                ) < ?
+                ORDER BY priority, created_at
+                LIMIT 1
+                """,
+                (QUEUED, now, RUNNING, self.max_running_per_user),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """
+                UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?,
+                                heartbeat_at = ?, worker = ?, error = NULL
+                WHERE id = ?
+                """,
+                (RUNNING, now, now, worker, row[0]),
+            )
+        return row[0], row[1], json.loads(row[2])
+
+    def _recover_stale(self, conn, now):
+        # Workers that died mid-job: retry the job, or fail it if out of attempts
+        stale = now - self.lease_seconds
+        conn.execute(
+            """
+            UPDATE jobs SET status = ?, finished_at = ?, error = 'Worker stopped responding.'
+            WHERE status = ? AND heartbeat_at < ? AND (attempts >= max_attempts OR cancel_requested = 1)
+            """,
+            (FAILED, now, RUNNING, stale),
+        )
+        conn.execute(
+            "UPDATE jobs SET status = ?, available_at = ? WHERE status = ? AND heartbeat_at < ?",
+            (QUEUED, now, RUNNING, stale),
+        )
+
+    def heartbeat(self, job_id):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING))
+
+    def complete(self, job_id, result, meta=None):
+        result_type, blob = _encode_result(result)
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                """
+                UPDATE jobs SET
+                    status = CASE WHEN cancel_requested THEN ? ELSE ? END,
+                    result = CASE WHEN cancel_requested THEN NULL ELSE ? END,
+                    result_type = ?, meta = ?, finished_at = ?
+                WHERE id = ? AND status = ?
+                """,
+                (CANCELLED, DONE, blob, result_type, json.dumps(meta or {}), now, job_id, RUNNING),
+            )
+
+    def fail(self, job_id, error, retry=True):
+        """
+        Records a failed attempt: re-queues the job with exponential backoff
+        while attempts remain, otherwise marks it failed.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts, max_attempts, cancel_requested FROM jobs WHERE id = ? AND status = ?",
+                (job_id, RUNNING),
+            ).fetchone()
+            if row is None:
+                return
+            attempts, max_attempts, cancel_requested = row
+            if cancel_requested:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (CANCELLED, error, now, job_id),
+                )
+            elif retry and attempts < max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, available_at = ? WHERE id = ?",
+                    (QUEUED, error, now + min(60, 2 ** attempts), job_id),
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (FAILED, error, now, job_id),
+                )
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_default_queue():
+    """
+    Returns the process-wide queue configured from JOB_QUEUE_PATH,
+    JOB_MAX_PER_USER and JOB_LEASE_SECONDS.
+    """
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue(
+                path=os.getenv("JOB_QUEUE_PATH") or DEFAULT_QUEUE_PATH,
+                max_running_per_user=int(os.getenv("JOB_MAX_PER_USER", 2)),
+                lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", 120)),
+            )
+        return _default_queue
+
+
+# ============================================================
+#  JOB HANDLERS
+# ============================================================
+
+def _handle_extract(payload):
+    from pdf_utils import extract_text_from_pdf
+
+    return extract_text_from_pdf(payload["path"])
+
+
+def _handle_summary(payload):
+    from summarizer import summarize_long_text
+
+    return summarize_long_text(payload["text"], payload.get("length", "Medium"), payload.get("style", "Academic"))
+
+
+def _handle_analysis(payload):
+    from summarizer import analyze_paper
+
+    return analyze_paper(payload["text"], payload.get("length", "Medium"), payload.get("style", "Academic"))
+
+
+def _handle_ppt(payload):
+    from summarizer import generate_ppt
+
+    return generate_ppt(
+        payload["text"],
+        analysis=payload.get("analysis"),
+        doc_hash=payload.get("doc_hash"),
+        title=payload.get("title"),
+        authors=payload.get("authors"),
+    )
+
+
+def _load_paper(payload):
+    """
+    Returns (full text, paper) for a job, read from its PDF on disk (`source`)
+    instead of being carried in the job row: the text and Document of a
+    regular upload, or the text and page-marked text of a streamed one
+    (reusing its spill file).
+    """
+    from pdf_utils import load_document
+    from streaming import extract_text_streaming
+
+    if payload.get("streamed"):
+        with extract_text_streaming(payload["source"], payload.get("doc_hash")) as spilled:
+            return spilled.text(), spilled.marked_text()
+    document = load_document(payload["source"], payload.get("doc_hash"))
+    return document.text, document
+
+
+def _handle_research_notes(payload):
+    from summarizer import build_research_notes_pdf
+
+    full_text, paper = _load_paper(payload) if payload.get("source") else (None, None)
+    notes, failures = build_research_notes_pdf(
+        payload["text"],
+        payload.get("length", "Medium"),
+        payload.get("style", "Academic"),
+        analysis=payload.get("analysis"),
+        doc_hash=payload.get("doc_hash"),
+        title=payload.get("title"),
+        full_text=full_text,
+        paper=paper,
+    )
+    return notes, {"failures": failures}
+
+
+# kind -> handler(payload) returning a result or (result, meta dict)
+HANDLERS = {
+    "extract": _handle_extract,
+    "summary": _handle_summary,
+    "analysis": _handle_analysis,
+    "ppt": _handle_ppt,
+    "research_notes": _handle_research_notes,
+}
+
+
+# ============================================================
+#  WORKERS
+# ============================================================
+
+def _execute(queue, job_id, kind, payload):
+    # Keep the lease alive while the handler runs
+    done = threading.Event()
+
+    def beat():
+        while not done.wait(queue.lease_seconds / 3):
+            queue.heartbeat(job_id)
+
+    threading.Thread(target=beat, daemon=True).start()
+    try:
+        handler = HANDLERS.get(kind)
+        if handler is None:
+            queue.fail(job_id, f"❌ Unknown job kind: {kind}", retry=False)
+            return
+
+        result = handler(payload)
+        result, meta = result if isinstance(result, tuple) else (result, None)
+
+        # The summarizer reports Gemini failures as "❌ ..." strings
+        if isinstance(result, str) and result.startswith("❌"):
+            queue.fail(job_id, result)
+        else:
+            queue.complete(job_id, result, meta)
+    except Exception as e:
+        queue.fail(job_id, f"❌ {type(e).__name__}: {e}")
+    finally:
+        done.set()
+
+
+def run_worker(path=None, poll_interval=0.5, env=None, stop_event=None):
+    """
+    Claims and runs jobs until `stop_event` is set (or forever).
+    """
+    if env:
+        os.environ.update(env)
+    queue = JobQueue(path) if path else get_default_queue()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+
+    while stop_event is None or not stop_event.is_set():
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        _execute(queue, *job)
+
+
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def start_workers(count, path=None, env=None):
+    """
+    Starts `count` daemon worker processes, once per process. `env` is
+    applied in the workers (e.g. credentials only the parent can read).
+    The Gemini rate limits are split evenly between the workers and this
+    process, so together they stay within GEMINI_RPM / GEMINI_TPM.
+    """
+    with _workers_lock:
+        if not _workers and count > 0:
+            env = {**share_limits(count + 1), **(env or {})}
+            # spawn: forking a threaded server process is unsafe
+            ctx = multiprocessing.get_context("spawn")
+            for _ in range(count):
+                process = ctx.Process(target=run_worker, args=(path, 0.5, env), daemon=True)
+                process.start()
+                _workers.append(process)
+        return list(_workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run background job workers.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue", default=None, help="SQLite queue file (default JOB_QUEUE_PATH)")
+    args = parser.parse_args(argv)
+
+    if args.workers <= 1:
+        run_worker(args.queue)
+        return 0
+
+    # The pool shares one API key: each worker gets an equal share of the limits
+    env = share_limits(args.workers)
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(args.queue, 0.5, env)) for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,262 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import closing, contextmanager
+
+import numpy as np
+
+import metrics
+from context_packing import clean_text
+
+
+# ============================================================
+#  LOCAL KEYWORD EXTRACTION (RAKE PHRASES + CORPUS TF-IDF)
+# ============================================================
+
+DEFAULT_STATS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".keyword_stats.sqlite3"
+)
+
+MAX_PHRASE_WORDS = 3
+# Phrases in the opening text (title, abstract) get this score multiplier
+FRONT_CHARS = 2000
+FRONT_BOOST = 1.5
+
+STOPWORDS = frozenset(
+    """a about above after again against all also although am an and any are as at be because been
+    before being below between both but by can could did do does doing down during each either et
+    etc few for from further had has have having he her here hers him his how however i if in into
+    is it its itself just may me might more most must my no nor not now of off on once only or
+    other our ours out over own per same she should since so some such than that the their them
+    then there these they this those through thus to too under until up upon us very via was we
+    were what when where whether which while who whom why will with within without would yet you
+    your al fig figure figures table tables section sections eq eqs equation ref refs paper papers
+    propose proposed present presented show shows shown use used uses using based approach method
+    methods result results work works study new different various several many much well first
+    second third one two three four five given obtain obtained respectively e.g i.e cf see also
+    let consider considered follow following note thus hence therefore case cases example examples
+    number numbers large small high low good better best""".split()
+)
+
+TOKEN_RE = re.compile(r"[A-Za-z][A-Za-z'-]*[A-Za-z]|[A-Za-z]|\S")
+WORD_RE = re.compile(r"[a-z][a-z-]*[a-z]")
+
+
+def _stem(word):
+    # Folds simple plurals so "networks" and "network" count together
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def candidate_phrases(text):
+    """
+    RAKE-style candidates: runs of up to MAX_PHRASE_WORDS content words
+    between stopwords and punctuation. Returns (phrase keys, surface forms,
+    character offsets), one entry per occurrence.
+    """
+    keys, surfaces, offsets = [], [], []
+    run = []
+
+    def flush():
+        if run and len(run) <= MAX_PHRASE_WORDS and (len(run) > 1 or len(run[0][1]) > 3):
+            keys.append(tuple(_stem(w) for _, w, _ in run))
+            surfaces.append(" ".join(s for s, _, _ in run))
+            offsets.append(run[0][2])
+        run.clear()
+
+    for match in TOKEN_RE.finditer(text):
+        token = match.group()
+        lower = token.lower()
+        if WORD_RE.fullmatch(lower) and lower not in STOPWORDS:
+            run.append((token, lower, match.start()))
+        else:
+            flush()
+    flush()
+    return keys, surfaces, offsets
+
+
+def _display(surfaces):
+    """
+    Most common spelling of a phrase; lowercased unless it is an acronym or
+    consistently capitalized mid-sentence.
+    """
+    surface, _ = Counter(surfaces).most_common(1)[0]
+    words = surface.split()
+    if any(w.isupper() and len(w) > 1 for w in words):
+        return surface
+    return surface.lower()
+
+
+class CorpusStats:
+    """
+    Document frequencies of words across the papers processed so far, stored
+    in SQLite so every process scores keywords against the same corpus.
+    """
+
+    def __init__(self, path=DEFAULT_STATS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS papers (doc TEXT PRIMARY KEY, added_at REAL NOT NULL);
+                CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def add(self, text, doc_hash):
+        """
+        Counts each distinct word of a paper (text or an iterable of text
+        windows) once; papers already counted are skipped. Returns True if
+        the paper was added.
+        """
+        words = set()
+        for window in [text] if isinstance(text, str) else text:
+            words.update(_stem(w) for w in WORD_RE.findall(window.lower()) if w not in STOPWORDS)
+        with self._lock, self._connect() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO papers VALUES (?, ?)", (doc_hash, time.time())
+            ).rowcount
+            if not inserted:
+                return False
+            conn.executemany(
+                "INSERT INTO terms VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                ((w,) for w in words),
+            )
+        return True
+
+    def idf(self, words):
+        """
+        Smoothed inverse document frequency for each of `words` (NumPy array).
+        With no corpus yet every word gets 1.0, leaving RAKE and tf to rank.
+        """
+        with self._connect() as conn:
+            papers = conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+            df = {}
+            if papers:
+                conn.execute("CREATE TEMP TABLE lookup (term TEXT PRIMARY KEY) WITHOUT ROWID")
+                conn.executemany("INSERT OR IGNORE INTO lookup VALUES (?)", ((w,) for w in words))
+                df = dict(conn.execute("SELECT t.term, t.df FROM terms t JOIN lookup USING (term)"))
+
+        counts = np.fromiter((df.get(w, 0) for w in words), dtype=np.float64, count=len(words))
+        return np.log((papers + 1) / (counts + 1)) + 1.0
+
+
+def score_phrases(text, stats=None):
+    """
+    Scores every candidate phrase of `text` and returns [(phrase, score)]
+    sorted best first. score = log(1 + tf) * mean word idf * sqrt(RAKE score),
+    boosted for phrases that appear in the opening text.
+    """
+    text = clean_text(text)
+    keys, surfaces, offsets = candidate_phrases(text)
+    if not keys:
+        return []
+
+    phrase_ids = {}
+    occurrence_phrase = np.fromiter(
+        (phrase_ids.setdefault(k, len(phrase_ids)) for k in keys), dtype=np.intp, count=len(keys)
+    )
+    phrases = list(phrase_ids)
+    word_ids = {}
+    # phrases x MAX_PHRASE_WORDS matrix of word ids, -1 padded
+    phrase_words = np.full((len(phrases), MAX_PHRASE_WORDS), -1, dtype=np.intp)
+    for i, phrase in enumerate(phrases):
+        for j, word in enumerate(phrase):
+            phrase_words[i, j] = word_ids.setdefault(word, len(word_ids))
+    lengths = (phrase_words >= 0).sum(axis=1)
+
+    # RAKE word scores: degree / frequency over all phrase occurrences
+    occ_words = phrase_words[occurrence_phrase]
+    occ_lengths = lengths[occurrence_phrase]
+    mask = occ_words >= 0
+    flat_words = occ_words[mask]
+    freq = np.bincount(flat_words, minlength=len(word_ids))
+    degree = np.bincount(flat_words, weights=np.repeat(occ_lengths, mask.sum(axis=1)), minlength=len(word_ids))
+    word_rake = degree / np.maximum(freq, 1)
+
+    padded = np.append(word_rake, 0.0)  # index -1 -> 0
+    rake = padded[phrase_words].sum(axis=1)
+
+    stats = stats if stats is not None else get_default_stats()
+    if stats is not None:
+        word_idf = stats.idf(list(word_ids))
+    else:
+        word_idf = np.ones(len(word_ids))
+    idf = np.append(word_idf, 0.0)[phrase_words].sum(axis=1) / lengths
+
+    tf = np.bincount(occurrence_phrase, minlength=len(phrases))
+    front = np.zeros(len(phrases), dtype=bool)
+    front[occurrence_phrase[np.asarray(offsets) < FRONT_CHARS]] = True
+
+    scores = np.log1p(tf) * idf * np.sqrt(rake) * np.where(front, FRONT_BOOST, 1.0)
+
+    surface_forms = defaultdict(list)
+    for phrase_id, surface in zip(occurrence_phrase, surfaces):
+        surface_forms[phrase_id].append(surface)
+
+    order = np.argsort(-scores, kind="stable")
+    return [(_display(surface_forms[i]), float(scores[i])) for i in order]
+
+
+@metrics.timed("keywords_local")
+def extract_keywords_local(text, top_k=10, stats=None):
+    """
+    Top `top_k` keyphrases of the whole text, skipping phrases that overlap
+    one already chosen ("network" after "neural network").
+    """
+    chosen = []
+    for phrase, _ in score_phrases(text, stats):
+        padded = f" {phrase.lower()} "
+        if any(padded in f" {c.lower()} " or f" {c.lower()} " in padded for c in chosen):
+            continue
+        chosen.append(phrase)
+        if len(chosen) >= top_k:
+            break
+    return chosen
+
+
+_default_stats = None
+_default_stats_lock = threading.Lock()
+
+
+def get_default_stats():
+    """
+    Returns the process-wide corpus statistics, configured from the
+    environment. Set KEYWORD_STATS_PATH to an empty string to disable them.
+    """
+    global _default_stats
+    path = os.getenv("KEYWORD_STATS_PATH", DEFAULT_STATS_PATH)
+    if not path:
+        return None
+
+    with _default_stats_lock:
+        if _default_stats is None:
+            _default_stats = CorpusStats(path)
+        return _default_stats
+
+
+def record_paper(text, doc_hash):
+    """
+    Adds a processed paper (text or text windows) to the keyword corpus
+    (no-op when disabled).
+    """
+    stats = get_default_stats()
+    if stats is None or (isinstance(text, str) and not text.strip()):
+        return False
+    return stats.add(text, doc_hash)
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+
+import metrics
+
+
+# ============================================================
+#  PERSISTENT LLM RESPONSE CACHE (SQLITE)
+# ============================================================
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".llm_cache.sqlite3"
+)
+
+
+def normalize_prompt(prompt):
+    """
+    Collapses whitespace so prompts that differ only in indentation or
+    line wrapping share a cache entry.
+    """
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def model_name_of(model):
+    """
+    Returns a stable name for a Gemini model object (or a plain string).
+    """
+    if isinstance(model, str):
+        return model
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+class LLMCache:
+    """
+    Stores LLM responses in SQLite keyed on (model name, normalized prompt,
+    generation settings).
+
+    Entries older than `ttl_seconds` are treated as misses and purged; once
+    more than `max_entries` rows are stored the least recently used ones are
+    evicted. Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    @staticmethod
+    def make_key(model_name, prompt, settings=None):
+        payload = json.dumps(
+            {
+                "model": model_name,
+                "prompt": normalize_prompt(prompt),
+                "settings": settings or {},
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model_name, response):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, response, now, now),
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._lock, self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """
+    Returns the process-wide cache, configured from the environment.
+    Set LLM_CACHE_PATH to an empty string to disable caching.
+    """
+    global _default_cache
+    path = os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)
+    if not path:
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(
+                path,
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000)),
+            )
+        return _default_cache
+
+
+def cached_generate(model, prompt, cache=None, accept=None, **settings):
+    """
+    Returns `model.generate_content(prompt, **settings).text`, serving repeated
+    requests from the cache. Exceptions propagate and are never cached, nor
+    are responses for which `accept(text)` is false.
+    """
+    cache = cache or get_default_cache()
+    name = model_name_of(model)
+    if cache is None:
+        return _generate_and_record(model, name, prompt, settings)
+
+    key = cache.make_key(name, prompt, settings)
+
+    text = cache.get(key)
+    metrics.record_cache("llm", text is not None)
+    if text is None:
+        text = _generate_and_record(model, name, prompt, settings)
+        if text and (accept is None or accept(text)):
+            cache.put(key, name, text)
+    return text
+
+
+def _generate_and_record(model, name, prompt, settings):
+    started = time.perf_counter()
+    response = model.generate_content(prompt, **settings)
+    text = response.text
+    metrics.record_llm_call(
+        name, prompt, text, getattr(response, "usage_metadata", None), time.perf_counter() - started
+    )
+    return text
+
+
+def cached_generate_stream(model, prompt, cache=None, accept=None, **settings):
+    """
+    Streaming counterpart of cached_generate: yields text chunks as Gemini
+    produces them and stores the full text once the stream completes (if
+    `accept(text)` is true). A cache hit is yielded as a single chunk.
+    """
+    cache = cache or get_default_cache()
+    name = model_name_of(model)
+    key = cache.make_key(name, prompt, settings) if cache else None
+
+    if cache is not None:
+        text = cache.get(key)
+        metrics.record_cache("llm", text is not None)
+        if text is not None:
+            yield text
+            return
+
+    parts = []
+    usage = None
+    started = time.perf_counter()
+    for chunk in model.generate_content(prompt, stream=True, **settings):
+        usage = getattr(chunk, "usage_metadata", None) or usage
+        piece = chunk.text
+        if piece:
+            parts.append(piece)
+            yield piece
+
+    text = "".join(parts)
+    metrics.record_llm_call(name, prompt, text, usage, time.perf_counter() - started)
+    if cache is not None and text and (accept is None or accept(text)):
+        cache.put(key, name, text)
@@ -0,0 +1,321 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# ============================================================
+#  PIPELINE METRICS (PROMETHEUS TEXT FORMAT)
+# ============================================================
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Stage currently running in this thread/context (labels LLM calls)
+_current_stage = contextvars.ContextVar("metrics_stage", default="unknown")
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _escape_label(value):
+    # Label values escape backslash, double quote and newline
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and histograms keyed by (metric name, labels).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, amount=1, help_text="", **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._help.setdefault(name, help_text)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, help_text="", **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._help.setdefault(name, help_text)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+
+            seen = set()
+            for (name, labels), value in counters:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                    lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name}{fmt(labels)} {value}")
+
+            for (name, labels), histogram in histograms:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                    lines.append(f"# TYPE {name} histogram")
+                for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{name}_sum{fmt(labels)} {histogram.total}")
+                lines.append(f"{name}_count{fmt(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def stage_summary(self):
+        """
+        Per-stage rows (calls, mean/total seconds, errors) for the debug panel.
+        """
+        with self._lock:
+            errors = {
+                dict(labels).get("stage"): value
+                for (name, labels), value in self._counters.items()
+                if name == "summarizer_stage_errors_total"
+            }
+            rows = []
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                if name != "summarizer_stage_duration_seconds":
+                    continue
+                stage = dict(labels).get("stage")
+                rows.append({
+                    "stage": stage,
+                    "calls": histogram.count,
+                    "mean_ms": round(1000 * histogram.total / histogram.count, 1) if histogram.count else 0.0,
+                    "total_s": round(histogram.total, 3),
+                    "errors": errors.get(stage, 0),
+                })
+        return rows
+
+
+registry = MetricsRegistry()
+
+
+def _log_event(event):
+    # Optional JSON-lines trace log (METRICS_LOG=path)
+    path = os.getenv("METRICS_LOG")
+    if not path:
+        return
+    event["ts"] = time.time()
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event) + "\n")
+    except OSError:
+        pass
+
+
+# ============================================================
+#  RECORDING HELPERS
+# ============================================================
+
+def _is_error_result(result):
+    return isinstance(result, str) and result.startswith("❌")
+
+
+def _record_stage(stage, seconds, error):
+    registry.observe(
+        "summarizer_stage_duration_seconds", seconds,
+        "Wall time of each pipeline stage.", stage=stage,
+    )
+    if error:
+        registry.inc("summarizer_stage_errors_total", 1, "Stages that raised or returned an error.", stage=stage)
+    _log_event({"type": "stage", "stage": stage, "seconds": round(seconds, 6), "error": error})
+
+
+@contextmanager
+def track(stage):
+    """
+    Times a block as `stage` and labels LLM calls made inside it.
+    """
+    token = _current_stage.set(stage)
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        _current_stage.reset(token)
+        _record_stage(stage, time.perf_counter() - started, error)
+
+
+def timed(stage):
+    """
+    Decorator form of track(). Results that are "❌ ..." error strings count as
+    errors. Generator functions are timed over the whole iteration and also
+    report time to the first chunk.
+    """
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def stream_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                first = True
+                error = False
+                iterator = fn(*args, **kwargs)
+                try:
+                    while True:
+                        # Label LLM calls per step: the consumer may resume us from another context
+                        token = _current_stage.set(stage)
+                        try:
+                            chunk = next(iterator)
+                        except StopIteration:
+                            break
+                        finally:
+                            _current_stage.reset(token)
+                        if first:
+                            first = False
+                            registry.observe(
+                                "summarizer_stream_first_chunk_seconds", time.perf_counter() - started,
+                                "Time until a streaming stage yields its first chunk.", stage=stage,
+                            )
+                        error = error or _is_error_result(chunk)
+                        yield chunk
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    _record_stage(stage, time.perf_counter() - started, error)
+            return stream_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = _current_stage.set(stage)
+            started = time.perf_counter()
+            error = False
+            try:
+                result = fn(*args, **kwargs)
+                error = _is_error_result(result)
+                return result
+            except Exception:
+                error = True
+                raise
+            finally:
+                _current_stage.reset(token)
+                _record_stage(stage, time.perf_counter() - started, error)
+        return wrapper
+    return decorator
+
+
+def record_llm_call(model_name, prompt, response_text, usage=None, seconds=None):
+    """
+    Records one Gemini request: prompt/response sizes and, when the response
+    carries usage_metadata, its token counts.
+    """
+    stage = _current_stage.get()
+    registry.inc("summarizer_llm_requests_total", 1, "Gemini requests sent (cache misses).", stage=stage, model=model_name)
+    registry.inc("summarizer_llm_prompt_chars_total", len(prompt), "Prompt size in characters.", stage=stage)
+    registry.inc("summarizer_llm_response_chars_total", len(response_text or ""), "Response size in characters.", stage=stage)
+    if seconds is not None:
+        registry.observe("summarizer_llm_request_seconds", seconds, "Gemini request latency.", stage=stage)
+
+    event = {"type": "llm", "stage": stage, "model": model_name, "prompt_chars": len(prompt),
+             "response_chars": len(response_text or ""), "seconds": seconds}
+    if usage is not None:
+        for kind, attr in (("prompt", "prompt_token_count"), ("response", "candidates_token_count")):
+            count = getattr(usage, attr, None)
+            if count:
+                registry.inc("summarizer_llm_tokens_total", count, "Tokens reported by Gemini usage metadata.",
+                             stage=stage, kind=kind)
+                event[f"{kind}_tokens"] = count
+    _log_event(event)
+
+
+def record_cache(cache, hit):
+    registry.inc(
+        "summarizer_cache_requests_total", 1, "Cache lookups by cache and result.",
+        cache=cache, result="hit" if hit else "miss",
+    )
+
+
+# ============================================================
+#  HTTP ENDPOINT
+# ============================================================
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None):
+    """
+    Serves /metrics on `port` (default METRICS_PORT) in a daemon thread, once
+    per process. Returns the server, or None if disabled or the port is taken.
+    """
+    global _server
+    port = port or os.getenv("METRICS_PORT")
+    if not port:
+        return None
+
+    # http.server pulls in email/html parsing; only load it when serving
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", int(port)), MetricsHandler)
+            except OSError:
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+        return _server
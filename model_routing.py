@@ -0,0 +1,230 @@
+import os
+import re
+import threading
+import time
+
+import metrics
+from gemini_scheduler import ScheduledModel, get_scheduler
+from llm_cache import cached_generate, cached_generate_stream
+
+
+# ============================================================
+#  MODEL TIERS & ROUTES
+# ============================================================
+
+# Override a tier's model with GEMINI_MODEL_<TIER> (e.g. GEMINI_MODEL_STRONG)
+TIERS = {
+    "lite": "gemini-2.0-flash-lite",
+    "standard": "gemini-2.0-flash",
+    "strong": "gemini-2.5-flash",
+}
+
+# Task -> tiers tried in order: a result that fails validation escalates to
+# the next one. Override with MODEL_ROUTE_<TASK>="lite,strong" (tiers or
+# model names).
+ROUTES = {
+    "title": ("lite", "standard"),
+    "keywords": ("lite", "standard"),
+    "plagiarism": ("lite", "standard"),
+    "summary_short": ("lite", "standard"),
+    "summary": ("standard", "strong"),
+    "summary_long": ("standard", "strong"),
+    "summary_part": ("lite", "standard"),
+    "qa": ("standard", "strong"),
+    "ppt": ("standard", "strong"),
+    "equations": ("standard", "strong"),
+    "analysis": ("standard", "strong"),
+    "default": ("standard",),
+}
+
+
+def tier_model(tier):
+    return os.getenv(f"GEMINI_MODEL_{tier.upper()}") or TIERS.get(tier, tier)
+
+
+def route(task):
+    """
+    Model names to try for `task`, cheapest first.
+    """
+    override = os.getenv(f"MODEL_ROUTE_{task.upper()}")
+    tiers = [t.strip() for t in override.split(",") if t.strip()] if override else ROUTES.get(task, ROUTES["default"])
+    return [tier_model(t) for t in tiers]
+
+
+def summary_route(length="Medium", style="Academic"):
+    """
+    Summary task for a summary length. The route follows the length, since
+    its validator checks the length the prompt asked for.
+    """
+    if length == "Short":
+        return "summary_short"
+    if length == "Long":
+        return "summary_long"
+    return "summary"
+
+
+# ============================================================
+#  VALIDATION (WHEN TO ESCALATE)
+# ============================================================
+
+def _min_words(count):
+    def check(text):
+        return None if len(text.split()) >= count else f"fewer than {count} words"
+    return check
+
+
+def _check_title(text):
+    line = text.strip().strip('"*#').strip()
+    if "\n" in line:
+        return "multi-line title"
+    if not 2 <= len(line.split()) <= 40:
+        return "implausible title length"
+    return None
+
+
+def _check_keywords(text):
+    items = [k.strip() for k in text.split(",") if k.strip()]
+    if len(items) < 3:
+        return "fewer than 3 keywords"
+    if any(len(k.split()) > 8 for k in items):
+        return "keywords are sentences"
+    return None
+
+
+def _check_ppt(text):
+    found = sum(bool(re.search(rf"^\s*{label}\s*:", text, re.IGNORECASE | re.MULTILINE))
+                for label in ("title", "problem", "methodology", "results", "conclusion"))
+    return None if found >= 4 else "outline is missing sections"
+
+
+def _check_equations(text):
+    return None if re.search(r"equations\s*:|algorithms\s*:", text, re.IGNORECASE) else "missing Equations/Algorithms"
+
+
+VALIDATORS = {
+    "title": _check_title,
+    "keywords": _check_keywords,
+    "plagiarism": _min_words(10),
+    "summary_short": _min_words(20),
+    "summary": _min_words(60),
+    "summary_long": _min_words(120),
+    "summary_part": _min_words(20),
+    "qa": _min_words(5),
+    "ppt": _check_ppt,
+    "equations": _check_equations,
+}
+
+
+def validation_problem(task, text, validate=None):
+    """
+    Why `text` is not an acceptable result for `task` (None if it is).
+    """
+    if not text or not text.strip():
+        return "empty response"
+    if text.lstrip().startswith("❌"):
+        return "error response"
+    check = validate or VALIDATORS.get(task)
+    return check(text) if check else None
+
+
+# ============================================================
+#  ROUTED GENERATION & PER-ROUTE STATS
+# ============================================================
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(task, model_name, outcome, seconds):
+    metrics.registry.observe(
+        "summarizer_route_seconds", seconds,
+        "Latency per task route and model, by outcome.", route=task, model=model_name, outcome=outcome,
+    )
+    with _stats_lock:
+        row = _stats.setdefault((task, model_name), {"calls": 0, "total": 0.0})
+        row["calls"] += 1
+        row["total"] += seconds
+        row[outcome] = row.get(outcome, 0) + 1
+
+
+def route_stats():
+    """
+    Per (route, model) rows (calls, mean latency, count per outcome) for
+    the debug panel.
+    """
+    with _stats_lock:
+        return [
+            {"route": task, "model": model_name, "calls": row["calls"],
+             "mean_ms": round(1000 * row["total"] / row["calls"], 1),
+             **{o: row.get(o, 0) for o in ("accepted", "escalated", "rejected", "error")}}
+            for (task, model_name), row in sorted(_stats.items())
+        ]
+
+
+def generate_routed(task, prompt, get_model, priority=None, validate=None, **settings):
+    """
+    Generates `prompt` on the models routed for `task`, escalating to the
+    next one when a result fails validation (or the call fails). The last
+    model's result is returned as is (but not cached if it fails
+    validation); its exception propagates.
+    `get_model(name)` returns the Gemini model for a model name.
+    """
+    models = []
+    for name in route(task):
+        # A single model serving every name (e.g. a test fake) is asked once
+        model = get_model(name)
+        if all(model is not other for _, other in models):
+            models.append((name, model))
+
+    text = None
+    for i, (name, model) in enumerate(models):
+        final = i == len(models) - 1
+        started = time.perf_counter()
+        try:
+            scheduled = ScheduledModel(model, get_scheduler(), priority)
+            # Results that fail validation are not cached
+            text = cached_generate(
+                scheduled, prompt, accept=lambda t: validation_problem(task, t, validate) is None, **settings
+            )
+        except Exception:
+            _record(task, name, "error", time.perf_counter() - started)
+            if final:
+                raise
+            continue
+
+        problem = validation_problem(task, text, validate)
+        if problem is None or final:
+            _record(task, name, "accepted" if problem is None else "rejected", time.perf_counter() - started)
+            return text
+
+        _record(task, name, "escalated", time.perf_counter() - started)
+        metrics.registry.inc(
+            "summarizer_route_escalations_total", 1, "Results rejected by validation and retried on a stronger model.",
+            route=task, model=name, reason=problem,
+        )
+    return text
+
+
+def generate_routed_stream(task, prompt, get_model, priority=None, validate=None, **settings):
+    """
+    Streams `prompt` from the first model routed for `task`. A stream can't
+    be validated before it is shown, so there is no cascade; the completed
+    text is validated afterwards and cached only if it passes.
+    """
+    name = route(task)[0]
+    started = time.perf_counter()
+    outcome = "error"
+    parts = []
+    try:
+        scheduled = ScheduledModel(get_model(name), get_scheduler(), priority)
+        for chunk in cached_generate_stream(
+            scheduled, prompt, accept=lambda t: validation_problem(task, t, validate) is None, **settings
+        ):
+            parts.append(chunk)
+            yield chunk
+        outcome = "accepted" if validation_problem(task, "".join(parts), validate) is None else "rejected"
+    except GeneratorExit:
+        outcome = "cancelled"  # the reader stopped early
+        raise
+    finally:
+        _record(task, name, outcome, time.perf_counter() - started)
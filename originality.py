@@ -0,0 +1,374 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import closing, contextmanager
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+
+
+# ============================================================
+#  LOCAL ORIGINALITY CHECK (MINHASH + LSH OVER PAPERS SEEN)
+# ============================================================
+
+DEFAULT_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".originality_index.sqlite3"
+)
+
+SHINGLE_WORDS = 5
+# Passages are PASSAGE_BLOCKS consecutive blocks of BLOCK_SHINGLES shingles
+# (~55 words), overlapping by one block
+BLOCK_SHINGLES = 25
+PASSAGE_BLOCKS = 2
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS  # LSH candidate threshold ≈ (1/BANDS) ** (1/ROWS) ≈ 0.42
+
+MATCH_THRESHOLD = 0.5
+MERSENNE_PRIME = (1 << 31) - 1
+
+WORD_RE = re.compile(r"\w+")
+
+# Fixed seed: signatures must be comparable across processes and restarts
+_rng = np.random.RandomState(20240611)
+_PERM_A = _rng.randint(1, MERSENNE_PRIME, size=(NUM_PERM, 1)).astype(np.uint64)
+_PERM_B = _rng.randint(0, MERSENNE_PRIME, size=(NUM_PERM, 1)).astype(np.uint64)
+_BAND_MULT = (_rng.randint(1, 1 << 62, size=ROWS, dtype=np.int64).astype(np.uint64) | np.uint64(1))
+_SHINGLE_MULT = np.uint64(1_000_003)
+
+
+@lru_cache(maxsize=200_000)
+def _word_hash(word):
+    return zlib.crc32(word.encode("utf-8"))
+
+
+class Passages:
+    """
+    MinHash signatures (one row per passage) of a text, with each passage's
+    character span so matches can be quoted.
+    """
+
+    __slots__ = ("text", "signatures", "spans")
+
+    def __init__(self, text, signatures, spans):
+        self.text = text
+        self.signatures = signatures
+        self.spans = spans
+
+    def __len__(self):
+        return len(self.spans)
+
+    def passage_text(self, index):
+        start, end = self.spans[index]
+        return self.text[start:end]
+
+
+def shingle_hashes(words):
+    """
+    32-bit hashes of every SHINGLE_WORDS-word shingle (rolling, vectorized).
+    """
+    count = len(words) - SHINGLE_WORDS + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    tokens = np.fromiter((_word_hash(w) for w in words), dtype=np.uint64, count=len(words))
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        # uint64 arithmetic wraps, which is fine for hashing
+        hashes = hashes * _SHINGLE_MULT + tokens[offset:offset + count]
+    return (hashes ^ (hashes >> np.uint64(32))) % np.uint64(MERSENNE_PRIME)
+
+
+def minhash_passages(text, block=4096):
+    """
+    Splits `text` into overlapping passages and returns their MinHash
+    signatures as a Passages object.
+    """
+    matches = list(WORD_RE.finditer(text.lower()))
+    hashes = shingle_hashes([m.group() for m in matches])
+    if not len(hashes):
+        return Passages(text, np.zeros((0, NUM_PERM), dtype=np.uint32), [])
+
+    # Minimum permuted hash per block of BLOCK_SHINGLES shingles; computed in
+    # column chunks so long papers don't build a NUM_PERM x shingles matrix
+    starts = np.arange(0, len(hashes), BLOCK_SHINGLES)
+    block_mins = np.empty((len(starts), NUM_PERM), dtype=np.uint64)
+    step = block - block % BLOCK_SHINGLES
+    for chunk_start in range(0, len(hashes), step):
+        chunk = hashes[chunk_start:chunk_start + step]
+        permuted = (_PERM_A * chunk + _PERM_B) % np.uint64(MERSENNE_PRIME)
+        first = chunk_start // BLOCK_SHINGLES
+        offsets = np.arange(0, len(chunk), BLOCK_SHINGLES)
+        block_mins[first:first + len(offsets)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+
+    # A passage's signature is the minimum over its blocks
+    count = max(1, len(starts) - PASSAGE_BLOCKS + 1)
+    signatures = block_mins[:count].copy()
+    for offset in range(1, min(PASSAGE_BLOCKS, len(starts))):
+        np.minimum(signatures, block_mins[offset:offset + count], out=signatures)
+
+    spans = []
+    for p in range(count):
+        first_word = p * BLOCK_SHINGLES
+        last_word = min(first_word + PASSAGE_BLOCKS * BLOCK_SHINGLES, len(hashes)) + SHINGLE_WORDS - 2
+        spans.append((matches[first_word].start(), matches[last_word].end()))
+    return Passages(text, signatures.astype(np.uint32), spans)
+
+
+def band_keys(signatures):
+    """
+    One LSH bucket key per (passage, band): the band's ROWS values hashed
+    together with the band number, as signed 64-bit ints for SQLite.
+    """
+    bands = signatures.astype(np.uint64).reshape(len(signatures), BANDS, ROWS)
+    keys = (bands * _BAND_MULT).sum(axis=2) + np.arange(BANDS, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    return keys.view(np.int64)
+
+
+class Match:
+    __slots__ = ("passage", "source", "source_name", "source_text", "similarity")
+
+    def __init__(self, passage, source, source_name, source_text, similarity):
+        self.passage = passage
+        self.source = source
+        self.source_name = source_name
+        self.source_text = source_text
+        self.similarity = similarity
+
+
+class OriginalityReport:
+    """
+    Result of OriginalityIndex.check(): the best match (if any) for each
+    passage of the checked text.
+    """
+
+    __slots__ = ("passages", "matches", "papers_indexed", "seconds")
+
+    def __init__(self, passages, matches, papers_indexed, seconds):
+        self.passages = passages
+        self.matches = matches
+        self.papers_indexed = papers_indexed
+        self.seconds = seconds
+
+    @property
+    def originality(self):
+        if not len(self.passages):
+            return 1.0
+        return 1.0 - len({m.passage for m in self.matches}) / len(self.passages)
+
+    def spans(self):
+        """
+        Merges matches of consecutive passages against the same source into
+        (text, source_name, source_text, max_similarity) tuples.
+        """
+        merged = []
+        for match in sorted(self.matches, key=lambda m: m.passage):
+            last = merged[-1] if merged else None
+            if last and last["source"] == match.source and match.passage <= last["end"] + 1:
+                last["end"] = match.passage
+                last["similarity"] = max(last["similarity"], match.similarity)
+                continue
+            merged.append({
+                "source": match.source, "name": match.source_name, "source_text": match.source_text,
+                "start": match.passage, "end": match.passage, "similarity": match.similarity,
+            })
+
+        result = []
+        for span in merged:
+            start = self.passages.spans[span["start"]][0]
+            end = self.passages.spans[span["end"]][1]
+            result.append((self.passages.text[start:end], span["name"], span["source_text"], span["similarity"]))
+        return result
+
+
+class OriginalityIndex:
+    """
+    LSH index over the passages of every paper added, stored in SQLite so the
+    app, API and job workers share one corpus.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, threshold=MATCH_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS papers (
+                    doc TEXT PRIMARY KEY,
+                    name TEXT,
+                    passages INTEGER NOT NULL,
+                    added_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS passages (
+                    doc TEXT NOT NULL,
+                    passage INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    PRIMARY KEY (doc, passage)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key INTEGER NOT NULL,
+                    doc TEXT NOT NULL,
+                    passage INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_buckets_key ON buckets (key);
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def __contains__(self, doc_hash):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM papers WHERE doc = ?", (doc_hash,)).fetchone() is not None
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    @metrics.timed("originality_index")
+    def add(self, text, doc_hash, name=None):
+        """
+        Indexes the passages of a paper, given as its text or as an iterable
+        of text windows (e.g. SpilledText.iter_windows() for very large
+        papers); papers already indexed are skipped. Returns True if the
+        paper was added.
+        """
+        if doc_hash in self:
+            return False
+        windows = [text] if isinstance(text, str) else text
+
+        with self._lock, self._connect() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO papers VALUES (?, ?, ?, ?)", (doc_hash, name, 0, time.time())
+            ).rowcount
+            if not inserted:
+                return False
+            count = 0
+            for window in windows:
+                passages = minhash_passages(window)
+                keys = band_keys(passages.signatures)
+                conn.executemany(
+                    "INSERT INTO passages VALUES (?, ?, ?, ?)",
+                    ((doc_hash, count + i, passages.passage_text(i), passages.signatures[i].tobytes())
+                     for i in range(len(passages))),
+                )
+                conn.executemany(
+                    "INSERT INTO buckets VALUES (?, ?, ?)",
+                    ((int(key), doc_hash, count + i) for i, row in enumerate(keys) for key in row),
+                )
+                count += len(passages)
+            conn.execute("UPDATE papers SET passages = ? WHERE doc = ?", (count, doc_hash))
+        return True
+
+    def remove(self, doc_hash):
+        with self._lock, self._connect() as conn:
+            for table in ("papers", "passages", "buckets"):
+                conn.execute(f"DELETE FROM {table} WHERE doc = ?", (doc_hash,))
+
+    @metrics.timed("originality_check")
+    def check(self, text, doc_hash=None):
+        """
+        Compares every passage of `text` with the indexed papers (except
+        `doc_hash` itself) and returns an OriginalityReport with the best
+        match per passage at or above the threshold.
+        """
+        started = time.perf_counter()
+        passages = minhash_passages(text)
+        keys = band_keys(passages.signatures)
+
+        with self._connect() as conn:
+            papers_indexed = conn.execute("SELECT COUNT(*) FROM papers WHERE doc != ?", (doc_hash or "",)).fetchone()[0]
+            conn.execute("CREATE TEMP TABLE query (key INTEGER, passage INTEGER)")
+            conn.executemany(
+                "INSERT INTO query VALUES (?, ?)",
+                ((int(key), i) for i, row in enumerate(keys) for key in row),
+            )
+            rows = conn.execute(
+                """
+                SELECT q.passage, p.doc, papers.name, p.text, p.signature
+                FROM query q
+                JOIN buckets b ON b.key = q.key
+                JOIN passages p ON p.doc = b.doc AND p.passage = b.passage
+                JOIN papers ON papers.doc = p.doc
+                WHERE b.doc != ?
+                GROUP BY q.passage, b.doc, b.passage
+                """,
+                (doc_hash or "",),
+            ).fetchall()
+
+        best = {}
+        if rows:
+            candidates = np.frombuffer(b"".join(r[4] for r in rows), dtype=np.uint32).reshape(len(rows), NUM_PERM)
+            query_rows = passages.signatures[[r[0] for r in rows]]
+            similarity = (candidates == query_rows).mean(axis=1)
+            for row, score in zip(rows, similarity):
+                if score >= self.threshold and (row[0] not in best or score > best[row[0]].similarity):
+                    best[row[0]] = Match(row[0], row[1], row[2] or row[1][:12], row[3], float(score))
+
+        return OriginalityReport(passages, list(best.values()), papers_indexed, time.perf_counter() - started)
+
+
+def format_report(report, max_spans=5):
+    """
+    Markdown summary of an OriginalityReport for the app and Research Notes.
+    """
+    lines = [
+        f"**Originality (local check): {report.originality:.0%}** — "
+        f"{len(report.passages)} passages compared with {report.papers_indexed} indexed papers "
+        f"in {report.seconds * 1000:.0f} ms.",
+    ]
+    spans = report.spans()
+    if not spans:
+        lines.append("No overlapping passages found.")
+        return "\n\n".join(lines)
+
+    lines.append(f"Overlapping passages ({len(spans)}):")
+    for text, name, _, similarity in sorted(spans, key=lambda s: -s[3])[:max_spans]:
+        excerpt = text if len(text) <= 300 else text[:300] + "..."
+        lines.append(f"- {similarity:.0%} similar to *{name}*: \"{excerpt}\"")
+    return "\n\n".join(lines)
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_default_index():
+    """
+    Returns the process-wide index, configured from the environment.
+    Set ORIGINALITY_INDEX_PATH to an empty string to disable it.
+    """
+    global _default_index
+    path = os.getenv("ORIGINALITY_INDEX_PATH", DEFAULT_INDEX_PATH)
+    if not path:
+        return None
+
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = OriginalityIndex(
+                path, threshold=float(os.getenv("ORIGINALITY_THRESHOLD", MATCH_THRESHOLD))
+            )
+        return _default_index
+
+
+def index_paper(text, doc_hash, name=None):
+    """
+    Adds a processed paper (text or text windows) to the default index
+    (no-op when disabled).
+    """
+    index = get_default_index()
+    if index is None or (isinstance(text, str) and not text.strip()):
+        return False
+    return index.add(text, doc_hash, name)
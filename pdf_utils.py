@@ -1,13 +1,753 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
 import fitz  # PyMuPDF
 
+import metrics
+from chunking import NUMBERED_HEADING_RE, mask_digits
+
+
+# ============================================================
+#  EXTRACTION ENGINE (STREAMING, PAGE-PARALLEL)
+# ============================================================
+
+# Below this many pages per worker, process start-up costs more than it saves
+MIN_PAGES_PER_WORKER = 32
+
+
+def _open(source):
+    """
+    Opens a PDF from a file path or from bytes held in memory.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def iter_pages(source, start=0, stop=None):
+    """
+    Yields (page_index, text) for each page in [start, stop) without holding
+    the whole document's text in memory.
+    """
+    doc = _open(source)
+    try:
+        stop = len(doc) if stop is None else min(stop, len(doc))
+        for index in range(start, stop):
+            yield index, doc[index].get_text()
+    finally:
+        doc.close()
+
+
+def _extract_page_range(source, start, stop):
+    # Runs in a worker process; each worker opens its own fitz document
+    return [text for _, text in iter_pages(source, start, stop)]
+
+
+def page_count(source):
+    doc = _open(source)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+@metrics.timed("extract_pages")
+def extract_pages(source, workers=None):
+    """
+    Returns the text of every page as a list. Large documents are split into
+    contiguous page ranges extracted by a process pool.
+    """
+    return _map_page_ranges(source, _extract_page_range, workers)
+
+
+_pool = None
+_pool_lock = threading.Lock()
 
-def extract_text_from_pdf(file_path):
+
+def _get_pool():
+    """
+    The process-wide extraction pool, started on first use and reused.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking the multi-threaded Streamlit / API server is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+@contextmanager
+def _as_path(source):
+    """
+    Yields a file path for `source`, writing bytes to a temp file so pool
+    workers open the PDF from disk instead of each unpickling a copy.
+    """
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        yield source
+        return
+
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        yield path
+    finally:
+        os.remove(path)
+
+
+def _map_page_ranges(source, fn, workers=None):
+    """
+    Runs fn(source, start, stop) over contiguous page ranges and concatenates
+    the per-page results, using the process pool for large documents.
+    """
+    global _pool
+    total = page_count(source)
+    workers = min(workers or os.cpu_count() or 1, total // MIN_PAGES_PER_WORKER)
+
+    if workers <= 1:
+        return fn(source, 0, total)
+
+    step = -(-total // workers)  # ceil division
+    ranges = [(start, min(start + step, total)) for start in range(0, total, step)]
+
+    pages = []
+    with _as_path(source) as path:
+        pool = _get_pool()
+        try:
+            futures = [pool.submit(fn, path, a, b) for a, b in ranges]
+            for future in futures:
+                pages.extend(future.result())
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool next time
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+            raise
+    return pages
+
+
+class ExtractedText:
+    """
+    Full document text plus the character offset where each page starts.
+    """
+
+    __slots__ = ("text", "page_offsets")
+
+    def __init__(self, pages, separator=""):
+        offsets = []
+        position = 0
+        for page in pages:
+            offsets.append(position)
+            position += len(page) + len(separator)
+        self.text = separator.join(pages)  # single allocation
+        self.page_offsets = offsets
+
+    @property
+    def page_total(self):
+        return len(self.page_offsets)
+
+    def page_of(self, offset):
+        """
+        Returns the 0-based page index containing character `offset`.
+        """
+        return max(0, bisect_right(self.page_offsets, offset) - 1)
+
+    def page_text(self, index):
+        end = self.page_offsets[index + 1] if index + 1 < self.page_total else len(self.text)
+        return self.text[self.page_offsets[index]:end]
+
+    def marked_text(self):
+        """
+        The text with a "--- Page N ---" marker before each page.
+        """
+        return add_page_markers(self.page_text(i) for i in range(self.page_total))
+
+
+def add_page_markers(pages):
+    return "".join(f"--- Page {n} ---\n{text}\n" for n, text in enumerate(pages, 1))
+
+
+def extract_document(source, workers=None):
+    """
+    Extracts a PDF (path or bytes) into an ExtractedText with page offsets.
+    """
+    return ExtractedText(extract_pages(source, workers))
+
+
+def extract_text_from_pdf(file_path, page_markers=False):
     """
     Extracts all text from a PDF file path and returns as a string.
+    With `page_markers`, each page is prefixed with "--- Page N ---".
     """
-    doc = fitz.open(file_path)  # Open the PDF
-    text = ""
-    for page in doc:
-        text += page.get_text()  # Extract text from each page
-    doc.close()
+    pages = extract_pages(file_path)
+    if page_markers:
+        return add_page_markers(pages)
+    return "".join(pages)
+
+
+def extract_text_from_bytes(data, workers=None):
+    """
+    Extracts all text from PDF bytes held in memory and returns as a string.
+    """
+    return "".join(extract_pages(data, workers))
+
+
+def document_hash(data):
+    """
+    Returns the SHA-256 hex digest identifying a PDF by its bytes.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+# ============================================================
+#  EXTRACTION CACHE (CONTENT-ADDRESSED)
+# ============================================================
+
+class ExtractionCache:
+    """
+    Caches extracted PDF text keyed by the SHA-256 of the PDF bytes.
+
+    Entries live in an in-memory LRU bounded by `max_bytes`. When `disk_dir`
+    is set, entries are also written there as `<sha256>.txt` so they survive
+    process restarts and can be shared between workers.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.txt")
+
+    def _put_memory(self, key, text):
+        size = sys.getsizeof(text)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= sys.getsizeof(self._entries.pop(key))
+            self._entries[key] = text
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= sys.getsizeof(evicted)
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                return text
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                    text = f.read()
+            except OSError:
+                return None
+            self._put_memory(key, text)
+            return text
+
+        return None
+
+    def put(self, key, text):
+        self._put_memory(key, text)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                os.replace(tmp_path, path)
+            except OSError:
+                # The disk tier is best-effort; the memory tier still holds it.
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+extraction_cache = ExtractionCache(
+    max_bytes=int(os.getenv("PDF_TEXT_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+    disk_dir=os.getenv("PDF_TEXT_CACHE_DIR") or None,
+)
+
+
+def extract_text_cached(data, doc_hash=None, cache=None):
+    """
+    Returns the text of PDF bytes, parsing with PyMuPDF only on a cache miss.
+    """
+    cache = cache or extraction_cache
+    key = doc_hash or document_hash(data)
+
+    text = cache.get(key)
+    metrics.record_cache("pdf_text", text is not None)
+    if text is None:
+        text = extract_text_from_bytes(data)
+        cache.put(key, text)
     return text
+
+
+# ============================================================
+#  DOCUMENT MODEL (LAYOUT-AWARE SECTIONS, MEMOIZED)
+# ============================================================
+
+NAMED_HEADING_RE = re.compile(
+    r"^(?:abstract|introduction|related work|background|methods?|methodology|experiments?|"
+    r"results?|discussion|conclusions?|concluding remarks|references|bibliography|"
+    r"acknowledg(?:e)?ments?|appendix)\b",
+    re.IGNORECASE,
+)
+
+# Blocks in the top/bottom margin repeated on this share of pages are headers/footers
+MARGIN = 0.1
+REPEATED_BLOCK_SHARE = 0.5
+HEADING_SIZE_RATIO = 1.15
+BOLD_FLAG = 16
+# TeX math, Symbol and OpenType math fonts
+MATH_FONT_RE = re.compile(r"cmmi|cmsy|cmex|msam|msbm|eufm|rsfs|symbol|math|stix|mt ?extra", re.IGNORECASE)
+
+
+class Paragraph:
+    __slots__ = ("page", "start", "end", "font_size", "bold", "top", "math_chars")
+
+    def __init__(self, page, start, end, font_size, bold=False, top=0.0, math_chars=0):
+        self.page = page
+        self.start = start
+        self.end = end
+        self.font_size = font_size
+        self.bold = bold
+        self.top = top  # fraction of the page height
+        self.math_chars = math_chars  # characters set in a math/symbol font
+
+
+class DocumentSection:
+    """
+    A detected section: the heading starts at `start`, its body runs from
+    `body_start` to `end` in Document.text.
+    """
+
+    __slots__ = ("heading", "level", "page", "start", "body_start", "end")
+
+    def __init__(self, heading, level, page, start, body_start, end):
+        self.heading = heading
+        self.level = level
+        self.page = page
+        self.start = start
+        self.body_start = body_start
+        self.end = end
+
+
+class Document(ExtractedText):
+    """
+    Structured view of a paper built from PyMuPDF layout spans: text with
+    page offsets, paragraphs (text blocks) and sections detected from font
+    size, weight and numbering, plus the PDF's metadata (title, author, ...).
+    Running headers/footers are left out. `derived` memoizes values computed
+    from the document (packing sections, ...) so they live exactly as long
+    as it does.
+    """
+
+    __slots__ = ("doc_hash", "paragraphs", "sections", "body_font_size", "metadata", "derived")
+
+    def __init__(self, doc_hash, text, page_offsets, paragraphs, sections, body_font_size, metadata=None):
+        self.doc_hash = doc_hash
+        self.text = text
+        self.page_offsets = page_offsets
+        self.paragraphs = paragraphs
+        self.sections = sections
+        self.body_font_size = body_font_size
+        self.metadata = metadata or {}
+        self.derived = {}
+
+    @property
+    def front_matter(self):
+        """
+        Text before the first section heading (title, authors, often the abstract).
+        """
+        end = self.sections[0].start if self.sections else len(self.text)
+        return self.text[:end].strip()
+
+    def section_text(self, section):
+        return self.text[section.body_start:section.end].strip()
+
+    def find_section(self, name):
+        """
+        Returns the first section whose heading contains `name`, or None.
+        """
+        name = name.lower()
+        for section in self.sections:
+            if name in section.heading.lower():
+                return section
+        return None
+
+
+def _layout_page_range(source, start, stop):
+    # Runs in a worker process. Returns per page a list of
+    # (text, font_size, all_bold, top, bottom, math_chars) tuples, one per run
+    # of same-styled lines, so a bold heading line opening a block stands alone.
+    doc = _open(source)
+    try:
+        pages = []
+        for index in range(start, min(stop, len(doc))):
+            page = doc[index]
+            height = page.rect.height or 1.0
+            runs = []
+            for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+                style = None
+                for line in block.get("lines", ()):
+                    spans = [span for span in line["spans"] if span["text"].strip()]
+                    if not spans:
+                        continue
+                    text = "".join(span["text"] for span in line["spans"]).strip()
+                    size = max(span["size"] for span in spans)
+                    bold = all(span["flags"] & BOLD_FLAG for span in spans)
+                    top, bottom = line["bbox"][1] / height, line["bbox"][3] / height
+                    math_chars = sum(len(span["text"].strip()) for span in spans if MATH_FONT_RE.search(span["font"]))
+
+                    if style == (round(size), bold):
+                        prev = runs[-1]
+                        runs[-1] = (
+                            f"{prev[0]}\n{text}", max(prev[1], round(size, 1)), bold, prev[3], bottom, prev[5] + math_chars
+                        )
+                    else:
+                        style = (round(size), bold)
+                        runs.append((text, round(size, 1), bold, top, bottom, math_chars))
+            pages.append(runs)
+        return pages
+    finally:
+        doc.close()
+
+
+def _is_heading(text, size, bold, body_size):
+    if "\n" in text.strip() and text.count("\n") > 1:
+        return False
+    line = " ".join(text.split())
+    if not line or len(line) > 100 or line.endswith((".", ",", ";")):
+        return False
+    # Needs a real word and mostly letters (rules out large equation glyphs)
+    letters = sum(c.isalpha() or c.isspace() for c in line)
+    if not re.search(r"[A-Za-z]{3,}", line) or letters < 0.7 * len(line):
+        return False
+
+    numbered = bool(NUMBERED_HEADING_RE.match(line))
+    named = bool(NAMED_HEADING_RE.match(line))
+    larger = size >= body_size * HEADING_SIZE_RATIO
+    return (larger and (numbered or named or len(line.split()) <= 12)) or (bold and (numbered or named))
+
+
+def _heading_level(line, size, heading_sizes):
+    match = NUMBERED_HEADING_RE.match(line)
+    if match:
+        numbers = match.group(1).split(".")
+        while len(numbers) > 1 and numbers[-1] == "0":  # "1.0 Introduction" is top level
+            numbers.pop()
+        return len(numbers)
+    if NAMED_HEADING_RE.match(line):
+        return 1
+    # Otherwise: rank of its font size among heading sizes (largest = 1)
+    return heading_sizes.index(size) + 1 if size in heading_sizes else 1
+
+
+def build_document(source, doc_hash=None, workers=None, max_pages=None):
+    """
+    Parses a PDF (path or bytes) into a Document, or only its first
+    `max_pages` pages. Prefer load_document(), which memoizes the result per
+    document hash.
+    """
+    if max_pages:
+        pages = _layout_page_range(source, 0, max_pages)
+    else:
+        pages = _map_page_ranges(source, _layout_page_range, workers)
+
+    # Body font size: the size carrying the most characters
+    weight = {}
+    for blocks in pages:
+        for text, size, _, _, _, _ in blocks:
+            weight[size] = weight.get(size, 0) + len(text)
+    body_size = max(weight, key=weight.get) if weight else 0.0
+
+    # Running headers/footers: margin blocks repeated across pages
+    def in_margin(text, top, bottom):
+        return len(text) <= 160 and (top < MARGIN or bottom > 1 - MARGIN)
+
+    repeats = {}
+    for blocks in pages:
+        for key in {mask_digits(text) for text, _, _, top, bottom, _ in blocks if in_margin(text, top, bottom)}:
+            repeats[key] = repeats.get(key, 0) + 1
+    min_repeats = max(2, int(len(pages) * REPEATED_BLOCK_SHARE))
+    boilerplate = {key for key, n in repeats.items() if n >= min_repeats or key == "#"}
+
+    candidates = []
+    parts = []
+    page_offsets = []
+    paragraphs = []
+    position = 0
+    for page_index, blocks in enumerate(pages):
+        page_offsets.append(position)
+        for text, size, bold, top, bottom, math_chars in blocks:
+            if in_margin(text, top, bottom) and mask_digits(text) in boilerplate:
+                continue
+            paragraphs.append(Paragraph(page_index, position, position + len(text), size, bold, top, math_chars))
+            if _is_heading(text, size, bold, body_size):
+                candidates.append((" ".join(text.split()), size, page_index, position, position + len(text)))
+            parts.append(text)
+            position += len(text) + 2
+    text = "\n\n".join(parts)
+
+    # Adjacent heading runs of the same size are one heading wrapped over lines
+    merged = []
+    for candidate in candidates:
+        prev = merged[-1] if merged else None
+        if prev and prev[1] == candidate[1] and prev[2] == candidate[2] and candidate[3] == prev[4] + 2:
+            merged[-1] = (f"{prev[0]} {candidate[0]}", prev[1], prev[2], prev[3], candidate[4])
+        else:
+            merged.append(candidate)
+    candidates = merged
+
+    # The largest text on the first page before any heading is the title, not a section
+    first_page = [c for c in candidates if c[2] == 0]
+    if first_page:
+        title = first_page[0]
+        if (title[1] >= max(c[1] for c in first_page)
+                and not NUMBERED_HEADING_RE.match(title[0]) and not NAMED_HEADING_RE.match(title[0])):
+            candidates.remove(title)
+
+    heading_sizes = sorted({c[1] for c in candidates}, reverse=True)
+    sections = []
+    for i, (line, size, page_index, start, body_start) in enumerate(candidates):
+        end = candidates[i + 1][3] if i + 1 < len(candidates) else len(text)
+        sections.append(DocumentSection(line, _heading_level(line, size, heading_sizes), page_index, start, body_start, end))
+
+    doc = _open(source)
+    try:
+        metadata = {key: value for key, value in (doc.metadata or {}).items() if value}
+    finally:
+        doc.close()
+
+    return Document(doc_hash, text, page_offsets, paragraphs, sections, body_size, metadata)
+
+
+# Documents are larger than plain text; keep only the most recent few
+DOCUMENT_CACHE_SIZE = int(os.getenv("DOCUMENT_CACHE_SIZE", 8))
+_documents = OrderedDict()
+_documents_lock = threading.Lock()
+
+
+def load_document(source, doc_hash=None, max_pages=None):
+    """
+    Returns the Document for PDF bytes (or a path), building it once per
+    document hash and reusing it afterwards. With `max_pages`, only the first
+    pages are parsed (front matter of a very large PDF).
+    """
+    if doc_hash is None:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            doc_hash = document_hash(bytes(source))
+        else:
+            with open(source, "rb") as f:
+                doc_hash = document_hash(f.read())
+
+    document = cached_document(doc_hash, max_pages)
+    if document is None:
+        document = build_document(source, doc_hash, max_pages=max_pages)
+        cache_document(document, max_pages)
+    return document
+
+
+def cached_document(doc_hash, max_pages=None):
+    """
+    The memoized Document for `doc_hash`, or None. For callers that build
+    documents elsewhere (e.g. the API's process pool).
+    """
+    key = doc_hash if max_pages is None else (doc_hash, max_pages)
+    with _documents_lock:
+        document = _documents.get(key)
+        if document is not None:
+            _documents.move_to_end(key)
+    metrics.record_cache("document", document is not None)
+    return document
+
+
+def cache_document(document, max_pages=None):
+    key = document.doc_hash if max_pages is None else (document.doc_hash, max_pages)
+    with _documents_lock:
+        _documents[key] = document
+        while len(_documents) > DOCUMENT_CACHE_SIZE:
+            _documents.popitem(last=False)
+
+
+# ============================================================
+#  TITLE & AUTHORS (FIRST-PAGE LAYOUT + PDF METADATA)
+# ============================================================
+
+# Below this confidence callers should ask the LLM instead
+TITLE_MIN_CONFIDENCE = float(os.getenv("TITLE_MIN_CONFIDENCE", 0.6))
+
+# Large first-page text that is not the title (journal banners, arXiv stamps)
+NOT_TITLE_RE = re.compile(
+    r"^(?:arxiv|doi|https?:|www\.|vol(?:ume)?\b|journal\b|proceedings|received|accepted|published|"
+    r"copyright|©|issn|preprint|available online|contents lists|research article|original article)",
+    re.IGNORECASE,
+)
+AFFILIATION_RE = re.compile(
+    r"@|\b(?:universit|institut|department|dept\.|school|college|laborator|faculty|centre|center|"
+    r"corresponding|e-?mail|abstract)",
+    re.IGNORECASE,
+)
+# Metadata titles written by tools rather than authors
+GENERATED_TITLE_RE = re.compile(r"^(?:microsoft word|untitled|document\d*$)|\.(?:docx?|pdf|tex|dvi)$", re.IGNORECASE)
+NAME_PARTICLES = {"van", "von", "de", "del", "der", "da", "di", "du", "la", "le", "bin", "al"}
+NOT_NAME_WORDS = {"the", "of", "and", "for", "in", "on", "a", "an", "with", "to", "by", "using", "via"}
+
+
+class PaperHeader:
+    """
+    Title and authors read from a paper's first page, each with a confidence
+    in [0, 1] (see TITLE_MIN_CONFIDENCE).
+    """
+
+    __slots__ = ("title", "title_confidence", "authors", "authors_confidence")
+
+    def __init__(self, title, title_confidence, authors, authors_confidence):
+        self.title = title
+        self.title_confidence = title_confidence
+        self.authors = authors
+        self.authors_confidence = authors_confidence
+
+
+def _words(text):
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def _overlap(a, b):
+    a, b = _words(a), _words(b)
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def _plausible_title(line):
+    words = line.split()
+    if not 2 <= len(words) <= 40 or NOT_TITLE_RE.match(line) or AFFILIATION_RE.search(line):
+        return False
+    letters = sum(c.isalpha() or c.isspace() for c in line)
+    return letters >= 0.8 * len(line)
+
+
+def _is_name(piece):
+    words = piece.replace(".", ". ").split()
+    if not 2 <= len(words) <= 5 or words[-1].endswith("."):
+        return False
+    for i, word in enumerate(words):
+        if word.lower() in NOT_NAME_WORDS:
+            return False
+        if word.lower() in NAME_PARTICLES and 0 < i < len(words) - 1:
+            continue
+        if not word[0].isupper() or not all(c.isalpha() or c in ".'’-" for c in word):
+            return False
+    return True
+
+
+def _split_authors(line):
+    # Drop affiliation markers (superscript digits, *, †) before splitting
+    line = re.sub(r"[\d*†‡§¶#⁰¹²³⁴⁵⁶⁷⁸⁹]+", " ", line)
+    pieces = [p.strip(" ,;") for p in re.split(r",|;|&|\band\b|\n", line)]
+    return [" ".join(p.split()) for p in pieces if p.strip(" ,;")]
+
+
+def detect_header(document):
+    """
+    Finds the title (largest plausible text in the top of page 1) and the
+    author line below it, cross-checked with the PDF metadata. Memoized
+    on the Document.
+    """
+    header = document.derived.get("header")
+    if header is None:
+        header = document.derived["header"] = _detect_header(document)
+    return header
+
+
+def _detect_header(document):
+    def text_of(paragraph):
+        return " ".join(document.text[paragraph.start:paragraph.end].split())
+
+    first_page = [p for p in document.paragraphs if p.page == 0]
+    candidates = [p for p in first_page if p.top < 0.66 and _plausible_title(text_of(p))]
+
+    title, confidence, title_end = None, 0.0, -1
+    if candidates:
+        size = max(p.font_size for p in candidates)
+        start = first_page.index(next(p for p in candidates if p.font_size == size))
+        # A title wrapped over several blocks of the same size
+        end = start
+        while end + 1 < len(first_page) and first_page[end + 1].font_size == size:
+            end += 1
+        title = " ".join(text_of(p) for p in first_page[start:end + 1])
+        title_end = end
+
+        others = [p.font_size for p in first_page if p.font_size < size] or [document.body_font_size]
+        confidence = 0.5
+        if size >= document.body_font_size * 1.3:
+            confidence += 0.2
+        if size >= max(others) * 1.15:
+            confidence += 0.15
+        if 3 <= len(title.split()) <= 30:
+            confidence += 0.1
+        else:
+            confidence -= 0.2
+        # Same-size text elsewhere on the page makes the choice ambiguous
+        if any(p.font_size == size for p in first_page[end + 1:]):
+            confidence -= 0.15
+
+    meta_title = " ".join((document.metadata.get("title") or "").split())
+    if len(meta_title.split()) >= 3 and not GENERATED_TITLE_RE.search(meta_title):
+        if title and _overlap(meta_title, title) >= 0.6:
+            confidence = max(confidence, 0.95)
+        elif confidence < TITLE_MIN_CONFIDENCE:
+            title, confidence = meta_title, 0.65
+
+    # Authors: name-like paragraphs between the title and the first section
+    # (affiliation lines in between are skipped)
+    authors, authors_confidence = [], 0.0
+    first_section = document.sections[0].start if document.sections else len(document.text)
+    for paragraph in first_page[title_end + 1:title_end + 12]:
+        if paragraph.start >= first_section:
+            break
+        line = document.text[paragraph.start:paragraph.end]
+        if AFFILIATION_RE.search(line):
+            continue
+        pieces = _split_authors(line)
+        names = [p for p in pieces if _is_name(p) and p not in authors]
+        if names and len(names) * 2 >= len(pieces):
+            authors.extend(names)
+            authors_confidence = 0.8 if title_end >= 0 else 0.6
+
+    meta_author = " ".join((document.metadata.get("author") or "").split())
+    meta_names = [p for p in _split_authors(meta_author) if _is_name(p)]
+    if meta_names:
+        surnames = {n.split()[-1].lower() for n in meta_names}
+        if authors and surnames & {n.split()[-1].lower() for n in authors}:
+            authors_confidence = 0.95
+        elif authors_confidence < TITLE_MIN_CONFIDENCE:
+            authors, authors_confidence = meta_names, 0.65
+
+    return PaperHeader(title, round(max(0.0, min(confidence, 1.0)), 2), authors, authors_confidence)
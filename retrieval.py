@@ -0,0 +1,270 @@
+import hashlib
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from chunking import split_into_chunks
+from metrics import timed
+
+
+# ============================================================
+#  PASSAGE RETRIEVAL FOR SEMANTIC SEARCH
+# ============================================================
+
+DEFAULT_INDEX_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".retrieval_index"
+)
+
+PASSAGE_TOKENS = 200
+
+STOPWORDS = frozenset(
+    """a an and are as at be by for from has have in is it its of on or that the
+    this to was were will with we our their these those which using used can
+    also than such into between been not but they""".split()
+)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+@lru_cache(maxsize=200_000)
+def _token_hash(token):
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class TfidfEmbedder:
+    """
+    Offline embedder: hashed TF-IDF vectors (sublinear tf) over the passages
+    of one document. Uses crc32 for hashing so vectors are stable across
+    processes and can be persisted.
+    """
+
+    name = "tfidf"
+
+    def __init__(self, dim=4096, idf=None):
+        self.dim = dim
+        self.idf = idf
+
+    def _counts(self, texts):
+        rows = []
+        cols = []
+        for row, text in enumerate(texts):
+            buckets = [_token_hash(token) % self.dim for token in tokenize(text)]
+            rows.extend([row] * len(buckets))
+            cols.extend(buckets)
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+        return matrix
+
+    def embed_documents(self, passages):
+        counts = self._counts(passages)
+        df = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(passages)) / (1 + df)) + 1.0).astype(np.float32)
+        return _normalize_rows(np.log1p(counts) * self.idf)
+
+    def embed_query(self, query):
+        return _normalize_rows(np.log1p(self._counts([query])) * self.idf)[0]
+
+    def state(self):
+        # An index without passages never fitted idf; save it as an empty array
+        return {"idf": self.idf if self.idf is not None else np.zeros(0, np.float32)}
+
+    @classmethod
+    def from_state(cls, state):
+        idf = state["idf"]
+        return cls(idf=idf, dim=len(idf)) if len(idf) else cls()
+
+
+class GeminiEmbedder:
+    """
+    Embeds passages with the Gemini embedding API. Requires network access;
+    get_index falls back to TfidfEmbedder if it fails.
+    """
+
+    name = "gemini"
+
+    def __init__(self, model="models/text-embedding-004", batch_size=100):
+        self.model = model
+        self.batch_size = batch_size
+
+    def _embed(self, texts, task_type):
+        import google.generativeai as genai
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            result = genai.embed_content(
+                model=self.model,
+                content=texts[start:start + self.batch_size],
+                task_type=task_type,
+            )
+            vectors.extend(result["embedding"])
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed_documents(self, passages):
+        return _normalize_rows(self._embed(passages, "retrieval_document"))
+
+    def embed_query(self, query):
+        return _normalize_rows(self._embed([query], "retrieval_query"))[0]
+
+    def state(self):
+        return {}
+
+    @classmethod
+    def from_state(cls, state):
+        return cls()
+
+
+EMBEDDERS = {
+    TfidfEmbedder.name: TfidfEmbedder,
+    GeminiEmbedder.name: GeminiEmbedder,
+}
+
+
+class DocumentIndex:
+    """
+    Passages of one document with an L2-normalized embedding matrix, so
+    cosine similarity is a single matrix-vector product.
+    """
+
+    def __init__(self, passages, matrix, embedder):
+        self.passages = passages
+        self.matrix = matrix
+        self.embedder = embedder
+
+    @classmethod
+    def build(cls, text, embedder=None, passage_tokens=PASSAGE_TOKENS):
+        passages = split_into_chunks(text, passage_tokens)
+        embedder = embedder or TfidfEmbedder()
+        matrix = embedder.embed_documents(passages) if passages else np.zeros((0, 1), np.float32)
+        return cls(passages, matrix, embedder)
+
+    def search(self, query, top_k=5):
+        """
+        Returns [(passage_index, score)] for the `top_k` most similar passages.
+        """
+        if not self.passages:
+            return []
+        scores = self.matrix @ self.embedder.embed_query(query)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            # Fixed-width strings, so loading never needs pickle
+            passages=np.asarray(self.passages, dtype=str),
+            matrix=self.matrix,
+            embedder=np.asarray(self.embedder.name),
+            **self.embedder.state(),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        # No pickle: a file planted in the index directory must not run code
+        with np.load(path, allow_pickle=False) as data:
+            embedder_cls = EMBEDDERS[str(data["embedder"])]
+            state = {key: data[key] for key in data.files if key not in ("passages", "matrix", "embedder")}
+            return cls([str(p) for p in data["passages"]], data["matrix"], embedder_cls.from_state(state))
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+MAX_MEMORY_INDEXES = 16
+
+
+def default_embedder():
+    """
+    Embedder chosen by RETRIEVAL_EMBEDDER ("tfidf" by default, or "gemini").
+    """
+    return EMBEDDERS.get(os.getenv("RETRIEVAL_EMBEDDER", "tfidf"), TfidfEmbedder)()
+
+
+def get_index(text, doc_hash=None, index_dir=None):
+    """
+    Returns the passage index for a document, memoized in memory and
+    persisted as `<doc_hash>-<embedder>.npz` in RETRIEVAL_INDEX_DIR (empty
+    disables). `text` may be a callable returning the text, called only when
+    the index has to be built (e.g. decoding a very large spilled text).
+    """
+    if doc_hash is None:
+        text = _resolve(text)
+    base_key = doc_hash or hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if index_dir is None:
+        index_dir = os.getenv("RETRIEVAL_INDEX_DIR", DEFAULT_INDEX_DIR)
+
+    embedder = default_embedder()
+    try:
+        return _load_or_build(text, base_key, embedder, index_dir)
+    except Exception:
+        # e.g. the Gemini embedding API is unreachable; stay offline. The
+        # fallback is kept under its own key, so the next call retries Gemini
+        # but reuses the saved fallback instead of rebuilding it
+        if embedder.name == TfidfEmbedder.name:
+            raise
+        return _load_or_build(text, base_key, TfidfEmbedder(), index_dir)
+
+
+def _resolve(text):
+    return text() if callable(text) else text
+
+
+def _load_or_build(text, base_key, embedder, index_dir):
+    key = f"{base_key}-{embedder.name}"
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    path = os.path.join(index_dir, f"{key}.npz") if index_dir else None
+    index = None
+    if path and os.path.exists(path):
+        try:
+            index = DocumentIndex.load(path)
+        except (OSError, ValueError, KeyError):
+            index = None
+
+    if index is None:
+        index = DocumentIndex.build(_resolve(text), embedder)
+        if path:
+            try:
+                os.makedirs(index_dir, exist_ok=True)
+                index.save(path)
+            except OSError:
+                pass
+
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_MEMORY_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+@timed("retrieval")
+def retrieve_passages(query, text, top_k=5, doc_hash=None):
+    """
+    Returns the `top_k` passages most relevant to `query`, in document order.
+    `text` may be a callable (see get_index).
+    """
+    index = get_index(text, doc_hash)
+    hits = index.search(query, top_k)
+    return [index.passages[i] for i, _ in sorted(hits)]
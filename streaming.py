@@ -0,0 +1,357 @@
+"""
+Bounded-memory, resumable extraction for very large PDFs.
+
+The upload is copied to disk in fixed-size chunks (hashed on the way),
+pages are extracted in windows and appended to a spill file on disk, and a
+checkpoint after every window lets an interrupted run (a Streamlit rerun, a
+crash) resume at the last finished page. The spilled text is read back
+through mmap, so pages (or windows of pages) can be fetched without
+loading the whole text; only texts up to STREAM_CACHE_MAX_BYTES are
+decoded in full and kept in the extraction cache.
+"""
+
+import array
+import hashlib
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+import fitz  # PyMuPDF
+
+import metrics
+from pdf_utils import add_page_markers, extraction_cache, iter_pages, page_count
+
+
+CHUNK_SIZE = 1024 * 1024
+WINDOW_PAGES = int(os.getenv("STREAM_WINDOW_PAGES", 16))
+# Uploads above this size take the streaming path in the app
+LARGE_UPLOAD_BYTES = int(os.getenv("STREAM_THRESHOLD_BYTES", 32 * 1024 * 1024))
+STREAM_TTL = float(os.getenv("STREAM_TTL", 24 * 3600))
+# Spilled texts up to this size are decoded and cached like regular uploads
+STREAM_CACHE_MAX_BYTES = int(os.getenv("STREAM_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+# Pages are grouped into windows of about this many bytes for consumers
+# that process the text piece by piece
+WINDOW_BYTES = 1024 * 1024
+
+
+def default_stream_dir():
+    # Stable across restarts so interrupted extractions can resume
+    path = os.getenv("STREAM_DIR") or os.path.join(tempfile.gettempdir(), "summarizer-stream")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def prune(directory, max_age=STREAM_TTL):
+    """
+    Deletes spooled PDFs, spill files and checkpoints older than `max_age`.
+    """
+    cutoff = time.time() - max_age
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+# ============================================================
+#  CHUNKED UPLOAD SPOOLING
+# ============================================================
+
+def spool_upload(fileobj, directory=None, chunk_size=CHUNK_SIZE):
+    """
+    Copies a file-like upload to `<directory>/<sha256>.pdf` in chunks,
+    hashing as it goes. Returns (path, doc_hash).
+    """
+    directory = directory or default_stream_dir()
+    os.makedirs(directory, exist_ok=True)
+    hasher = hashlib.sha256()
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+
+    fd, partial = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+        doc_hash = hasher.hexdigest()
+        path = os.path.join(directory, f"{doc_hash}.pdf")
+        if os.path.exists(path):
+            os.remove(partial)  # same document already spooled (e.g. a rerun)
+        else:
+            os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return path, doc_hash
+
+
+def file_hash(path, chunk_size=CHUNK_SIZE):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+# ============================================================
+#  MEMORY-MAPPED SPILLED TEXT
+# ============================================================
+
+class SpilledText:
+    """
+    Extracted text stored on disk as UTF-8, read through mmap. `page_offsets`
+    holds the byte offset where each page starts.
+    """
+
+    __slots__ = ("path", "page_offsets", "_file", "_mm")
+
+    def __init__(self, path, page_offsets):
+        self.path = path
+        self.page_offsets = page_offsets
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    @property
+    def page_total(self):
+        return len(self.page_offsets)
+
+    @property
+    def size(self):
+        return len(self._mm) if self._mm is not None else 0
+
+    def _slice(self, start, end):
+        if self._mm is None:
+            return ""
+        return self._mm[start:end].decode("utf-8")
+
+    def page_text(self, index):
+        end = self.page_offsets[index + 1] if index + 1 < self.page_total else self.size
+        return self._slice(self.page_offsets[index], end)
+
+    def iter_pages(self):
+        for index in range(self.page_total):
+            yield self.page_text(index)
+
+    def iter_windows(self, max_bytes=WINDOW_BYTES):
+        """
+        Yields the text in runs of whole pages of about `max_bytes` each.
+        """
+        start = 0
+        for index in range(1, self.page_total + 1):
+            end = self.page_offsets[index] if index < self.page_total else self.size
+            if end - start >= max_bytes or index == self.page_total:
+                if end > start:
+                    yield self._slice(start, end)
+                start = end
+
+    def head(self, chars):
+        """
+        The first `chars` characters, decoding only the pages needed.
+        """
+        parts, count = [], 0
+        for page in self.iter_pages():
+            parts.append(page)
+            count += len(page)
+            if count >= chars:
+                break
+        return "".join(parts)[:chars]
+
+    def marked_text(self):
+        """
+        The full text with a "--- Page N ---" marker before each page.
+        """
+        return add_page_markers(self.iter_pages())
+
+    def has_text(self):
+        # Searches the mapped bytes, so nothing is decoded
+        return self._mm is not None and re.search(rb"\S", self._mm) is not None
+
+    def text(self):
+        """
+        Decodes the full text (same result as pdf_utils.extract_text_from_pdf).
+        """
+        return self._slice(0, self.size)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ============================================================
+#  WINDOWED, RESUMABLE EXTRACTION
+# ============================================================
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _extraction_lock(base):
+    """
+    Serializes extractions of one document (`base` is its spill path without
+    extension) across threads, and across processes with flock on
+    `<base>.lock`, so two runs never append to the same spill files.
+    """
+    with _locks_guard:
+        lock = _locks.setdefault(base, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        with open(base + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class StreamingExtractor:
+    """
+    Extracts `pdf_path` `window` pages at a time into `<work_dir>/<hash>.txt`
+    (text) and `.idx` (page byte offsets), checkpointing to `.json` after
+    every window so run() resumes where a previous run stopped.
+    """
+
+    def __init__(self, pdf_path, work_dir=None, doc_hash=None, window=WINDOW_PAGES):
+        self.pdf_path = pdf_path
+        self.work_dir = work_dir or default_stream_dir()
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.doc_hash = doc_hash or file_hash(pdf_path)
+        self.window = max(1, window)
+        base = self.base = os.path.join(self.work_dir, self.doc_hash)
+        self.text_path = base + ".txt"
+        self.index_path = base + ".idx"
+        self.checkpoint_path = base + ".json"
+
+    def checkpoint(self):
+        """
+        Returns {"pages_done", "page_total", "bytes"} from the last finished
+        window, or zeros when nothing was processed yet.
+        """
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"pages_done": 0, "page_total": None, "bytes": 0}
+
+    def _save_checkpoint(self, pages_done, page_total, size):
+        partial = self.checkpoint_path + ".part"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump({"pages_done": pages_done, "page_total": page_total, "bytes": size}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, self.checkpoint_path)
+
+    @property
+    def complete(self):
+        state = self.checkpoint()
+        return state["page_total"] is not None and state["pages_done"] >= state["page_total"]
+
+    @metrics.timed("stream_extract")
+    def run(self, progress=None):
+        """
+        Extracts the remaining pages and returns a SpilledText. `progress`,
+        if given, is called as progress(pages_done, page_total) per window.
+        Concurrent runs for the same document wait for each other; once the
+        extraction is complete, the spill files are only read.
+        """
+        with _extraction_lock(self.base):
+            total = page_count(self.pdf_path)
+            state = self.checkpoint()
+            if state["page_total"] == total and state["pages_done"] >= total:
+                # Complete: never reopen for writing, since another reader may
+                # have the text mmapped and truncating it would SIGBUS them
+                return self.open()
+            self._extract(total, state, progress)
+            return self.open()
+
+    def _extract(self, total, state, progress):
+        done, size = state["pages_done"], state["bytes"]
+
+        # Drop anything written after the last checkpoint (interrupted window)
+        mode = "r+b" if os.path.exists(self.text_path) else "w+b"
+        with open(self.text_path, mode) as text_out, open(self.index_path, "a+b") as index_out:
+            text_out.truncate(size)
+            text_out.seek(size)
+            index_out.truncate(done * array.array("Q").itemsize)
+
+            for start in range(done, total, self.window):
+                stop = min(start + self.window, total)
+                offsets = array.array("Q")
+                for _, page in iter_pages(self.pdf_path, start, stop):
+                    offsets.append(size)
+                    data = page.encode("utf-8")
+                    text_out.write(data)
+                    size += len(data)
+
+                offsets.tofile(index_out)
+                text_out.flush()
+                index_out.flush()
+                os.fsync(text_out.fileno())
+                os.fsync(index_out.fileno())
+                self._save_checkpoint(stop, total, size)
+
+                # Release MuPDF's object cache so memory stays flat across windows
+                fitz.TOOLS.store_shrink(100)
+                if progress:
+                    progress(stop, total)
+
+        if done >= total:
+            self._save_checkpoint(total, total, size)
+
+    def open(self):
+        offsets = array.array("Q")
+        with open(self.index_path, "rb") as f:
+            offsets.frombytes(f.read())
+        return SpilledText(self.text_path, offsets)
+
+
+def extract_text_streaming(pdf_path, doc_hash=None, work_dir=None, progress=None):
+    """
+    Extracts a PDF on disk window by window (resuming an interrupted run)
+    and returns its SpilledText. Use spilled_text() for the decoded text.
+    """
+    return StreamingExtractor(pdf_path, work_dir, doc_hash).run(progress)
+
+
+def spilled_text(spilled, doc_hash):
+    """
+    Decodes the full text of `spilled`. Texts up to STREAM_CACHE_MAX_BYTES
+    are kept in pdf_utils' extraction cache; larger ones are decoded on each
+    call and left for the caller to drop.
+    """
+    if spilled.size > STREAM_CACHE_MAX_BYTES:
+        return spilled.text()
+
+    text = extraction_cache.get(doc_hash)
+    metrics.record_cache("pdf_text", text is not None)
+    if text is None:
+        text = spilled.text()
+        extraction_cache.put(doc_hash, text)
+    return text
@@ -1,40 +1,100 @@
+import io
+import json
 import os
-import google.generativeai as genai
-import streamlit as st
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 
-from pptx import Presentation
-from pptx.util import Inches, Pt
-
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import letter
+# Heavy dependencies (google.generativeai, streamlit, pptx, reportlab, numpy)
+# are imported on first use so importing this module stays cheap.
+from artifacts import render_cache
+from chunking import estimate_tokens, split_into_chunks
+from gemini_scheduler import INTERACTIVE
+from metrics import timed
+from model_routing import generate_routed, generate_routed_stream, summary_route
 
 
 # ============================================================
 #  GEMINI API KEY HANDLING (LOCAL + DEPLOYMENT SAFE)
 # ============================================================
 
-# 1) Try Streamlit Cloud secrets first
-if "GEMINI_API_KEY" in st.secrets:
-    GEMINI_API_KEY = st.secrets["GEMINI_API_KEY"]
+MODEL_NAME = "gemini-2.0-flash"
+
+# Model override, created lazily by get_model() otherwise (tests may assign a
+# fake, which then serves every route)
+model = None
+_models = {}
+_model_lock = threading.Lock()
+_configured = False
 
-# 2) Fall back to system environment variable for local testing
-else:
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    raise ValueError("❌ Gemini API Key missing. Add it to st.secrets or .env environment variable.")
+def get_api_key():
+    # 1) Try Streamlit Cloud secrets first (only when running under Streamlit)
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            key = st.secrets.get("GEMINI_API_KEY")
+        except Exception:  # no secrets.toml at all
+            key = None
+        if key:
+            return key
 
-genai.configure(api_key=GEMINI_API_KEY)
+    # 2) Fall back to system environment variable for local testing
+    return os.getenv("GEMINI_API_KEY")
 
-# Main model
-model = genai.GenerativeModel("gemini-2.0-flash")
+
+def get_model(name=None):
+    """
+    Returns the Gemini model for a model name (MODEL_NAME by default),
+    configuring the client on first use.
+    """
+    global _configured
+    if model is not None:
+        return model
+
+    name = name or MODEL_NAME
+    with _model_lock:
+        if name not in _models:
+            import google.generativeai as genai
+
+            if not _configured:
+                api_key = get_api_key()
+                if not api_key:
+                    raise ValueError("❌ Gemini API Key missing. Add it to st.secrets or .env environment variable.")
+                genai.configure(api_key=api_key)
+                _configured = True
+            _models[name] = genai.GenerativeModel(name)
+        return _models[name]
+
+
+def _generate(prompt, priority=None, task="default", validate=None, **settings):
+    """
+    Returns the model's text for a prompt, served from the shared LLM
+    response cache when the same request was made before. Misses go through
+    the shared request scheduler (rate limits, retries, priority lanes).
+    `task` picks the model route (see model_routing): a result that fails
+    validation is retried on the next, stronger model.
+    """
+    return generate_routed(task, prompt, get_model, priority, validate, **settings)
+
+
+def _generate_stream(prompt, priority=None, task="default", **settings):
+    """
+    Yields the model's text for a prompt chunk by chunk as it arrives.
+    On errors, yields an error message instead of raising.
+    """
+    try:
+        yield from generate_routed_stream(task, prompt, get_model, priority, **settings)
+    except Exception as e:
+        yield f"❌ Gemini API Error: {str(e)}"
 
 # ============================================================
 # 1) SUMMARY GENERATOR
 # ============================================================
 
-def summarize_text(text, length="Medium", style="Academic"):
+def _summary_instructions(length="Medium", style="Academic"):
 
     # summary length instruction
     if length == "Short":
@@ -56,7 +116,14 @@ def summarize_text(text, length="Medium", style="Academic"):
     else:
         style_instr = "Write in a smooth, narrative tone."
 
-    prompt = f"""
+    return length_instr, style_instr
+
+
+def _summary_prompt(text, length="Medium", style="Academic"):
+
+    length_instr, style_instr = _summary_instructions(length, style)
+
+    return f"""
     {length_instr}
     {style_instr}
 
@@ -64,18 +131,46 @@ def summarize_text(text, length="Medium", style="Academic"):
     {text}
     """
 
+
+@timed("summary")
+def summarize_text(text, length="Medium", style="Academic"):
+
+    prompt = _summary_prompt(text, length, style)
+
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        return _generate(prompt, task=summary_route(length, style))
     except Exception as e:
         return f"❌ Gemini API Error: {str(e)}"
 
 
+@timed("summary_stream")
+def summarize_text_stream(text, length="Medium", style="Academic"):
+    """
+    Streaming variant of summarize_text: yields the summary in chunks.
+    """
+    yield from _generate_stream(_summary_prompt(text, length, style), task=summary_route(length, style))
+
+
 # ============================================================
 # 2) TITLE EXTRACTION
 # ============================================================
 
+@timed("title")
 def extract_title(text):
+    """
+    Returns the paper's title. Given a pdf_utils.Document, the title is read
+    from the first-page layout and PDF metadata; Gemini is only asked when
+    that detection is not confident enough.
+    """
+    if hasattr(text, "sections"):
+        from context_packing import pack_context
+        from pdf_utils import TITLE_MIN_CONFIDENCE, detect_header
+
+        header = detect_header(text)
+        if header.title and header.title_confidence >= TITLE_MIN_CONFIDENCE:
+            return header.title
+        text = pack_context(text, "title")
+
     prompt = f"""
     Extract ONLY the best possible title of this research paper.
     Respond with ONLY the title.
@@ -84,7 +179,7 @@ def extract_title(text):
     {text}
     """
     try:
-        return model.generate_content(prompt).text.strip()
+        return _generate(prompt, task="title").strip()
     except Exception as e:
         return f"❌ Gemini API Error: {str(e)}"
 
@@ -93,16 +188,65 @@ def extract_title(text):
 # 3) KEYWORDS EXTRACTION
 # ============================================================
 
-def extract_keywords(text):
+KEYWORD_MODES = ("local", "rerank", "llm")
+
+
+@timed("keywords")
+def extract_keywords(text, mode=None):
+    """
+    Returns 5–10 comma-separated keywords for the whole paper. `mode`
+    (default KEYWORDS_MODE, "local") picks the engine:
+      - "local": offline TF-IDF + RAKE scoring (keywords.py), no Gemini call
+      - "rerank": Gemini picks and orders the best of the local candidates
+      - "llm": Gemini reads the packed paper and extracts keywords itself
+    "rerank" falls back to the local ranking if Gemini fails.
+    """
+    mode = mode or os.getenv("KEYWORDS_MODE", "local")
+    if mode == "llm":
+        return _llm_keywords(text)
+
+    from keywords import extract_keywords_local
+
+    candidates = extract_keywords_local(text, top_k=20 if mode == "rerank" else 10)
+    if not candidates:
+        return "❌ No keywords found in the text."
+    if mode != "rerank" or len(candidates) <= 5:
+        return ", ".join(candidates)
+
+    from context_packing import pack_context
+
+    prompt = f"""
+    These candidate keywords were extracted from a research paper:
+    {"; ".join(candidates)}
+
+    Choose the 5–10 that best describe the paper, most important first.
+    Use ONLY candidates from the list, spelled exactly as given.
+    Return them as a comma-separated list ONLY.
+
+    Paper opening:
+    {pack_context(text, "title")}
+    """
+    try:
+        allowed = {c.lower(): c for c in candidates}
+        ranked = [allowed[k.strip().lower()] for k in _generate(prompt, task="keywords").split(",") if k.strip().lower() in allowed]
+    except Exception:
+        ranked = []
+    # A reply that ignores the list (or an outage) keeps the local ranking
+    return ", ".join(dict.fromkeys(ranked) if len(ranked) >= 3 else candidates[:10])
+
+
+def _llm_keywords(text):
+    from context_packing import pack_context
+
     prompt = f"""
     Extract the 5–10 most important keywords.
     Return them as a comma-separated list ONLY.
 
     Text:
-    {text}
+    {pack_context(text, "keywords")}
     """
     try:
-        return model.generate_content(prompt).text.strip()
+        return _generate(prompt, task="keywords").strip()
     except Exception as e:
         return f"❌ Gemini API Error: {str(e)}"
 
@@ -111,7 +255,52 @@ def extract_keywords(text):
 # 4) PLAGIARISM CHECK
 # ============================================================
 
-def check_plagiarism(text):
+@timed("plagiarism")
+def check_plagiarism(text, doc_hash=None):
+    """
+    Compares the paper with every indexed paper locally (originality.py) and
+    asks Gemini only to explain the overlapping passages it finds. Falls back
+    to a Gemini-only estimate when the index is disabled.
+    """
+    from originality import format_report, get_default_index
+
+    index = get_default_index()
+    if index is None:
+        return _estimate_originality(text)
+
+    report = index.check(text, doc_hash)
+    summary = format_report(report)
+    spans = report.spans()
+    if not spans:
+        return summary
+
+    excerpts = "\n\n".join(
+        f"[{i}] {similarity:.0%} similar to \"{name}\"\nPaper: {passage}\nSource: {source}"
+        for i, (passage, name, source, similarity) in enumerate(spans[:5], 1)
+    )
+    prompt = f"""
+    You are an academic integrity reviewer. A local check flagged these
+    passages of a paper as overlapping with other papers.
+
+    For each numbered passage, say in one or two sentences whether it looks
+    like copying, close paraphrase, or legitimate reuse (quotation, standard
+    definitions, boilerplate, the authors' own earlier work).
+    Then give a short overall assessment.
+
+    Flagged passages:
+    {excerpts}
+    """
+
+    try:
+        return f"{summary}\n\n{_generate(prompt, task='plagiarism').strip()}"
+    except Exception as e:
+        # The local report stands on its own without the explanation
+        return f"{summary}\n\n(Explanation unavailable: {str(e)})"
+
+
+def _estimate_originality(text):
+    from context_packing import pack_context
+
     prompt = f"""
     You are an AI plagiarism and originality detector.
 
@@ -124,11 +313,11 @@ def check_plagiarism(text):
     Do NOT rewrite the text.
 
     Text:
-    {text}
+    {pack_context(text, "plagiarism")}
     """
 
     try:
-        return model.generate_content(prompt).text.strip()
+        return _generate(prompt, task="plagiarism").strip()
     except Exception as e:
         return f"❌ Gemini API Error: {str(e)}"
 
@@ -137,34 +326,84 @@ def check_plagiarism(text):
 # 5) SEMANTIC SEARCH
 # ============================================================
 
-def semantic_search(query, text):
+def _search_prompt(query, text, doc_hash=None, top_k=6):
+    try:
+        from retrieval import retrieve_passages  # pulls in NumPy
+
+        passages = retrieve_passages(query, text, top_k, doc_hash)
+    except Exception:
+        # Retrieval is an optimization; fall back to the paper's key sections
+        from context_packing import pack_context
+
+        passages = [pack_context(text() if callable(text) else text, "summary")]
+
+    context = "\n\n".join(f"[Passage {i + 1}]\n{p}" for i, p in enumerate(passages))
+
     prompt = f"""
     You are an AI doing semantic search inside a research paper.
 
     Task:
     - Understand question meaning
-    - Find relevant portion of TEXT
+    - Find relevant portion of the PASSAGES (retrieved from the paper)
     - Give a clear answer
     - If not found → say: "The document does not contain this information."
 
     Question:
     {query}
 
-    Research Paper:
-    {text}
+    Passages:
+    {context}
+    """
+    return prompt
+
+
+@timed("semantic_search")
+def semantic_search(query, text, doc_hash=None, top_k=6):
+    """
+    Answers a question using only the `top_k` passages of `text` most
+    relevant to it (local retrieval index), instead of the whole paper.
+    `text` may be a callable returning the text, called only if the
+    document's index isn't memoized or saved yet.
     """
+    prompt = _search_prompt(query, text, doc_hash, top_k)
 
     try:
-        return model.generate_content(prompt).text.strip()
+        return _generate(prompt, priority=INTERACTIVE, task="qa").strip()
     except Exception as e:
         return f"❌ Gemini API Error: {str(e)}"
 
 
+@timed("semantic_search_stream")
+def semantic_search_stream(query, text, doc_hash=None, top_k=6):
+    """
+    Streaming variant of semantic_search: yields the answer in chunks.
+    """
+    yield from _generate_stream(_search_prompt(query, text, doc_hash, top_k), priority=INTERACTIVE, task="qa")
+
+
 # ============================================================
 # 6) AUTO-GENERATED PPT
 # ============================================================
 
-def generate_ppt(text):
+@timed("ppt")
+def generate_ppt(text, analysis=None, out=None, doc_hash=None, title=None, authors=None):
+    """
+    Builds the presentation and returns it as PPTX bytes (or saves it to
+    `out` and returns that path). Returns an error string on failure.
+    `title` / `authors` (e.g. from pdf_utils.detect_header) replace the
+    LLM's versions when given.
+    """
+
+    def with_header(sections):
+        if title:
+            sections["title"] = title
+        if authors:
+            sections["authors"] = authors
+        return sections
+
+    # Reuse a combined paper analysis when available (no extra LLM call)
+    if analysis is not None:
+        return _render_ppt(with_header(ppt_sections_from_analysis(analysis)), out, doc_hash)
 
     prompt = f"""
     Convert this research paper into structured slide information.
@@ -196,10 +435,15 @@ def generate_ppt(text):
     """
 
     try:
-        outline = model.generate_content(prompt).text.strip()
+        outline = _generate(prompt, task="ppt").strip()
     except Exception as e:
         return f"❌ PPT Generation Error (LLM Step): {str(e)}"
 
+    return _render_ppt(with_header(_parse_ppt_outline(outline)), out, doc_hash)
+
+
+def _parse_ppt_outline(outline):
+
     # --- Parse response
     sections = {
         "title": "Untitled Presentation",
@@ -241,8 +485,23 @@ def generate_ppt(text):
             if current:
                 sections[current] += "\n" + stripped
 
+    return sections
+
+
+@timed("ppt_render")
+def _render_ppt(sections, out=None, doc_hash=None):
+
+    # Same document + same content renders to the same bytes
+    cache_key = ("pptx", doc_hash, render_cache.content_hash(sections))
+    if out is None:
+        cached = render_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     # --- Build PPT
     try:
+        from pptx import Presentation
+
         prs = Presentation()
 
         # title slide
@@ -271,9 +530,15 @@ def generate_ppt(text):
         add_slide("Conclusion", sections["conclusion"])
         add_slide("Keywords", sections["keywords"])
 
-        out = "generated_presentation.pptx"
-        prs.save(out)
-        return out
+        if out is not None:
+            prs.save(out)
+            return out
+
+        buffer = io.BytesIO()
+        prs.save(buffer)
+        data = buffer.getvalue()
+        render_cache.put(cache_key, data)
+        return data
 
     except Exception as e:
         return f"❌ PPT Generation Error (PPT step): {str(e)}"
@@ -283,7 +548,49 @@ def generate_ppt(text):
 # 7) EXTRACT ALGORITHMS + EQUATIONS
 # ============================================================
 
+@timed("algorithms_equations")
 def extract_algorithms_equations(text):
+    """
+    Extracts equations and algorithms from the paper (text or a
+    pdf_utils.Document). A local detector (equations.py) scans every page for
+    math-dense spans and algorithm blocks, and only those snippets, with page
+    references, are sent to Gemini. Papers where nothing is detected fall
+    back to the packed paper text.
+    """
+    from equations import find_candidates, format_snippets, select_candidates
+
+    candidates = select_candidates(find_candidates(text))
+    if not candidates:
+        from context_packing import pack_context
+
+        return _extract_algorithms_equations_from_text(pack_context(text, "algorithms"))
+
+    prompt = f"""
+    A detector found these equation and algorithm snippets in a research
+    paper. PDF extraction garbles math: symbols, sub/superscripts and
+    fractions may be out of order or split into pieces. Use the context to
+    reconstruct each one; skip snippets that are not real equations or
+    algorithms.
+
+    Return format:
+
+    Equations:
+    - (p. N) equation in LaTeX-like notation — what it expresses
+
+    Algorithms:
+    - (p. N) name: step1; step2; ...
+
+    SNIPPETS:
+    {format_snippets(candidates)}
+    """
+
+    try:
+        return _generate(prompt, task="equations").strip()
+    except Exception as e:
+        return f"❌ Equation Extraction Error: {str(e)}"
+
+
+def _extract_algorithms_equations_from_text(text):
 
     prompt = f"""
     Extract from the text:
@@ -306,7 +613,7 @@ def extract_algorithms_equations(text):
     """
 
     try:
-        return model.generate_content(prompt).text.strip()
+        return _generate(prompt, task="equations").strip()
     except Exception as e:
         return f"❌ Equation Extraction Error: {str(e)}"
 
@@ -315,13 +622,37 @@ def extract_algorithms_equations(text):
 # 8) PDF RESEARCH NOTES
 # ============================================================
 
-def generate_research_notes_pdf(title, keywords, summary, plagiarism_report, algorithms_equations):
+@timed("notes_pdf_render")
+def generate_research_notes_pdf(
+    title,
+    keywords,
+    summary,
+    plagiarism_report,
+    algorithms_equations,
+    filename=None,
+    doc_hash=None,
+):
+    """
+    Renders the Research Notes and returns them as PDF bytes (or saves them
+    to `filename` and returns that path). Returns an error string on failure.
+    """
+
+    content = [title, keywords, summary, plagiarism_report, algorithms_equations]
+    cache_key = ("pdf", doc_hash, render_cache.content_hash(content))
+    if filename is None:
+        cached = render_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
     try:
-        filename = "Research_Notes.pdf"
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.pagesizes import letter
+        from xml.sax.saxutils import escape
 
+        buffer = io.BytesIO()
         doc = SimpleDocTemplate(
-            filename,
+            filename if filename is not None else buffer,
             pagesize=letter,
             rightMargin=40, leftMargin=40,
             topMargin=50, bottomMargin=50
@@ -332,7 +663,8 @@ def generate_research_notes_pdf(title, keywords, summary, plagiarism_report, alg
 
         def add_section(header, text):
             story.append(Paragraph(f"<b>{header}</b>", styles['Heading2']))
-            story.append(Paragraph(text.replace("\n", "<br/>"), styles['BodyText']))
+            # Paragraph parses markup; quoted paper text may contain "<" or "&"
+            story.append(Paragraph(escape(text).replace("\n", "<br/>"), styles['BodyText']))
             story.append(Spacer(1, 12))
 
         # Title
@@ -346,7 +678,412 @@ def generate_research_notes_pdf(title, keywords, summary, plagiarism_report, alg
 
         doc.build(story)
 
-        return filename
+        if filename is not None:
+            return filename
+
+        data = buffer.getvalue()
+        render_cache.put(cache_key, data)
+        return data
 
     except Exception as e:
         return f"❌ PDF Generation Error: {str(e)}"
+
+
+# ============================================================
+# 9) RESEARCH NOTES PIPELINE (CONCURRENT FAN-OUT)
+# ============================================================
+
+def _is_error(result):
+    return not isinstance(result, str) or result.startswith("❌")
+
+
+def collect_research_notes(
+    text,
+    length="Medium",
+    style="Academic",
+    timeout=90,
+    timeouts=None,
+    fields=None,
+    doc_hash=None,
+    full_text=None,
+    paper=None,
+):
+    """
+    Runs the independent Research Notes prompts concurrently so the total
+    wait approaches the slowest single call instead of the sum.
+
+    `text` (usually a packed excerpt) feeds the title and summary prompts.
+    Keywords and the originality check read the whole paper, `full_text`;
+    the equation scan reads `paper`, a pdf_utils.Document or page-marked
+    text, so its snippets keep page references. Both default to `text`.
+
+    `timeout` applies to every call unless overridden in `timeouts`
+    (e.g. {"summary": 120}); `fields` limits which prompts run. Returns
+    (results, failures): `results` maps each field to its text (or an error
+    message) and `failures` maps the fields that failed or timed out to their
+    error message.
+    """
+    full_text = full_text or text
+    calls = {
+        "title": (extract_title, (text,)),
+        "keywords": (extract_keywords, (full_text,)),
+        "summary": (summarize_text, (text, length, style)),
+        "plagiarism_report": (check_plagiarism, (full_text, doc_hash)),
+        "algorithms_equations": (extract_algorithms_equations, (paper or full_text,)),
+    }
+    if fields is not None:
+        calls = {name: call for name, call in calls.items() if name in fields}
+    timeouts = timeouts or {}
+
+    results = {}
+    failures = {}
+    executor = ThreadPoolExecutor(max_workers=len(calls), thread_name_prefix="notes")
+    started = time.monotonic()
+    futures = {name: executor.submit(fn, *args) for name, (fn, args) in calls.items()}
+
+    # Wait on the shortest deadlines first so each call gets its own limit.
+    for name in sorted(futures, key=lambda n: timeouts.get(n, timeout)):
+        future = futures[name]
+        limit = timeouts.get(name, timeout)
+        remaining = max(0.0, started + limit - time.monotonic())
+        try:
+            results[name] = future.result(timeout=remaining)
+        except FutureTimeout:
+            future.cancel()
+            results[name] = f"❌ Timed out after {limit}s"
+        except Exception as e:
+            results[name] = f"❌ Gemini API Error: {str(e)}"
+
+        if _is_error(results[name]):
+            failures[name] = results[name]
+
+    # Don't block on calls that timed out; their threads finish in the background.
+    executor.shutdown(wait=False, cancel_futures=True)
+    return results, failures
+
+
+@timed("research_notes")
+def build_research_notes_pdf(
+    text,
+    length="Medium",
+    style="Academic",
+    timeout=90,
+    timeouts=None,
+    analysis=None,
+    filename=None,
+    doc_hash=None,
+    title=None,
+    full_text=None,
+    paper=None,
+):
+    """
+    Collects the Research Notes fields concurrently and renders them with
+    generate_research_notes_pdf. When a combined paper `analysis` is given,
+    only the plagiarism check still needs its own prompt; a known `title`
+    (e.g. from pdf_utils.detect_header) skips the title prompt.
+    `full_text` and `paper` are passed to collect_research_notes.
+    Returns (pdf_bytes_or_path_or_error, failures).
+    """
+    if analysis is not None:
+        results, failures = collect_research_notes(
+            text, length, style, timeout, timeouts, fields=["plagiarism_report"], doc_hash=doc_hash,
+            full_text=full_text, paper=paper,
+        )
+        results.update(
+            title=analysis["title"],
+            keywords=format_keywords(analysis),
+            summary=analysis["summary"],
+            algorithms_equations=format_algorithms_equations(analysis),
+        )
+    else:
+        fields = None
+        if title:
+            fields = ["keywords", "summary", "plagiarism_report", "algorithms_equations"]
+        results, failures = collect_research_notes(
+            text, length, style, timeout, timeouts, fields=fields, doc_hash=doc_hash,
+            full_text=full_text, paper=paper,
+        )
+
+    if title:
+        results["title"] = title
+    title = results["title"]
+    if "title" in failures:
+        title = "Research Notes"
+
+    notes = generate_research_notes_pdf(
+        title,
+        results["keywords"],
+        results["summary"],
+        results["plagiarism_report"],
+        results["algorithms_equations"],
+        filename,
+        doc_hash,
+    )
+    return notes, failures
+
+
+# ============================================================
+# 10) COMBINED PAPER ANALYSIS (ONE STRUCTURED CALL)
+# ============================================================
+
+# field -> expected type; "title" and "summary" are required
+PAPER_ANALYSIS_SCHEMA = {
+    "title": str,
+    "authors": str,
+    "keywords": list,
+    "summary": str,
+    "problem": str,
+    "objectives": str,
+    "methodology": str,
+    "results": str,
+    "conclusion": str,
+    "equations": list,
+    "algorithms": list,
+}
+
+REQUIRED_ANALYSIS_FIELDS = ("title", "summary")
+
+
+def validate_paper_analysis(data):
+    """
+    Checks a decoded analysis against PAPER_ANALYSIS_SCHEMA and returns a
+    normalized copy. Lists given as strings are split on commas/new lines and
+    strings given as lists are joined. Raises ValueError if invalid.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("analysis must be a JSON object")
+
+    for field in REQUIRED_ANALYSIS_FIELDS:
+        if not str(data.get(field) or "").strip():
+            raise ValueError(f"analysis is missing '{field}'")
+
+    analysis = {}
+    for field, expected in PAPER_ANALYSIS_SCHEMA.items():
+        value = data.get(field)
+
+        if value is None:
+            value = expected()
+        elif expected is list and isinstance(value, str):
+            value = value.split("," if field == "keywords" else "\n")
+        elif expected is str and isinstance(value, list):
+            value = "\n".join(str(item) for item in value)
+
+        if not isinstance(value, expected):
+            raise ValueError(f"analysis field '{field}' must be a {expected.__name__}")
+
+        if expected is list:
+            value = [str(item).strip() for item in value if str(item).strip()]
+        else:
+            value = value.strip()
+        analysis[field] = value
+
+    if not analysis["authors"]:
+        analysis["authors"] = "Not specified"
+    return analysis
+
+
+def _parse_json_response(raw):
+    # Models occasionally wrap JSON in a markdown fence despite the mime type
+    raw = raw.strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", raw, re.DOTALL)
+    if fenced:
+        raw = fenced.group(1)
+    return json.loads(raw)
+
+
+def _analysis_problem(raw):
+    # Routing validator: escalate responses that aren't a valid analysis
+    try:
+        validate_paper_analysis(_parse_json_response(raw))
+    except ValueError:
+        return "invalid analysis JSON"
+    return None
+
+
+@timed("paper_analysis")
+def analyze_paper(text, length="Medium", style="Academic"):
+    """
+    Extracts title, authors, keywords, summary, the PPT outline sections and
+    equations/algorithms in a single JSON-structured Gemini call.
+    Returns the validated analysis dict, or an error string.
+    """
+    length_instr, style_instr = _summary_instructions(length, style)
+
+    prompt = f"""
+    Analyze this research paper and respond with ONE JSON object only,
+    using exactly these keys:
+
+    "title": the best possible title of the paper
+    "authors": the authors, or "Not specified"
+    "keywords": list of the 5–10 most important keywords
+    "summary": a summary of the paper. {length_instr} {style_instr}
+    "problem": problem statement (2–4 lines)
+    "objectives": objectives (2–4 lines)
+    "methodology": methodology (3–6 lines)
+    "results": results / findings (3–6 lines)
+    "conclusion": conclusion (2–4 lines)
+    "equations": list of equations (math, LaTeX, symbolic)
+    "algorithms": list of algorithm steps (Algorithm 1, pseudocode, steps)
+
+    Text:
+    {text}
+    """
+
+    try:
+        raw = _generate(prompt, task="analysis", validate=_analysis_problem, generation_config={"response_mime_type": "application/json"})
+    except Exception as e:
+        return f"❌ Gemini API Error: {str(e)}"
+
+    try:
+        return validate_paper_analysis(_parse_json_response(raw))
+    except ValueError as e:  # includes json.JSONDecodeError
+        return f"❌ Paper Analysis Error (invalid response): {str(e)}"
+
+
+def format_keywords(analysis):
+    return ", ".join(analysis["keywords"])
+
+
+def format_algorithms_equations(analysis):
+    equations = "\n".join(f"- {eq}" for eq in analysis["equations"]) or "- None found"
+    algorithms = "\n".join(f"- {step}" for step in analysis["algorithms"]) or "- None found"
+    return f"Equations:\n{equations}\n\nAlgorithms:\n{algorithms}"
+
+
+def ppt_sections_from_analysis(analysis):
+    return {
+        "title": analysis["title"],
+        "authors": analysis["authors"],
+        "problem": analysis["problem"],
+        "objectives": analysis["objectives"],
+        "methodology": analysis["methodology"],
+        "results": analysis["results"],
+        "conclusion": analysis["conclusion"],
+        "keywords": format_keywords(analysis),
+    }
+
+
+# ============================================================
+# 11) LONG-DOCUMENT SUMMARIES (MAP-REDUCE)
+# ============================================================
+
+@timed("map_reduce_part")
+def _summarize_part(text, instruction):
+    prompt = f"""
+    {instruction}
+    Keep key methods, results, numbers and conclusions. Do not add information.
+
+    Text:
+    {text}
+    """
+    try:
+        return _generate(prompt, task="summary_part").strip()
+    except Exception as e:
+        return f"❌ Gemini API Error: {str(e)}"
+
+
+def _summarize_parallel(parts, instruction_for, max_workers):
+    """
+    Summarizes parts concurrently, dropping failed ones. Returns the list of
+    partial summaries (in order), or an error string if every part failed.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mapreduce") as executor:
+        results = list(executor.map(
+            lambda item: _summarize_part(item[1], instruction_for(item[0], len(parts))),
+            enumerate(parts),
+        ))
+
+    ok = [r for r in results if not _is_error(r)]
+    if not ok:
+        return results[0]
+    return ok
+
+
+def _group_by_budget(parts, max_tokens):
+    groups = [[]]
+    used = 0
+    for part in parts:
+        tokens = estimate_tokens(part)
+        if groups[-1] and used + tokens > max_tokens:
+            groups.append([])
+            used = 0
+        groups[-1].append(part)
+        used += tokens
+    return groups
+
+
+def _reduce_for_summary(text, chunk_tokens=3000, reduce_tokens=6000, max_workers=4):
+    """
+    Map-reduce stage of summarize_long_text. Returns (final_input, error):
+    the text to hand to the final styled summary, or an error string.
+    """
+    chunks = split_into_chunks(text, chunk_tokens)
+    if len(chunks) <= 1:
+        return text, None
+
+    # Give each partial summary an equal share of the reduce budget
+    def map_instruction(i, n):
+        words = max(80, (reduce_tokens // n) * 3 // 4)
+        return f"This is part {i + 1} of {n} of a research paper. Summarize it in at most {words} words."
+
+    partials = _summarize_parallel(chunks, map_instruction, max_workers)
+    if isinstance(partials, str):
+        return None, partials
+
+    # Hierarchical reduce: depth grows with log(pages), not linearly
+    while sum(estimate_tokens(p) for p in partials) > reduce_tokens and len(partials) > 1:
+        groups = ["\n\n".join(g) for g in _group_by_budget(partials, reduce_tokens)]
+        if len(groups) == len(partials):
+            break
+
+        def reduce_instruction(i, n):
+            words = max(80, (reduce_tokens // n) * 3 // 4)
+            return f"Merge these partial summaries of a research paper into one summary of at most {words} words."
+
+        partials = _summarize_parallel(groups, reduce_instruction, max_workers)
+        if isinstance(partials, str):
+            return None, partials
+
+    combined = "\n\n".join(partials)
+    return f"(Partial summaries of consecutive sections of one research paper)\n\n{combined}", None
+
+
+@timed("long_summary")
+def summarize_long_text(
+    text,
+    length="Medium",
+    style="Academic",
+    chunk_tokens=3000,
+    reduce_tokens=6000,
+    max_workers=4,
+):
+    """
+    Summarizes a document of any length: chunks it on section/page/paragraph
+    boundaries, summarizes chunks in parallel (map), then merges the partial
+    summaries (reduce), repeating the reduce step in parallel groups while
+    they exceed `reduce_tokens`. Short texts go straight to summarize_text.
+    """
+    final_input, error = _reduce_for_summary(text, chunk_tokens, reduce_tokens, max_workers)
+    if error:
+        return error
+    return summarize_text(final_input, length, style)
+
+
+@timed("long_summary_stream")
+def summarize_long_text_stream(
+    text,
+    length="Medium",
+    style="Academic",
+    chunk_tokens=3000,
+    reduce_tokens=6000,
+    max_workers=4,
+):
+    """
+    Streaming variant of summarize_long_text: the map-reduce stages run
+    first, then the final summary is yielded in chunks.
+    """
+    final_input, error = _reduce_for_summary(text, chunk_tokens, reduce_tokens, max_workers)
+    if error:
+        yield error
+        return
+    yield from summarize_text_stream(final_input, length, style)
@@ -1,20 +1,33 @@
 import os
 import re
-import google.generativeai as genai
-from dotenv import load_dotenv
+import sys
 
-# Load the Gemini API key from .env
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
+# Share the response cache with the main app (llm_cache.py lives one level up)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from context_packing import pack_context
+from model_routing import generate_routed
 
-if not GOOGLE_API_KEY:
-    raise ValueError("❌ Missing Google Gemini API key in .env file.")
+# Models are created on first use (one per routed model name) so importing
+# this module stays cheap
+models = {}
 
-# ✅ Configure the Gemini client
-genai.configure(api_key=GOOGLE_API_KEY)
 
-# ✅ Correct full model name (required)
-model = genai.GenerativeModel("gemini-2.5-flash")
+def get_model(name):
+    if name not in models:
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+
+        # Load the Gemini API key from .env
+        load_dotenv()
+        GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
+
+        if not GOOGLE_API_KEY:
+            raise ValueError("❌ Missing Google Gemini API key in .env file.")
+
+        # ✅ Configure the Gemini client
+        genai.configure(api_key=GOOGLE_API_KEY)
+        models[name] = genai.GenerativeModel(name)
+    return models[name]
 
 def clean_text(text):
     cleaned = re.sub(r'\s+', ' ', text)  # Collapse multiple spaces
@@ -25,14 +38,14 @@ def summarize_text(text):
     print("✨ Generating summary using Gemini...")
 
     try:
-        cleaned = clean_text(text)
-        prompt = f"Summarize this text clearly in a few sentences:\n\n{cleaned[:4000]}"
+        # Pack the most informative sections first: clean_text flattens newlines
+        cleaned = clean_text(pack_context(text, "summary", max_tokens=1000))
+        prompt = f"Summarize this text clearly in a few sentences:\n\n{cleaned}"
 
-        # ✅ Use the correct method
-        response = model.generate_content(prompt)
+        summary = generate_routed("summary_short", prompt, get_model)
 
-        if response and hasattr(response, 'text'):
-            return response.text
+        if summary:
+            return summary
         else:
             print("⚠️ No summary returned.")
             return None
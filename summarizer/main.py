@@ -1,21 +1,17 @@
-import fitz  
 import os
+import sys
+
+# Reuse the shared extraction engine (pdf_utils.py lives one level up)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pdf_utils
+
 
 def extract_text_from_pdf(pdf_path):
     if not os.path.exists(pdf_path):
         print(f"File not found: {pdf_path}")
         return
 
-    doc = fitz.open(pdf_path)
-    full_text = ""
-
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        text = page.get_text()
-        full_text += f"--- Page {page_num + 1} ---\n{text}\n"
-
-    doc.close()
-    return full_text
+    return pdf_utils.extract_text_from_pdf(pdf_path, page_markers=True)
 
 if __name__ == "__main__":
     input_pdf = "sample.pdf"  
@@ -0,0 +1,243 @@
+import threading
+import time
+
+import pytest
+
+from fake_gemini import FakeGeminiModel, FakeRateLimitError
+from gemini_scheduler import BATCH, INTERACTIVE, RequestScheduler, ScheduledModel, TokenBucket, is_retryable
+
+
+class FlakyModel(FakeGeminiModel):
+    """
+    Fails the first `failures` calls with a fake 429, then answers.
+    """
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def _delay_and_maybe_fail(self):
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.failures
+        if fail:
+            raise FakeRateLimitError("429 Resource has been exhausted (fake)")
+
+
+def _scheduler(**kwargs):
+    settings = {"requests_per_minute": 0, "max_retries": 3, "base_delay": 0.001, "max_delay": 0.01}
+    settings.update(kwargs)
+    return RequestScheduler(**settings)
+
+
+# ============================================================
+#  RETRIES & BACKOFF
+# ============================================================
+
+def test_retries_rate_limits_then_succeeds():
+    scheduler = _scheduler()
+    model = FlakyModel(failures=2)
+
+    response = ScheduledModel(model, scheduler).generate_content("Summarize this paper")
+
+    assert response.text.startswith("Fake response to:")
+    assert model.calls == 3
+    stats = scheduler.stats()
+    assert stats["retries"] == 2
+    assert stats["failures"] == 0
+
+
+def test_gives_up_after_max_retries():
+    scheduler = _scheduler(max_retries=2)
+    model = FlakyModel(failures=10)
+
+    with pytest.raises(FakeRateLimitError):
+        ScheduledModel(model, scheduler).generate_content("prompt")
+
+    assert model.calls == 3
+    assert scheduler.stats()["failures"] == 1
+
+
+def test_other_errors_are_not_retried():
+    scheduler = _scheduler()
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        scheduler.call(broken)
+    assert len(calls) == 1
+    assert scheduler.stats()["retries"] == 0
+
+
+def test_backoff_is_jittered_and_capped():
+    scheduler = RequestScheduler(base_delay=1.0, max_delay=4.0)
+    delays = [scheduler.backoff_delay(attempt) for attempt in range(10) for _ in range(20)]
+
+    assert all(0.0 <= d <= 4.0 for d in delays)
+    assert len(set(delays)) > 1
+
+
+def test_is_retryable():
+    assert is_retryable(FakeRateLimitError("quota"))
+    assert not is_retryable(ValueError("bad request"))
+
+
+def test_survives_random_rate_limits():
+    scheduler = _scheduler(max_retries=10)
+    model = FakeGeminiModel(rate_limit_prob=0.3, seed=3)
+    scheduled = ScheduledModel(model, scheduler)
+
+    for i in range(20):
+        assert scheduled.generate_content(f"prompt {i}").text
+
+    assert scheduler.stats()["retries"] == model.rate_limited > 0
+
+
+# ============================================================
+#  PRIORITY LANES
+# ============================================================
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_interactive_calls_run_before_batch_calls():
+    scheduler = _scheduler(max_concurrency=1)
+    release = threading.Event()
+    order = []
+
+    blocker = threading.Thread(target=scheduler.call, args=(release.wait,))
+    blocker.start()
+    _wait_for(lambda: scheduler.stats()["active"] == 1)
+
+    threads = []
+    for name, priority in (("batch-1", BATCH), ("batch-2", BATCH), ("interactive", INTERACTIVE)):
+        thread = threading.Thread(target=scheduler.call, args=(lambda n=name: order.append(n),), kwargs={"priority": priority})
+        thread.start()
+        threads.append(thread)
+        _wait_for(lambda count=len(threads): scheduler.stats()["waiting"] == count)
+
+    release.set()
+    for thread in [blocker, *threads]:
+        thread.join(timeout=5)
+
+    assert order == ["interactive", "batch-1", "batch-2"]
+
+
+def test_concurrency_cap():
+    scheduler = _scheduler(max_concurrency=2)
+    model = FakeGeminiModel(latency=0.02)
+    peak = []
+
+    def call():
+        peak.append(scheduler.stats()["active"])
+        return model.generate_content("prompt")
+
+    threads = [threading.Thread(target=scheduler.call, args=(call,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert model.calls == 8
+    assert max(peak) <= 2
+
+
+# ============================================================
+#  TOKEN BUCKETS
+# ============================================================
+
+def test_token_bucket_waits_once_empty():
+    bucket = TokenBucket(per_minute=600, capacity=2)  # 10 per second
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    # Reservations queue up behind each other
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.02)
+
+
+def test_requests_per_minute_throttles_calls():
+    scheduler = _scheduler()
+    scheduler.request_bucket = TokenBucket(per_minute=1200, capacity=1)  # 20 per second
+    model = FakeGeminiModel()
+    scheduled = ScheduledModel(model, scheduler)
+
+    started = time.monotonic()
+    for i in range(5):
+        scheduled.generate_content(f"prompt {i}")
+    elapsed = time.monotonic() - started
+
+    assert elapsed >= 0.18
+    assert scheduler.stats()["throttled_seconds"] >= 0.18
+
+
+def test_tokens_per_minute_throttles_large_prompts():
+    scheduler = _scheduler()
+    scheduler.token_bucket = TokenBucket(per_minute=6000, capacity=100)  # 100 tokens per second
+    calls = []
+
+    scheduler.call(lambda: calls.append(1), tokens=100)
+    started = time.monotonic()
+    scheduler.call(lambda: calls.append(1), tokens=20)
+
+    assert time.monotonic() - started >= 0.15
+    assert len(calls) == 2
+
+
+# ============================================================
+#  STREAMING
+# ============================================================
+
+def test_stream_retries_rate_limits_before_the_first_chunk():
+    scheduler = _scheduler()
+    model = FlakyModel(failures=2, responder=lambda prompt, config: "one two three")
+
+    chunks = ScheduledModel(model, scheduler).generate_content("prompt", stream=True)
+
+    assert "".join(chunk.text for chunk in chunks) == "one two three"
+    assert model.calls == 3
+    assert scheduler.stats()["retries"] == 2
+
+
+def test_stream_errors_after_the_first_chunk_propagate():
+    scheduler = _scheduler()
+    attempts = []
+
+    def broken_stream():
+        attempts.append(1)
+        yield "partial"
+        raise FakeRateLimitError("429 mid-stream")
+
+    stream = scheduler.stream(broken_stream)
+    assert next(stream) == "partial"
+    with pytest.raises(FakeRateLimitError):
+        next(stream)
+    assert len(attempts) == 1
+    assert scheduler.stats()["active"] == 0
+
+
+def test_stream_holds_its_slot_until_consumed_or_closed():
+    scheduler = _scheduler(max_concurrency=1)
+    model = FakeGeminiModel(responder=lambda prompt, config: "one two three")
+    scheduled = ScheduledModel(model, scheduler)
+
+    stream = scheduled.generate_content("prompt", stream=True)
+    next(stream)
+    assert scheduler.stats()["active"] == 1
+
+    other = threading.Thread(target=scheduled.generate_content, args=("other",))
+    other.start()
+    _wait_for(lambda: scheduler.stats()["waiting"] == 1)
+    assert model.calls == 1
+
+    stream.close()
+    other.join(timeout=5)
+    assert model.calls == 2
+    assert scheduler.stats()["active"] == 0
@@ -0,0 +1,169 @@
+import sqlite3
+import time
+
+import pytest
+
+from job_queue import CANCELLED, DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), max_running_per_user=2, lease_seconds=60)
+
+
+def _make_due(queue, job_id):
+    # Skip the retry backoff instead of sleeping through it
+    with sqlite3.connect(queue.path) as conn:
+        conn.execute("UPDATE jobs SET available_at = 0 WHERE id = ?", (job_id,))
+
+
+# ============================================================
+#  CLAIMING
+# ============================================================
+
+def test_claim_returns_jobs_by_priority_then_age(queue):
+    slow = queue.submit("ppt", {"n": 1}, user_id="a", priority=2)
+    first = queue.submit("summary", {"n": 2}, user_id="b", priority=1)
+    second = queue.submit("summary", {"n": 3}, user_id="c", priority=1)
+
+    assert queue.claim("w1") == (first, "summary", {"n": 2})
+    assert queue.claim("w1")[0] == second
+    assert queue.claim("w1")[0] == slow
+    assert queue.claim("w1") is None
+
+    job = queue.status(first)
+    assert job["status"] == RUNNING
+    assert job["attempts"] == 1
+
+
+def test_complete_stores_result(queue):
+    job_id = queue.submit("summary", {})
+    queue.claim("w1")
+    queue.complete(job_id, b"%PDF-1.4", meta={"filename": "notes.pdf"})
+
+    job = queue.status(job_id)
+    assert job["status"] == DONE
+    assert job["meta"] == {"filename": "notes.pdf"}
+    assert queue.result(job_id) == b"%PDF-1.4"
+
+
+def test_claim_is_exclusive_across_queues(queue):
+    job_id = queue.submit("summary", {})
+    other = JobQueue(queue.path)
+
+    assert queue.claim("w1")[0] == job_id
+    assert other.claim("w2") is None
+
+
+# ============================================================
+#  PER-USER LIMIT
+# ============================================================
+
+def test_running_jobs_are_capped_per_user(queue):
+    busy = [queue.submit("summary", {"n": n}, user_id="busy") for n in range(3)]
+    other = queue.submit("summary", {}, user_id="other")
+
+    assert queue.claim("w1")[0] == busy[0]
+    assert queue.claim("w1")[0] == busy[1]
+    # The busy user's third job waits; another user's job goes ahead of it
+    assert queue.claim("w1")[0] == other
+    assert queue.claim("w1") is None
+
+    queue.complete(busy[0], "done")
+    assert queue.claim("w1")[0] == busy[2]
+
+
+# ============================================================
+#  RETRIES & LEASES
+# ============================================================
+
+def test_failed_job_is_retried_after_backoff(queue):
+    job_id = queue.submit("summary", {}, max_attempts=2)
+    queue.claim("w1")
+    queue.fail(job_id, "429 quota")
+
+    job = queue.status(job_id)
+    assert job["status"] == QUEUED
+    assert job["error"] == "429 quota"
+    assert queue.claim("w1") is None  # still backing off
+
+    _make_due(queue, job_id)
+    assert queue.claim("w1")[0] == job_id
+    queue.fail(job_id, "429 quota")
+
+    job = queue.status(job_id)
+    assert job["status"] == FAILED
+    assert job["attempts"] == 2
+
+
+def test_fail_without_retry_is_final(queue):
+    job_id = queue.submit("summary", {})
+    queue.claim("w1")
+    queue.fail(job_id, "bad payload", retry=False)
+
+    assert queue.status(job_id)["status"] == FAILED
+
+
+def test_expired_lease_hands_job_to_another_worker(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.05)
+    job_id = queue.submit("summary", {}, max_attempts=2)
+
+    assert queue.claim("w1")[0] == job_id
+    assert queue.claim("w2") is None
+
+    time.sleep(0.1)
+    assert queue.claim("w2")[0] == job_id
+    assert queue.status(job_id)["attempts"] == 2
+
+    # Out of attempts: the next expiry fails the job instead of re-queueing it
+    time.sleep(0.1)
+    assert queue.claim("w3") is None
+    job = queue.status(job_id)
+    assert job["status"] == FAILED
+    assert job["error"] == "Worker stopped responding."
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.2)
+    job_id = queue.submit("summary", {})
+    queue.claim("w1")
+
+    for _ in range(4):
+        time.sleep(0.08)
+        queue.heartbeat(job_id)
+        assert queue.claim("w2") is None
+
+    assert queue.status(job_id)["status"] == RUNNING
+
+
+# ============================================================
+#  CANCELLATION
+# ============================================================
+
+def test_cancel_queued_job(queue):
+    job_id = queue.submit("summary", {})
+
+    assert queue.cancel(job_id) is True
+    assert queue.status(job_id)["status"] == CANCELLED
+    assert queue.claim("w1") is None
+
+
+def test_cancel_running_job_discards_result(queue):
+    job_id = queue.submit("summary", {})
+    queue.claim("w1")
+
+    assert queue.cancel(job_id) is True
+    assert queue.status(job_id)["cancel_requested"] is True
+
+    queue.complete(job_id, "late result")
+    assert queue.status(job_id)["status"] == CANCELLED
+    assert queue.result(job_id) is None
+
+
+def test_cancel_finished_job_returns_false(queue):
+    job_id = queue.submit("summary", {})
+    queue.claim("w1")
+    queue.complete(job_id, "text")
+
+    assert queue.cancel(job_id) is False
+    assert queue.result(job_id) == "text"
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from originality import OriginalityIndex, format_report
+
+
+def _paper(seed, words=1500):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(5000)]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+
+@pytest.fixture
+def index(tmp_path):
+    return OriginalityIndex(str(tmp_path / "originality.sqlite3"))
+
+
+def test_copied_span_is_detected(index):
+    source = _paper(1)
+    index.add(source, "source-hash", name="Source Paper")
+
+    copied = " ".join(source.split()[300:700])
+    draft = " ".join([_paper(2, 600), copied, _paper(3, 600)])
+    report = index.check(draft, doc_hash="draft-hash")
+
+    assert report.papers_indexed == 1
+    assert report.matches
+    assert 0.0 < report.originality < 1.0
+    assert {m.source for m in report.matches} == {"source-hash"}
+
+    spans = report.spans()
+    assert len(spans) == 1
+    text, name, source_text, similarity = spans[0]
+    assert name == "Source Paper"
+    assert similarity >= index.threshold
+    assert source_text in source
+    # The span covers the copied words and little else
+    assert len(set(text.split()) & set(copied.split())) >= 0.8 * len(set(text.split()))
+    assert "Source Paper" in format_report(report)
+
+
+def test_unrelated_text_is_original(index):
+    index.add(_paper(1), "source-hash")
+    report = index.check(_paper(2), doc_hash="draft-hash")
+
+    assert report.matches == []
+    assert report.originality == 1.0
+    assert "No overlapping passages found." in format_report(report)
+
+
+def test_paper_is_not_matched_against_itself(index):
+    text = _paper(1)
+    index.add(text, "paper-hash")
+
+    report = index.check(text, doc_hash="paper-hash")
+    assert report.matches == []
+    assert report.papers_indexed == 0
+
+    # Without its own hash every passage matches the stored copy
+    assert index.check(text).originality == 0.0
+
+
+def test_reindexing_the_same_paper_is_skipped(index):
+    text = _paper(1)
+
+    assert index.add(text, "paper-hash") is True
+    assert index.add(text, "paper-hash") is False
+    assert len(index) == 1
+
+    index.add(text, "copy-hash")
+    report = index.check(text, doc_hash="paper-hash")
+    # Matches come from the copy only, one per passage
+    assert {m.source for m in report.matches} == {"copy-hash"}
+    assert len(report.matches) == len(report.passages)
+
+
+def test_windows_index_like_whole_text(index):
+    text = _paper(1)
+    words = text.split()
+    windows = (" ".join(words[i:i + 500]) for i in range(0, len(words), 500))
+
+    assert index.add(windows, "windowed-hash") is True
+    report = index.check(text, doc_hash="draft-hash")
+    assert report.originality < 0.2